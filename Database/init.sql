@@ -61,7 +61,8 @@ CREATE TABLE bramka (
                         nazwa VARCHAR(100) NOT NULL,
                         lokalizacja VARCHAR(255),
                         aktywna BOOLEAN DEFAULT TRUE,
-                        adres_ip VARCHAR(45)
+                        adres_ip VARCHAR(45),
+                        detektor VARCHAR(50) -- Detektor twarzy (NULL = globalny FACE_DETECTOR)
 );
 
 -- 6. Tabela ZdjecieReferencyjne
@@ -75,15 +76,17 @@ CREATE TABLE zdjecie_referencyjne (
 );
 
 -- 7. Tabela ProbaWejscia
+-- Partycjonowanie po miesiącach i indeksy zakłada aplikacja przy starcie
+-- (Database/migrations, uruchamiane przez app/migrate.py)
 CREATE TABLE proba_wejscia (
                                id SERIAL PRIMARY KEY,
                                bramka_id INT NOT NULL,
                                pracownik_id INT, -- Może być NULL (dla nieznanych osób)
-                               data_czas TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                               data_czas TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
                                wynik_qr VARCHAR(50),
                                wynik_biometryczny VARCHAR(50),
-                               confidence FLOAT,
-                               status VARCHAR(50) NOT NULL,
+                               procent_podobienstwa FLOAT,
+                               status_finalny VARCHAR(50) NOT NULL,
                                sciezka_zdjecia VARCHAR(255),
                                podejrzana BOOLEAN DEFAULT FALSE,
 
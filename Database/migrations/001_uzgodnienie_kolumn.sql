@@ -0,0 +1,14 @@
+-- Uzgodnienie nazw kolumn proba_wejscia z models.py
+-- (starszy init.sql tworzył kolumny "confidence" i "status")
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_name = 'proba_wejscia' AND column_name = 'confidence') THEN
+        ALTER TABLE proba_wejscia RENAME COLUMN confidence TO procent_podobienstwa;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_name = 'proba_wejscia' AND column_name = 'status') THEN
+        ALTER TABLE proba_wejscia RENAME COLUMN status TO status_finalny;
+    END IF;
+END $$;
@@ -0,0 +1,80 @@
+-- Partycjonowanie proba_wejscia po miesiącach (RANGE na data_czas) oraz indeksy
+-- pod zapytania /logi/ (pracownik + czas), raporty bramek i przegląd prób podejrzanych.
+
+-- Tworzy brakujące partycje miesięczne w zakresie [od, do_)
+CREATE OR REPLACE FUNCTION utworz_partycje_proba_wejscia(od DATE, do_ DATE) RETURNS void AS $$
+DECLARE
+    miesiac DATE := date_trunc('month', od)::date;
+    nazwa TEXT;
+BEGIN
+    WHILE miesiac < do_ LOOP
+        nazwa := format('proba_wejscia_%s', to_char(miesiac, 'YYYY_MM'));
+        IF to_regclass(nazwa) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF proba_wejscia FOR VALUES FROM (%L) TO (%L)',
+                nazwa, miesiac, (miesiac + interval '1 month')::date
+            );
+        END IF;
+        miesiac := (miesiac + interval '1 month')::date;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Zamiana zwykłej tabeli na partycjonowaną (z przeniesieniem danych)
+DO $$
+DECLARE
+    sekwencja TEXT;
+    od DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'proba_wejscia'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    sekwencja := pg_get_serial_sequence('proba_wejscia', 'id');
+
+    ALTER TABLE proba_wejscia RENAME TO proba_wejscia_stara;
+    ALTER TABLE proba_wejscia_stara RENAME CONSTRAINT proba_wejscia_pkey TO proba_wejscia_stara_pkey;
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY NONE', sekwencja);
+
+    -- Klucz partycjonowania musi być częścią klucza głównego
+    CREATE TABLE proba_wejscia (
+        id INTEGER NOT NULL,
+        bramka_id INT NOT NULL,
+        pracownik_id INT,
+        data_czas TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        wynik_qr VARCHAR(50),
+        wynik_biometryczny VARCHAR(50),
+        procent_podobienstwa FLOAT,
+        status_finalny VARCHAR(50) NOT NULL,
+        sciezka_zdjecia VARCHAR(255),
+        podejrzana BOOLEAN DEFAULT FALSE,
+        CONSTRAINT proba_wejscia_pkey PRIMARY KEY (id, data_czas),
+        CONSTRAINT fk_proba_bramka FOREIGN KEY (bramka_id) REFERENCES bramka(id),
+        CONSTRAINT fk_proba_pracownik FOREIGN KEY (pracownik_id) REFERENCES pracownik(id) ON DELETE CASCADE
+    ) PARTITION BY RANGE (data_czas);
+
+    EXECUTE format('ALTER TABLE proba_wejscia ALTER COLUMN id SET DEFAULT nextval(%L)', sekwencja);
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY proba_wejscia.id', sekwencja);
+
+    -- Partycja domyślna łapie wpisy spoza utworzonych miesięcy (nie powinna rosnąć)
+    CREATE TABLE proba_wejscia_default PARTITION OF proba_wejscia DEFAULT;
+
+    SELECT COALESCE(min(data_czas)::date, CURRENT_DATE) INTO od FROM proba_wejscia_stara;
+    PERFORM utworz_partycje_proba_wejscia(od, (CURRENT_DATE + interval '3 months')::date);
+
+    INSERT INTO proba_wejscia (id, bramka_id, pracownik_id, data_czas, wynik_qr, wynik_biometryczny,
+                               procent_podobienstwa, status_finalny, sciezka_zdjecia, podejrzana)
+    SELECT id, bramka_id, pracownik_id, COALESCE(data_czas, CURRENT_TIMESTAMP), wynik_qr, wynik_biometryczny,
+           procent_podobienstwa, status_finalny, sciezka_zdjecia, podejrzana
+    FROM proba_wejscia_stara;
+
+    DROP TABLE proba_wejscia_stara;
+END $$;
+
+-- Indeksy na tabeli partycjonowanej (tworzone automatycznie w każdej partycji)
+CREATE INDEX IF NOT EXISTS ix_proba_wejscia_pracownik_czas ON proba_wejscia (pracownik_id, data_czas DESC);
+CREATE INDEX IF NOT EXISTS ix_proba_wejscia_bramka_czas ON proba_wejscia (bramka_id, data_czas);
+CREATE INDEX IF NOT EXISTS ix_proba_wejscia_podejrzane ON proba_wejscia (data_czas) WHERE podejrzana;
+
+-- Zdjęcia referencyjne wyszukiwane są po pracowniku
+CREATE INDEX IF NOT EXISTS ix_zdjecie_referencyjne_pracownik_id ON zdjecie_referencyjne (pracownik_id);
@@ -0,0 +1,34 @@
+-- Zagregowane statystyki wejść (godzinowo / dobowo, per bramka i per pracownik),
+-- aktualizowane przez zapis logów. Migracja wypełnia je na podstawie dotychczasowej historii.
+CREATE TABLE IF NOT EXISTS statystyka_wejsc (
+    ziarno VARCHAR NOT NULL,
+    wymiar VARCHAR NOT NULL,
+    wymiar_id INTEGER NOT NULL,
+    poczatek TIMESTAMP NOT NULL,
+    proby INTEGER NOT NULL DEFAULT 0,
+    wejscia INTEGER NOT NULL DEFAULT 0,
+    bledy_qr INTEGER NOT NULL DEFAULT 0,
+    bledy_biometrii INTEGER NOT NULL DEFAULT 0,
+    podejrzane INTEGER NOT NULL DEFAULT 0,
+    suma_podobienstwa FLOAT NOT NULL DEFAULT 0,
+    liczba_porownan INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (ziarno, wymiar, wymiar_id, poczatek)
+);
+CREATE INDEX IF NOT EXISTS ix_statystyka_wejsc_okres ON statystyka_wejsc (ziarno, wymiar, poczatek);
+
+TRUNCATE statystyka_wejsc;
+
+INSERT INTO statystyka_wejsc
+SELECT z.ziarno, w.wymiar, w.wymiar_id, date_trunc(z.jednostka, p.data_czas AT TIME ZONE 'UTC') AS poczatek,
+       count(*),
+       count(*) FILTER (WHERE p.status_finalny = 'SUKCES'),
+       count(*) FILTER (WHERE COALESCE(p.wynik_qr, '') <> 'OK'),
+       count(*) FILTER (WHERE p.wynik_biometryczny = 'NO_MATCH'),
+       count(*) FILTER (WHERE p.podejrzana),
+       COALESCE(sum(p.procent_podobienstwa) FILTER (WHERE p.wynik_biometryczny IN ('MATCH', 'NO_MATCH')), 0),
+       count(*) FILTER (WHERE p.wynik_biometryczny IN ('MATCH', 'NO_MATCH'))
+FROM proba_wejscia p
+CROSS JOIN (VALUES ('godzina', 'hour'), ('dzien', 'day')) AS z(ziarno, jednostka)
+CROSS JOIN LATERAL (VALUES ('bramka', p.bramka_id), ('pracownik', p.pracownik_id)) AS w(wymiar, wymiar_id)
+WHERE w.wymiar_id IS NOT NULL
+GROUP BY z.ziarno, w.wymiar, w.wymiar_id, 4;
@@ -0,0 +1,2 @@
+-- Detektor twarzy wybierany per bramka (NULL = globalny FACE_DETECTOR)
+ALTER TABLE bramka ADD COLUMN IF NOT EXISTS detektor VARCHAR(50);
@@ -0,0 +1,8 @@
+-- Dziennik zmian dla bramek offline: przepustki i wzorce twarzy zmienione po danej wersji (id).
+-- Pełny stan (since=0) budowany jest z bieżących tabel, więc dziennik nie wymaga wypełnienia.
+CREATE TABLE IF NOT EXISTS zmiana_synchronizacji (
+    id SERIAL PRIMARY KEY,
+    typ VARCHAR NOT NULL,
+    klucz VARCHAR NOT NULL,
+    data_czas TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,5 @@
+-- Identyfikator próby nadawany przez bramkę (UUID) - ponowna wysyłka tej samej próby z kolejki
+-- offline nie tworzy drugiego wpisu. Indeks unikalny na tabeli partycjonowanej musi zawierać
+-- klucz partycjonowania; bramka wysyła próbę zawsze z tym samym data_czas.
+ALTER TABLE proba_wejscia ADD COLUMN IF NOT EXISTS id_proby VARCHAR(36);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_proba_wejscia_id_proby ON proba_wejscia (id_proby, data_czas);
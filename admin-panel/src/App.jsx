@@ -57,10 +57,9 @@ function App() {
                 savedDbId = response.id;
             }
 
-            // Masowe wgrywanie zdjęć
+            // Masowe wgrywanie zdjęć (jedno żądanie, wektory twarzy liczone w tle na serwerze)
             if (formData.photoFiles && formData.photoFiles.length > 0 && savedDbId) {
-                const uploadPromises = formData.photoFiles.map(file => api.uploadPhoto(savedDbId, file));
-                await Promise.all(uploadPromises);
+                await api.uploadPhotos(savedDbId, formData.photoFiles);
             }
 
             await loadEmployees();
@@ -1,18 +1,22 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { UserCheck, ShieldAlert, BadgeAlert, Activity, BarChart3, Fingerprint, Clock, ScanLine } from 'lucide-react';
 import { api } from '../services/api';
 
+// Funkcja pomocnicza: Czy status oznacza sukces?
+const isSuccess = (status) => {
+    const s = status ? status.toUpperCase() : "";
+    return ["GRANTED", "MATCH", "SUKCES", "OK"].includes(s);
+};
+
+// Incydent: próba oznaczona jako podejrzana lub odrzucona biometrycznie mimo ważnej przepustki
+const isIncident = (log) => Boolean(log.podejrzana) || (log.wynik_qr === 'OK' && log.wynik_biometryczny === 'NO_MATCH');
+
 const EmployeeReports = ({ employees }) => {
     const [selectedDbId, setSelectedDbId] = useState('');
     const [stats, setStats] = useState(null);
     const [recentLogs, setRecentLogs] = useState([]);
     const [loading, setLoading] = useState(false);
-
-    // Funkcja pomocnicza: Czy status oznacza sukces?
-    const isSuccess = (status) => {
-        const s = status ? status.toUpperCase() : "";
-        return ["GRANTED", "MATCH", "SUKCES", "OK"].includes(s);
-    };
+    const liveCounter = useRef(0);
 
     // Funkcja pomocnicza: Normalizacja procentów (naprawa błędu 4899%)
     const normalizeConfidence = (val) => {
@@ -32,26 +36,21 @@ const EmployeeReports = ({ employees }) => {
             }
             setLoading(true);
             try {
-                const logs = await api.getEmployeeLogs(selectedDbId);
-
-                // 1. Liczenie statystyk z uwzględnieniem różnych nazw statusów
-                const entries = logs.filter(l => isSuccess(l.status_finalny)).length;
-
-                // Odmowy to wszystko co nie jest sukcesem
-                const denied = logs.filter(l => !isSuccess(l.status_finalny)).length;
-
-                const suspicious = logs.filter(l => l.podejrzana || (l.wynik_qr === 'OK' && l.wynik_biometryczny === 'NO_MATCH')).length;
-
-                // 2. Obliczanie średniej zgodności (naprawa matematyki)
-                // Najpierw normalizujemy każdą wartość do skali 0-100, potem sumujemy
-                const totalConf = logs.reduce((acc, curr) => {
-                    const val = curr.procent_podobienstwa || 0;
-                    return acc + normalizeConfidence(val);
-                }, 0);
-
-                const avgConf = logs.length ? Math.round(totalConf / logs.length) : 0;
-
-                setStats({ entries, denied, suspicious, efficiency: avgConf });
+                const [logs, statystyki] = await Promise.all([
+                    api.getEmployeeLogs(selectedDbId),
+                    api.getEmployeeStats(selectedDbId)
+                ]);
+
+                // Statystyki z agregatów serwera - obejmują całą historię, nie tylko pobraną stronę logów
+                const summary = statystyki.podsumowanie;
+                setStats({
+                    entries: summary.wejscia,
+                    denied: summary.proby - summary.wejscia,
+                    // Odmowa biometryczna zawsze jest oznaczana jako podejrzana, więc suma obu zbiorów
+                    // to zwykle `podejrzane`; max chroni starsze wpisy NO_MATCH bez flagi
+                    suspicious: Math.max(summary.podejrzane, summary.bledy_biometrii),
+                    efficiency: summary.srednie_podobienstwo !== null ? Math.round(summary.srednie_podobienstwo) : 0
+                });
                 setRecentLogs(logs);
             } catch (error) {
                 console.error("Błąd pobierania raportu:", error);
@@ -62,6 +61,24 @@ const EmployeeReports = ({ employees }) => {
         fetchLogs();
     }, [selectedDbId]);
 
+    // Nowe próby wybranego pracownika na żywo (SSE) zamiast ponownego pobierania /logi/
+    useEffect(() => {
+        if (!selectedDbId) return;
+        const unsubscribe = api.subscribeEvents((event) => {
+            if (event.typ !== 'weryfikacja' || String(event.pracownik_id) !== String(selectedDbId)) return;
+            liveCounter.current += 1;
+            const log = { ...event, id: `live-${liveCounter.current}`, data_czas: event.czas };
+            setRecentLogs(prev => [log, ...prev].slice(0, 500));
+            setStats(prev => prev && {
+                ...prev,
+                entries: prev.entries + (isSuccess(event.status_finalny) ? 1 : 0),
+                denied: prev.denied + (isSuccess(event.status_finalny) ? 0 : 1),
+                suspicious: prev.suspicious + (isIncident(event) ? 1 : 0)
+            });
+        });
+        return unsubscribe;
+    }, [selectedDbId]);
+
     const getStatusStyle = (status) => {
         if (isSuccess(status)) return 'bg-green-100 text-green-700 border-green-200';
         if (status?.includes('DENIED') || status === 'NO_MATCH' || status?.includes('ODMOWA')) return 'bg-red-100 text-red-700 border-red-200';
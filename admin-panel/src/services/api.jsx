@@ -3,11 +3,19 @@ const API_URL = "http://localhost:8000"; // Adres Twojego backendu FastAPI
 export const api = {
     // --- PRACOWNICY ---
 
-    // Pobierz wszystkich pracowników
+    // Pobierz wszystkich pracowników (API zwraca strony - pobieramy kolejne po kursorze)
     async getEmployees() {
-        const response = await fetch(`${API_URL}/pracownicy`);
-        if (!response.ok) throw new Error('Błąd pobierania danych');
-        const data = await response.json();
+        const data = [];
+        let cursor = null;
+        do {
+            const params = new URLSearchParams({ limit: 1000 });
+            if (cursor) params.append('kursor', cursor);
+            const response = await fetch(`${API_URL}/pracownicy?${params}`);
+            if (!response.ok) throw new Error('Błąd pobierania danych');
+            const page = await response.json();
+            data.push(...page.items);
+            cursor = page.next_cursor;
+        } while (cursor);
 
         // Mapowanie: Backend (PL snake_case) -> Frontend (ENG camelCase)
         return data.map(emp => ({
@@ -70,6 +78,28 @@ export const api = {
         return await response.json();
     },
 
+    // Wiele zdjęć jednym żądaniem - serwer liczy wzorzec twarzy raz, w tle
+    async uploadPhotos(dbId, files) {
+        const formData = new FormData();
+        formData.append('pracownik_id', dbId);
+        files.forEach(file => formData.append('pliki', file));
+
+        const response = await fetch(`${API_URL}/pracownik/zdjecia`, {
+            method: 'POST',
+            body: formData,
+        });
+
+        if (!response.ok) throw new Error('Błąd wgrywania zdjęć');
+        return await response.json(); // { job_id, paths, msg }
+    },
+
+    // Status przetwarzania zdjęć: oczekuje / przetwarzanie / zakonczone / blad
+    async getEnrollmentStatus(jobId) {
+        const response = await fetch(`${API_URL}/enrollment/${jobId}`);
+        if (!response.ok) throw new Error('Błąd pobierania statusu');
+        return await response.json();
+    },
+
     // --- PRZEPUSTKI QR ---
     async generateQrPass(dbId) {
         // Ważność: 1 rok od dzisiaj
@@ -102,9 +132,43 @@ export const api = {
     },
 
     // --- RAPORTY / LOGI ---
-    async getEmployeeLogs(dbId) {
-        const response = await fetch(`${API_URL}/logi/?pracownik_id=${dbId}`);
+    // Najnowsze wpisy pracownika (pierwsza strona)
+    async getEmployeeLogs(dbId, limit = 500) {
+        const page = await this.getEmployeeLogsPage(dbId, null, limit);
+        return page.items;
+    },
+
+    // Jedna strona logów: { items, next_cursor } - kolejną pobiera się z next_cursor
+    async getEmployeeLogsPage(dbId, cursor = null, limit = 100) {
+        const params = new URLSearchParams({ pracownik_id: dbId, limit });
+        if (cursor) params.append('kursor', cursor);
+        const response = await fetch(`${API_URL}/logi/?${params}`);
         if (!response.ok) throw new Error('Błąd pobierania logów');
         return await response.json();
+    },
+
+    // Statystyki pracownika z agregatów (cała historia, bez pobierania logów)
+    async getEmployeeStats(dbId) {
+        const params = new URLSearchParams({ wymiar: 'pracownik', wymiar_id: dbId, ziarno: 'dzien' });
+        const response = await fetch(`${API_URL}/raporty/statystyki?${params}`);
+        if (!response.ok) throw new Error('Błąd pobierania statystyk');
+        return await response.json();
+    },
+
+    // --- ZDARZENIA NA ŻYWO ---
+    // Subskrypcja wyników weryfikacji i alertów (SSE, przeglądarka sama wznawia połączenie).
+    // gateIds - opcjonalna lista bramek. Zwraca funkcję kończącą subskrypcję.
+    subscribeEvents(onEvent, gateIds = null) {
+        const params = gateIds && gateIds.length ? `?bramki=${gateIds.join(',')}` : '';
+        const source = new EventSource(`${API_URL}/zdarzenia/stream${params}`);
+        ['weryfikacja', 'alert'].forEach(type =>
+            source.addEventListener(type, e => onEvent(JSON.parse(e.data)))
+        );
+        return () => source.close();
+    },
+
+    // Link do pełnego eksportu logów pracownika (csv / ndjson, strumieniowo)
+    getEmployeeLogsExportUrl(dbId, format = 'csv') {
+        return `${API_URL}/logi/?pracownik_id=${dbId}&format=${format}`;
     }
 };
\ No newline at end of file
@@ -0,0 +1,191 @@
+import bisect
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+# --- KONFIGURACJA ---
+# Okno (s) i liczba nieudanych weryfikacji biometrycznych tej samej przepustki / pracownika
+ANOMALY_FAILURE_WINDOW_S = float(os.getenv("ANOMALY_FAILURE_WINDOW_S", 300))
+ANOMALY_QR_FAILURES = int(os.getenv("ANOMALY_QR_FAILURES", 3))
+ANOMALY_EMPLOYEE_FAILURES = int(os.getenv("ANOMALY_EMPLOYEE_FAILURES", 5))
+# Ta sama przepustka na bramkach w różnych lokalizacjach w odstępie krótszym niż N s
+ANOMALY_TRAVEL_S = float(os.getenv("ANOMALY_TRAVEL_S", 120))
+# Seria nieprawidłowych kodów QR na jednej bramce (próby zgadywania / skanowanie kopii)
+ANOMALY_INVALID_QR_BURST = int(os.getenv("ANOMALY_INVALID_QR_BURST", 10))
+ANOMALY_BURST_WINDOW_S = float(os.getenv("ANOMALY_BURST_WINDOW_S", 60))
+# Ile alertów trzymamy w pamięci (bufor cykliczny dla /alerty)
+ANOMALY_ALERT_BUFFER = int(os.getenv("ANOMALY_ALERT_BUFFER", 1000))
+# Maksymalna liczba śledzonych kluczy (QR / pracownik / bramka) - najdawniej używane są usuwane
+ANOMALY_MAX_KEYS = int(os.getenv("ANOMALY_MAX_KEYS", 100000))
+
+# Wynik próby przekazywany do detektora
+WYNIK_OK = "OK"
+WYNIK_QR = "QR"  # Nieprawidłowa / nieważna przepustka
+WYNIK_BIOMETRIA = "BIOMETRIA"  # Twarz nie pasuje do przepustki
+WYNIK_BLAD = "BLAD"  # Błąd systemu - nie świadczy o nadużyciu
+
+
+class _Okna:
+    """Przesuwne okna czasowe per klucz (deque znaczników czasu) z limitem liczby kluczy."""
+
+    def __init__(self, okno_s: float, max_keys: int = ANOMALY_MAX_KEYS):
+        self.okno_s = okno_s
+        self.max_keys = max_keys
+        self._dane = OrderedDict()
+
+    def dodaj(self, klucz, teraz: float) -> int:
+        """Dodaje zdarzenie i zwraca liczbę zdarzeń tego klucza w oknie (zamortyzowane O(1))."""
+        kolejka = self._dane.get(klucz)
+        if kolejka is None:
+            kolejka = self._dane[klucz] = deque()
+            if len(self._dane) > self.max_keys:
+                self._dane.popitem(last=False)
+        else:
+            self._dane.move_to_end(klucz)
+        if not kolejka or teraz >= kolejka[-1]:
+            kolejka.append(teraz)
+            liczba = None
+        else:
+            # Zdarzenie z przeszłości (próba z bramki offline) - na swoje miejsce w kolejności czasu
+            bisect.insort(kolejka, teraz)
+            liczba = bisect.bisect_right(kolejka, teraz) - bisect.bisect_left(kolejka, teraz - self.okno_s)
+        granica = kolejka[-1] - self.okno_s
+        while kolejka[0] < granica:
+            kolejka.popleft()
+        return len(kolejka) if liczba is None else liczba
+
+    def wyczysc(self, klucz):
+        self._dane.pop(klucz, None)
+
+
+class AnomalyDetector:
+    """
+    Wykrywanie podejrzanych prób wejścia w locie, bez zapytań do historii logów.
+    Każde zdarzenie aktualizuje liczniki w przesuwnych oknach (per QR, pracownik, bramka)
+    i sprawdza reguły; wykryte alerty trafiają do bufora cyklicznego.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bledy_qr = _Okna(ANOMALY_FAILURE_WINDOW_S)
+        self._bledy_pracownika = _Okna(ANOMALY_FAILURE_WINDOW_S)
+        self._zle_qr_bramki = _Okna(ANOMALY_BURST_WINDOW_S)
+        self._ostatnie_uzycie = OrderedDict()  # QR -> (czas, bramka_id, lokalizacja)
+        self._wyciszone = {}  # (reguła, klucz) -> czas końca wyciszenia
+        self._alerty = deque(maxlen=ANOMALY_ALERT_BUFFER)
+        self._licznik = itertools.count(1)
+
+    def zdarzenie(self, bramka: dict, wynik: str, qr_data: str = None, pracownik_id: int = None,
+                  teraz: float = None):
+        """
+        Rejestruje próbę wejścia. Zwraca (podejrzana, nowe_alerty): próba jest podejrzana, gdy
+        spełnia którąkolwiek regułę, nawet jeśli alert dla tej reguły był już niedawno zgłoszony.
+        """
+        teraz = time.monotonic() if teraz is None else teraz
+        nowe = []
+        with self._lock:
+            if wynik == WYNIK_QR:
+                # Nieprawidłowych kodów nie śledzimy per QR (dowolne śmieci), tylko per bramka
+                liczba = self._zle_qr_bramki.dodaj(bramka["id"], teraz)
+                if liczba >= ANOMALY_INVALID_QR_BURST:
+                    nowe += self._alert("seria_nieprawidlowych_qr", ("bramka", bramka["id"]), teraz,
+                                        ANOMALY_BURST_WINDOW_S, bramka,
+                                        f"{liczba} nieprawidłowych kodów QR w {ANOMALY_BURST_WINDOW_S:.0f} s")
+                return bool(nowe), [a for a in nowe if a]
+
+            if qr_data:
+                nowe += self._sprawdz_przemieszczenie(bramka, qr_data, pracownik_id, teraz)
+
+            if wynik == WYNIK_BIOMETRIA:
+                # Próby z bramek offline nie mają treści QR - liczą się tylko per pracownik
+                liczba = self._bledy_qr.dodaj(qr_data, teraz) if qr_data else 0
+                if liczba >= ANOMALY_QR_FAILURES:
+                    nowe += self._alert("powtarzane_bledy_przepustki", ("qr", qr_data), teraz,
+                                        ANOMALY_FAILURE_WINDOW_S, bramka,
+                                        f"{liczba} nieudane weryfikacje twarzy tą samą przepustką",
+                                        pracownik_id)
+                if pracownik_id is not None:
+                    liczba = self._bledy_pracownika.dodaj(pracownik_id, teraz)
+                    if liczba >= ANOMALY_EMPLOYEE_FAILURES:
+                        nowe += self._alert("powtarzane_bledy_pracownika", ("pracownik", pracownik_id), teraz,
+                                            ANOMALY_FAILURE_WINDOW_S, bramka,
+                                            f"{liczba} odmów dla pracownika w {ANOMALY_FAILURE_WINDOW_S:.0f} s",
+                                            pracownik_id)
+            elif wynik == WYNIK_OK and qr_data:
+                # Udane wejście zeruje serię błędów tej przepustki
+                self._bledy_qr.wyczysc(qr_data)
+        return bool(nowe), [a for a in nowe if a]
+
+    def _sprawdz_przemieszczenie(self, bramka: dict, qr_data: str, pracownik_id, teraz: float) -> list:
+        poprzednie = self._ostatnie_uzycie.pop(qr_data, None)
+        self._ostatnie_uzycie[qr_data] = (teraz, bramka["id"], bramka.get("lokalizacja"))
+        if len(self._ostatnie_uzycie) > ANOMALY_MAX_KEYS:
+            self._ostatnie_uzycie.popitem(last=False)
+        if poprzednie is None:
+            return []
+
+        czas, bramka_id, lokalizacja = poprzednie
+        # Bramki w tej samej lokalizacji (np. sąsiednie kołowroty) nie są "odległe"
+        inna_lokalizacja = (lokalizacja != bramka.get("lokalizacja")) if lokalizacja and bramka.get("lokalizacja") \
+            else bramka_id != bramka["id"]
+        odstep = teraz - czas
+        if bramka_id == bramka["id"] or not inna_lokalizacja or odstep >= ANOMALY_TRAVEL_S:
+            return []
+        return self._alert("przepustka_na_dwoch_bramkach", ("qr", qr_data), teraz, ANOMALY_TRAVEL_S, bramka,
+                           f"Przepustka użyta na bramce {bramka_id} i {bramka['id']} w odstępie {odstep:.0f} s",
+                           pracownik_id)
+
+    def _alert(self, regula: str, klucz, teraz: float, wyciszenie_s: float, bramka: dict, opis: str,
+               pracownik_id: int = None) -> list:
+        """Spełniona reguła: [alert] albo [None], jeśli alert dla tego klucza jest wyciszony."""
+        # Jedna reguła dla jednego klucza alarmuje najwyżej raz na okno
+        if self._wyciszone.get((regula, klucz), 0) > teraz:
+            return [None]
+        self._wyciszone[(regula, klucz)] = teraz + wyciszenie_s
+        if len(self._wyciszone) > ANOMALY_MAX_KEYS:
+            self._wyciszone = {k: v for k, v in self._wyciszone.items() if v > teraz}
+
+        alert = {
+            "id": next(self._licznik),
+            "czas": datetime.now(timezone.utc).isoformat(),
+            "regula": regula,
+            "opis": opis,
+            "bramka_id": bramka["id"],
+            "pracownik_id": pracownik_id,
+        }
+        self._alerty.append(alert)
+        print(f"🚨 [Anomalie] {regula}: {opis} (bramka {bramka['id']})")
+        return [alert]
+
+    def zdarzenie_offline(self, rekord: dict) -> tuple:
+        """
+        Próba rozstrzygnięta przez bramkę bez łączności (POST /sync/proby). Czas próby jest
+        przeliczany na zegar detektora, więc reguły okien działają jak dla prób online.
+        """
+        data_czas = rekord["data_czas"]
+        if data_czas.tzinfo is None:
+            data_czas = data_czas.replace(tzinfo=timezone.utc)
+        wiek = max(0.0, (datetime.now(timezone.utc) - data_czas).total_seconds())
+        if rekord.get("wynik_qr") == "INVALID":
+            wynik = WYNIK_QR
+        elif rekord.get("wynik_biometryczny") == "NO_MATCH":
+            wynik = WYNIK_BIOMETRIA
+        elif rekord.get("status_finalny") == "SUKCES":
+            wynik = WYNIK_OK
+        else:
+            wynik = WYNIK_BLAD
+        return self.zdarzenie({"id": rekord["bramka_id"]}, wynik, pracownik_id=rekord.get("pracownik_id"),
+                              teraz=time.monotonic() - wiek)
+
+    def alerty(self, po_id: int = 0, limit: int = 100) -> list:
+        """Alerty nowsze niż po_id (od najstarszego) - klient odpytuje z ostatnim znanym id."""
+        with self._lock:
+            nowe = [a for a in self._alerty if a["id"] > po_id]
+        return nowe[:limit]
+
+
+# Globalna instancja używana przez main.py
+anomaly_detector = AnomalyDetector()
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+# --- KONFIGURACJA ---
+# Włącza łączenie wycinków twarzy z równoległych żądań w paczki dla ArcFace
+BATCH_INFERENCE = os.getenv("BATCH_INFERENCE", "0") == "1"
+# Maksymalny rozmiar paczki i maksymalny czas czekania na jej zapełnienie (ms)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 8))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 5))
+
+
+class MicroBatcher:
+    """
+    Dynamiczne łączenie w paczki: wątki zgłaszają pojedyncze wejścia (np. wyrównane
+    wycinki twarzy), wątek paczkujący zbiera je do BATCH_MAX_SIZE lub przez
+    BATCH_MAX_WAIT_MS od pierwszego zgłoszenia, wykonuje jedno wywołanie `forward`
+    dla całej paczki i rozsyła wyniki do czekających.
+    """
+
+    def __init__(self, forward, max_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS,
+                 name: str = "batcher"):
+        self.forward = forward  # forward(np.ndarray [N, ...]) -> np.ndarray [N, ...]
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+        # Metryki
+        self._batches = 0
+        self._items = 0
+        self._sizes = Counter()
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._forward_total = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, item: np.ndarray) -> Future:
+        """Zgłasza jedno wejście; wynik (wiersz wyjścia `forward`) przychodzi w Future."""
+        if self._thread is None:
+            self.start()
+        future = Future()
+        with self._cond:
+            self._queue.append((item, future, time.perf_counter()))
+            if len(self._queue) == 1 or len(self._queue) >= self.max_size:
+                self._cond.notify()
+        return future
+
+    def __call__(self, item: np.ndarray, timeout: float = None) -> np.ndarray:
+        return self.submit(item).result(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stop:
+                    self._cond.wait()
+                if self._stop and not self._queue:
+                    return
+                # Pierwsze zgłoszenie wyznacza termin - czekamy najwyżej max_wait na kolejne
+                deadline = self._queue[0][2] + self.max_wait
+                while len(self._queue) < self.max_size and not self._stop:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(self.max_size, len(self._queue)))]
+
+            self._process(batch)
+
+    def _process(self, batch):
+        start = time.perf_counter()
+        futures = [f for _, f, _ in batch]
+        try:
+            outputs = self.forward(np.stack([item for item, _, _ in batch]))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        for future, output in zip(futures, outputs):
+            future.set_result(output)
+
+        waits = [start - submitted for _, _, submitted in batch]
+        with self._cond:
+            self._batches += 1
+            self._items += len(batch)
+            self._sizes[len(batch)] += 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+            self._forward_total += finished - start
+
+    def metrics(self) -> dict:
+        """Wypełnienie paczek i opóźnienie kolejkowania (od zgłoszenia do startu paczki)."""
+        with self._cond:
+            batches, items = self._batches, self._items
+            return {
+                "wlaczone": True,
+                "max_rozmiar": self.max_size,
+                "max_czekanie_ms": self.max_wait * 1000,
+                "paczki": batches,
+                "wejscia": items,
+                "sredni_rozmiar": round(items / batches, 2) if batches else 0.0,
+                "wypelnienie": round(items / (batches * self.max_size), 3) if batches else 0.0,
+                "rozklad_rozmiarow": dict(sorted(self._sizes.items())),
+                "sredni_czas_w_kolejce_ms": round(1000 * self._wait_total / items, 3) if items else 0.0,
+                "max_czas_w_kolejce_ms": round(1000 * self._wait_max, 3),
+                "sredni_czas_paczki_ms": round(1000 * self._forward_total / batches, 3) if batches else 0.0,
+                "oczekujace": len(self._queue),
+            }
@@ -0,0 +1,270 @@
+import argparse
+import contextlib
+import csv
+import io
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import date
+
+from sqlalchemy import insert
+
+from database import SessionLocal
+from models import Administrator, Pracownik, ZdjecieReferencyjne
+from face_recognition_system import DB_FOLDER, enroll_people_batch
+from gate_sync import zmiany, ZMIANA_WZORZEC
+
+# --- KONFIGURACJA ---
+# Liczba równoległych wątków liczących wektory twarzy podczas importu
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 4))
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+# Limity archiwum zip wgrywanego przez API (rozpakowywane są tylko zdjęcia)
+IMPORT_ZIP_MAX_FILES = int(os.getenv("IMPORT_ZIP_MAX_FILES", 20000))
+IMPORT_ZIP_MAX_MB = int(os.getenv("IMPORT_ZIP_MAX_MB", 2048))
+
+# Kolumny pliku CSV (kolumna "zdjecia" jest opcjonalna: ścieżki oddzielone średnikiem)
+REQUIRED_COLUMNS = ("id_pracownika", "imie", "nazwisko", "data_zatrudnienia")
+
+
+@contextlib.contextmanager
+def otworz_zrodlo_zdjec(sciezka):
+    """Zwraca katalog ze zdjęciami - archiwum zip rozpakowywane jest do katalogu tymczasowego."""
+    if sciezka is None:
+        yield None
+    elif zipfile.is_zipfile(sciezka):
+        with tempfile.TemporaryDirectory() as tmp:
+            with zipfile.ZipFile(sciezka) as archiwum:
+                archiwum.extractall(tmp, members=_zdjecia_archiwum(archiwum))
+            yield tmp
+    elif os.path.isdir(sciezka):
+        yield sciezka
+    else:
+        raise ValueError("Zdjęcia muszą być archiwum zip lub katalogiem")
+
+
+def _zdjecia_archiwum(archiwum: zipfile.ZipFile) -> list:
+    """
+    Pliki zdjęć z archiwum po sprawdzeniu limitów liczby i rozmiaru po rozpakowaniu
+    (małe archiwum może rozpakować się do wielu GB). zipfile nie czyta więcej niż
+    rozmiar zadeklarowany w nagłówku, więc suma z infolist() jest wiążąca.
+    """
+    zdjecia = [i for i in archiwum.infolist()
+               if not i.is_dir() and i.filename.lower().endswith(IMAGE_EXTENSIONS)]
+    if len(zdjecia) > IMPORT_ZIP_MAX_FILES:
+        raise ValueError(f"Za dużo zdjęć w archiwum: {len(zdjecia)} (limit {IMPORT_ZIP_MAX_FILES})")
+    rozmiar = sum(i.file_size for i in zdjecia)
+    if rozmiar > IMPORT_ZIP_MAX_MB * 2 ** 20:
+        raise ValueError(f"Zdjęcia w archiwum po rozpakowaniu zajmują {rozmiar / 2 ** 20:.0f} MB "
+                         f"(limit {IMPORT_ZIP_MAX_MB} MB)")
+    return zdjecia
+
+
+def _w_katalogu(katalog, sciezka):
+    """Ścieżka względna z CSV rozwiązana wewnątrz katalogu zdjęć (bez wyjścia przez ../, / ani dowiązania)."""
+    baza = os.path.realpath(katalog)
+    pelna = os.path.realpath(os.path.join(baza, sciezka))
+    if os.path.commonpath([baza, pelna]) != baza:
+        raise ValueError(f"Ścieżka zdjęcia poza katalogiem zdjęć: {sciezka}")
+    return pelna
+
+
+def _znajdz_zdjecia(katalog, wiersz):
+    """Zdjęcia z kolumny 'zdjecia' lub, domyślnie, z podkatalogu <id_pracownika>/."""
+    if katalog is None:
+        return []
+    if wiersz.get("zdjecia"):
+        return [_w_katalogu(katalog, p.strip()) for p in wiersz["zdjecia"].split(";") if p.strip()]
+    folder = _w_katalogu(katalog, wiersz["id_pracownika"].strip())
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def _nazwa_docelowa(zrodlo, zajete):
+    """Nazwa pliku w folderze pracownika - różne zdjęcia o tej samej nazwie nie nadpisują się."""
+    nazwa = os.path.basename(zrodlo)
+    rdzen, rozszerzenie = os.path.splitext(nazwa)
+    numer = 1
+    while nazwa in zajete:
+        nazwa = f"{rdzen}_{numer}{rozszerzenie}"
+        numer += 1
+    zajete.add(nazwa)
+    return nazwa
+
+
+def _przygotuj_wiersz(wiersz, administrator_id):
+    for kolumna in REQUIRED_COLUMNS:
+        if not (wiersz.get(kolumna) or "").strip():
+            raise ValueError(f"Brak wartości w kolumnie '{kolumna}'")
+    id_pracownika = wiersz["id_pracownika"].strip()
+    # ID jest nazwą folderu w reference_faces
+    if id_pracownika in (".", "..") or os.path.basename(id_pracownika) != id_pracownika or "\\" in id_pracownika:
+        raise ValueError("Nieprawidłowe ID pracownika (niedozwolone znaki ścieżki)")
+    try:
+        data_zatrudnienia = date.fromisoformat(wiersz["data_zatrudnienia"].strip())
+    except ValueError:
+        raise ValueError("Nieprawidłowa data zatrudnienia (oczekiwano RRRR-MM-DD)")
+
+    return {
+        "administrator_id": administrator_id,
+        "id_pracownika": wiersz["id_pracownika"].strip(),
+        "imie": wiersz["imie"].strip(),
+        "nazwisko": wiersz["nazwisko"].strip(),
+        "email": (wiersz.get("email") or "").strip() or None,
+        "stanowisko": (wiersz.get("stanowisko") or "").strip() or None,
+        "data_zatrudnienia": data_zatrudnienia,
+    }
+
+
+def _kopiuj_i_zatwierdz(db, kopie: dict):
+    """Kopiuje zdjęcia (cel -> źródło) i zatwierdza transakcję; przy błędzie usuwa skopiowane pliki."""
+    skopiowane = []
+    try:
+        for sciezka, zrodlo in kopie.items():
+            os.makedirs(os.path.dirname(sciezka), exist_ok=True)
+            shutil.copyfile(zrodlo, sciezka)
+            skopiowane.append(sciezka)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        for sciezka in skopiowane:
+            with contextlib.suppress(OSError):
+                os.remove(sciezka)
+        for folder in {os.path.dirname(s) for s in skopiowane}:
+            with contextlib.suppress(OSError):
+                os.rmdir(folder)  # Tylko pusty - folder istniejącego pracownika zostaje
+        raise
+
+
+def importuj_pracownikow(db, csv_text: str, katalog_zdjec=None, administrator_id: int = 1,
+                         workers: int = IMPORT_WORKERS):
+    """
+    Import wielu pracowników naraz:
+    1. walidacja wierszy CSV (błędy zbierane per wiersz),
+    2. jeden bulk INSERT pracowników i jeden zdjęć referencyjnych,
+    3. równoległe liczenie wektorów dla wszystkich zdjęć i jeden zapis bazy wektorów.
+    """
+    start = time.perf_counter()
+
+    if not db.query(Administrator).filter(Administrator.id == administrator_id).first():
+        raise ValueError("Brak administratora. Użyj /setup/admin")
+
+    wiersze = list(csv.DictReader(io.StringIO(csv_text)))
+    bledy = []
+
+    ids_w_pliku = [(w.get("id_pracownika") or "").strip() for w in wiersze]
+    istniejace = {
+        r[0] for r in db.query(Pracownik.id_pracownika).filter(Pracownik.id_pracownika.in_(ids_w_pliku)).all()
+    }
+
+    pracownicy = []
+    zdjecia_zrodlowe = {}
+    widziane = set()
+    for numer, wiersz in enumerate(wiersze, start=2):  # Wiersz 1 to nagłówek
+        try:
+            dane = _przygotuj_wiersz(wiersz, administrator_id)
+            if dane["id_pracownika"] in istniejace:
+                raise ValueError("Pracownik o tym ID już istnieje")
+            if dane["id_pracownika"] in widziane:
+                raise ValueError("Powtórzone ID w pliku CSV")
+            zdjecia = _znajdz_zdjecia(katalog_zdjec, wiersz)
+            brakujace = [p for p in zdjecia if not os.path.isfile(p)]
+            if brakujace:
+                raise ValueError(f"Brak plików zdjęć: {', '.join(os.path.basename(p) for p in brakujace)}")
+        except ValueError as e:
+            bledy.append({"wiersz": numer, "id_pracownika": wiersz.get("id_pracownika"), "blad": str(e)})
+            continue
+
+        widziane.add(dane["id_pracownika"])
+        pracownicy.append(dane)
+        zdjecia_zrodlowe[dane["id_pracownika"]] = zdjecia
+
+    if not pracownicy:
+        return {"zaimportowano": 0, "zdjecia": 0, "bez_twarzy": 0, "czas_s": 0.0,
+                "zdjec_na_sekunde": 0.0, "bledy": bledy}
+
+    # Docelowe ścieżki zdjęć w folderach pracowników (kopiowane dopiero po udanym INSERT)
+    kopie = {}
+    for id_pracownika, zdjecia in zdjecia_zrodlowe.items():
+        folder = os.path.join(DB_FOLDER, id_pracownika)
+        zajete = set()
+        for zrodlo in dict.fromkeys(zdjecia):  # Ten sam plik podany dwa razy - jedna kopia
+            kopie[os.path.join(folder, _nazwa_docelowa(zrodlo, zajete))] = zrodlo
+    zdjecia_osob = {id_pracownika: [] for id_pracownika in zdjecia_zrodlowe}
+    for sciezka in kopie:
+        zdjecia_osob[os.path.basename(os.path.dirname(sciezka))].append(sciezka)
+
+    # Jeden INSERT dla pracowników i jeden dla zdjęć
+    wynik = db.execute(insert(Pracownik).returning(Pracownik.id, Pracownik.id_pracownika), pracownicy)
+    id_bazy = {r.id_pracownika: r.id for r in wynik}
+    zdjecia_wiersze = [
+        {"pracownik_id": id_bazy[id_pracownika], "sciezka_pliku": sciezka}
+        for id_pracownika, sciezki in zdjecia_osob.items() for sciezka in sciezki
+    ]
+    if zdjecia_wiersze:
+        db.execute(insert(ZdjecieReferencyjne), zdjecia_wiersze)
+    _kopiuj_i_zatwierdz(db, kopie)
+
+    # Wektory twarzy dla wszystkich zdjęć naraz
+    embed_start = time.perf_counter()
+    osoby_z_wzorcem, bez_twarzy = enroll_people_batch(
+        {k: v for k, v in zdjecia_osob.items() if v}, workers=workers
+    )
+    embed_time = time.perf_counter() - embed_start
+    db.add_all(zmiany(ZMIANA_WZORZEC, osoby_z_wzorcem))
+    db.commit()
+
+    z_wzorcem = set(osoby_z_wzorcem)
+    for id_pracownika in zdjecia_osob:
+        if id_pracownika not in z_wzorcem:
+            bledy.append({"wiersz": None, "id_pracownika": id_pracownika,
+                          "blad": "Zaimportowano bez wzorca twarzy (brak zdjęć lub nie wykryto twarzy)"})
+    for sciezka in bez_twarzy:
+        bledy.append({"wiersz": None, "id_pracownika": os.path.basename(os.path.dirname(sciezka)),
+                      "blad": f"Nie wykryto twarzy: {os.path.basename(sciezka)}"})
+
+    liczba_zdjec = len(zdjecia_wiersze)
+    return {
+        "zaimportowano": len(pracownicy),
+        "zdjecia": liczba_zdjec,
+        "bez_twarzy": len(bez_twarzy),
+        "czas_s": round(time.perf_counter() - start, 3),
+        "zdjec_na_sekunde": round(liczba_zdjec / embed_time, 2) if embed_time > 0 else 0.0,
+        "bledy": bledy,
+    }
+
+
+def importuj_z_pliku(csv_text: str, zrodlo_zdjec=None, administrator_id: int = 1,
+                     workers: int = IMPORT_WORKERS):
+    """Import we własnej sesji bazy - używane przez endpoint (w wątku) i przez CLI."""
+    db = SessionLocal()
+    try:
+        with otworz_zrodlo_zdjec(zrodlo_zdjec) as katalog:
+            return importuj_pracownikow(db, csv_text, katalog, administrator_id, workers)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import pracowników z CSV wraz ze zdjęciami referencyjnymi")
+    parser.add_argument("csv", help="Plik CSV (id_pracownika,imie,nazwisko,email,stanowisko,data_zatrudnienia[,zdjecia])")
+    parser.add_argument("zdjecia", nargs="?", help="Katalog lub archiwum zip ze zdjęciami")
+    parser.add_argument("--admin", type=int, default=1, help="ID administratora")
+    parser.add_argument("--watki", type=int, default=IMPORT_WORKERS, help="Wątki liczące wektory twarzy")
+    args = parser.parse_args()
+
+    with open(args.csv, encoding="utf-8-sig") as f:
+        csv_text = f.read()
+
+    wynik = importuj_z_pliku(csv_text, args.zdjecia, args.admin, args.watki)
+
+    print(f"✅ Zaimportowano: {wynik['zaimportowano']} pracowników, {wynik['zdjecia']} zdjęć "
+          f"w {wynik['czas_s']} s ({wynik['zdjec_na_sekunde']} zdjęć/s)")
+    for blad in wynik["bledy"]:
+        print(f"❌ Wiersz {blad['wiersz'] or '-'} ({blad['id_pracownika']}): {blad['blad']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+import contextlib
+import json
+import os
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from similarity import normalize as _normalize
+
+# Wymiar wektora ArcFace
+DEFAULT_DIM = 512
+# Minimalna pojemność pliku macierzy (w wierszach)
+MIN_CAPACITY = 64
+# Po tylu wpisach dziennik jest scalany do nowej migawki nagłówka
+JOURNAL_COMPACT_ENTRIES = int(os.getenv("FACE_DB_JOURNAL_COMPACT", 1000))
+
+
+class EmbeddingStore:
+    """
+    Baza wektorów twarzy w postaci ciągłej macierzy float32 mapowanej do pamięci (mmap).
+
+    Pliki na dysku:
+      <nazwa>.f32     - surowa macierz [pojemnosc x dim] float32
+      <nazwa>.json    - migawka nagłówka: id -> numer wiersza, pojemność, generacja
+      <nazwa>.journal - dziennik zmian od migawki: jedna linia JSON na zapis, tylko zmienione id
+
+    Zapis wiersza odbywa się zawsze do wolnego wiersza (copy-on-write), a nowe
+    mapowanie publikowane jest dopisaniem linii do dziennika (fsync). Koszt zapisu
+    zależy od liczby zmienionych wektorów, nie od wielkości bazy - pełna migawka
+    (os.replace) powstaje co JOURNAL_COMPACT_ENTRIES zapisów. Awaria w trakcie
+    zapisu zostawia urwaną ostatnią linię, która jest pomijana - baza wraca do
+    poprzedniego, spójnego stanu. Wolne wiersze to te, których nie ma w mapowaniu.
+
+    Kilka procesów: zapisy są serializowane blokadą pliku, a refresh() dociąga
+    linie dziennika dopisane przez inne procesy.
+
+    normalize=True: wektory zapisywane są znormalizowane (długość 1), więc dystans
+    kosinusowy to sam iloczyn skalarny. Baza zapisana wcześniej bez normalizacji
+    jest przeliczana jednorazowo przy otwarciu.
+    """
+
+    def __init__(self, folder: str, name: str = "face_db", dim: int = DEFAULT_DIM, read_only: bool = False,
+                 normalize: bool = False):
+        self.folder = folder
+        self.data_path = os.path.join(folder, f"{name}.f32")
+        self.header_path = os.path.join(folder, f"{name}.json")
+        self.journal_path = os.path.join(folder, f"{name}.journal")
+        self.lock_path = os.path.join(folder, f"{name}.lock")
+        self.dim = dim
+        self.read_only = read_only
+        self.normalize = normalize
+
+        self._lock = threading.RLock()
+        self._rows = {}
+        self._free = None  # Wyliczane przy pierwszym zapisie
+        self._capacity = 0
+        self._generation = 0
+        self._normalized = False
+        self._header_version = None
+        self._journal_version = None
+        self._journal_offset = 0  # Koniec ostatniej wczytanej (pełnej) linii dziennika
+        self._journal_entries = 0
+        self._data = None
+
+        os.makedirs(folder, exist_ok=True)
+        self._open()
+        if normalize and not self._normalized and self._rows and not read_only:
+            # Jednorazowa migracja: przepisanie wszystkich wierszy (copy-on-write, jeden wpis dziennika)
+            self.put_many(dict(self.items()))
+
+    # --- ODCZYT NAGŁÓWKA, DZIENNIKA I MAPOWANIE PLIKU ---
+
+    @staticmethod
+    def _file_version(path, with_mtime: bool = True):
+        """os.replace podmienia plik (nowy i-węzeł); dziennik zmienia się też przez dopisanie."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns) if with_mtime else st.st_ino
+
+    def _open(self):
+        self._rows, self._capacity, self._generation, self._normalized = {}, 0, 0, False
+        if os.path.exists(self.header_path):
+            with open(self.header_path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+            self.dim = header["dim"]
+            self._capacity = header["pojemnosc"]
+            self._rows = header["wiersze"]
+            self._generation = header["generacja"]
+            self._normalized = header.get("znormalizowane", False)
+        self._header_version = self._file_version(self.header_path)
+        self._journal_version = self._file_version(self.journal_path, with_mtime=False)
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._read_journal()
+        self._free = None
+        self._map_data()
+
+    def _read_journal(self) -> bool:
+        """Nakłada nowe linie dziennika. Zwraca True, jeśli mapowanie się zmieniło."""
+        if self._journal_version is None:
+            return False
+        changed = False
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._journal_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Linia w trakcie zapisu lub urwana przy awarii
+                self._journal_offset += len(line)
+                self._journal_entries += 1
+                entry = json.loads(line)
+                # Wpisy sprzed migawki (awaria między migawką a wyczyszczeniem dziennika)
+                if entry["generacja"] > self._generation:
+                    self._apply(entry)
+                    changed = True
+        return changed
+
+    def _apply(self, entry):
+        for person_id in entry["usuniete"]:
+            self._rows.pop(person_id, None)
+        self._rows.update(entry["wiersze"])
+        self._capacity = entry["pojemnosc"]
+        self._generation = entry["generacja"]
+        self._normalized = entry["znormalizowane"]
+
+    def _map_data(self):
+        if self._capacity == 0:
+            self._data = None
+            return
+        mode = "r" if self.read_only else "r+"
+        self._data = np.memmap(self.data_path, dtype=np.float32, mode=mode, shape=(self._capacity, self.dim))
+
+    def refresh(self):
+        """Dociąga zmiany zapisane przez inne procesy (drugi worker, tryb tylko do odczytu)."""
+        with self._lock:
+            if (self._file_version(self.header_path) != self._header_version
+                    or self._file_version(self.journal_path, with_mtime=False) != self._journal_version):
+                # Nowa migawka (scalenie dziennika) - wczytanie od początku
+                self._open()
+                return
+            capacity = self._capacity
+            if self._read_journal():
+                self._free = None
+                if self._capacity != capacity:
+                    self._map_data()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Blokada zapisu między procesami - każdy zapis zaczyna od aktualnego stanu."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # --- ZAPIS ---
+
+    def _free_rows(self) -> list:
+        if self._free is None:
+            used = np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+            # Od najwyższego numeru - pop() zwraca najniższy wolny wiersz
+            self._free = np.setdiff1d(np.arange(self._capacity), used)[::-1].tolist()
+        return self._free
+
+    def _commit(self, rows: dict, removed: list, normalized: bool):
+        """Publikuje zmianę mapowania jedną linią dziennika (dane wierszy są już na dysku)."""
+        entry = {
+            "generacja": self._generation + 1,
+            "pojemnosc": self._capacity,
+            "znormalizowane": normalized,
+            "wiersze": rows,
+            "usuniete": removed,
+        }
+        line = (json.dumps(entry) + "\n").encode("utf-8")
+        if self._journal_version is not None and os.path.getsize(self.journal_path) > self._journal_offset:
+            # Urwana linia po awarii poprzedniego zapisu - nowa linia nie może się z nią skleić
+            os.truncate(self.journal_path, self._journal_offset)
+        with open(self.journal_path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._journal_version is None:
+            self._journal_version = self._file_version(self.journal_path, with_mtime=False)
+        self._journal_offset += len(line)
+        self._journal_entries += 1
+        self._apply(entry)
+
+        if self._journal_entries >= JOURNAL_COMPACT_ENTRIES:
+            self._compact()
+
+    def _compact(self):
+        """Nowa migawka nagłówka i pusty dziennik (jedyny zapis o koszcie zależnym od wielkości bazy)."""
+        header = {
+            "dim": self.dim,
+            "pojemnosc": self._capacity,
+            "wiersze": self._rows,
+            "generacja": self._generation,
+            "znormalizowane": self._normalized,
+        }
+        tmp_path = self.header_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.header_path)
+
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+
+        self._header_version = self._file_version(self.header_path)
+        self._journal_version = self._file_version(self.journal_path, with_mtime=False)
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+    def _grow(self, needed_rows: int):
+        """Powiększa plik macierzy (co najmniej dwukrotnie) i mapuje go ponownie."""
+        new_capacity = max(MIN_CAPACITY, self._capacity * 2)
+        while new_capacity < needed_rows:
+            new_capacity *= 2
+
+        if self._data is not None:
+            self._data.flush()
+            del self._data
+        with open(self.data_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+
+        # Nowa pojemność trafia do dziennika razem z pierwszym zapisem w nowych wierszach
+        self._capacity = new_capacity
+        self._free = None
+        self._map_data()
+
+    def put_many(self, vectors: dict):
+        """Zapisuje wiele wektorów jednym wpisem dziennika (zapisywane są tylko zmienione wiersze)."""
+        if self.read_only:
+            raise PermissionError("Baza wektorów otwarta tylko do odczytu")
+        if not vectors:
+            return
+
+        prepared = {}
+        for person_id, vector in vectors.items():
+            vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+            if vector.shape[0] != self.dim:
+                raise ValueError(f"Nieprawidłowy wymiar wektora: {vector.shape[0]} (oczekiwano {self.dim})")
+            prepared[person_id] = _normalize(vector) if self.normalize else vector
+
+        with self._lock, self._file_lock():
+            self.refresh()
+            if len(self._free_rows()) < len(prepared):
+                self._grow(len(self._rows) + len(prepared))
+            free = self._free_rows()
+
+            written = {}
+            released = []
+            try:
+                for person_id, vector in prepared.items():
+                    row = free.pop()
+                    self._data[row] = vector
+                    if person_id in self._rows:
+                        released.append(self._rows[person_id])
+                    written[person_id] = row
+
+                # Baza jest w całości znormalizowana, gdy była już wcześniej albo nadpisano wszystkie wiersze
+                normalized = self.normalize and (self._normalized or self._rows.keys() <= prepared.keys())
+
+                # Najpierw dane na dysk, dopiero potem publikacja nowego mapowania
+                self._data.flush()
+                self._commit(written, [], normalized)
+            except BaseException:
+                self._free = None
+                raise
+            # Stare wiersze nadpisanych osób są wolne dopiero po publikacji
+            free.extend(released)
+
+    def delete(self, person_id: str) -> bool:
+        return self.delete_many([person_id]) > 0
+
+    def delete_many(self, person_ids) -> int:
+        """Usuwa wiele wpisów jednym wpisem dziennika. Zwraca liczbę usuniętych."""
+        if self.read_only:
+            raise PermissionError("Baza wektorów otwarta tylko do odczytu")
+        with self._lock, self._file_lock():
+            self.refresh()
+            removed = list(dict.fromkeys(p for p in person_ids if p in self._rows))
+            if removed:
+                released = [self._rows[person_id] for person_id in removed]
+                free = self._free_rows()
+                self._commit({}, removed, self._normalized)
+                free.extend(released)
+            return len(removed)
+
+    # --- INTERFEJS SŁOWNIKA (zgodny z poprzednim dict-em) ---
+
+    def __contains__(self, person_id):
+        return person_id in self._rows
+
+    def __getitem__(self, person_id):
+        with self._lock:
+            return np.array(self._data[self._rows[person_id]])
+
+    def __setitem__(self, person_id, vector):
+        self.put_many({person_id: vector})
+
+    def __delitem__(self, person_id):
+        if not self.delete(person_id):
+            raise KeyError(person_id)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def keys(self):
+        return list(self._rows.keys())
+
+    def items(self):
+        with self._lock:
+            return [(person_id, np.array(self._data[row])) for person_id, row in self._rows.items()]
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def matrix(self):
+        """Zwraca (lista id, macierz [n x dim]) wszystkich zapisanych wektorów."""
+        with self._lock:
+            ids = list(self._rows.keys())
+            if not ids:
+                return ids, np.empty((0, self.dim), dtype=np.float32)
+            rows = np.fromiter(self._rows.values(), dtype=np.int64, count=len(ids))
+            return ids, np.asarray(self._data[rows])
@@ -0,0 +1,168 @@
+import itertools
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from face_recognition_system import update_person_embedding_files
+from gate_sync import zarejestruj_zmiany, ZMIANA_WZORZEC
+
+# --- KONFIGURACJA ---
+# Wątki przetwarzające zdjęcia referencyjne (nie zabierają puli inferencji bramkom)
+ENROLLMENT_WORKERS = int(os.getenv("ENROLLMENT_WORKERS", 1))
+# Ile zleceń wątek zbiera w jedną paczkę i jak długo na nie czeka
+ENROLLMENT_BATCH_SIZE = int(os.getenv("ENROLLMENT_BATCH_SIZE", 32))
+ENROLLMENT_BATCH_WAIT_MS = int(os.getenv("ENROLLMENT_BATCH_WAIT_MS", 200))
+# Ile zakończonych zleceń trzymamy w pamięci do odpytywania statusu
+ENROLLMENT_MAX_JOBS = int(os.getenv("ENROLLMENT_MAX_JOBS", 10000))
+
+# Statusy zleceń
+STATUS_OCZEKUJE = "oczekuje"
+STATUS_PRZETWARZANIE = "przetwarzanie"
+STATUS_ZAKONCZONE = "zakonczone"
+STATUS_BLAD = "blad"
+
+
+class EnrollmentQueue:
+    """
+    Lokalna kolejka zleceń wyliczenia wektorów twarzy po wgraniu zdjęć.
+    Zlecenia dotyczące tej samej osoby zebrane w jednej paczce są liczone raz
+    (np. 3 zdjęcia wgrane równolegle z panelu = jedno przeliczenie wzorca).
+    """
+
+    def __init__(self, workers: int = ENROLLMENT_WORKERS):
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"enrollment-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stop.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    def submit(self, person_id: str, files) -> str:
+        """Dodaje zlecenie do kolejki i zwraca jego identyfikator."""
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "id_pracownika": person_id,
+            "pliki": list(files),
+            "status": STATUS_OCZEKUJE,
+            "utworzono": datetime.now().isoformat(),
+            "zakonczono": None,
+            "blad": None,
+            "twarze": None,  # Po przetworzeniu: {plik zlecenia: czy wykryto twarz}
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._evict()
+        self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _evict(self):
+        # Usuwamy najstarsze zakończone zlecenia - także te za starszym, jeszcze przetwarzanym
+        nadmiar = len(self._jobs) - ENROLLMENT_MAX_JOBS
+        if nadmiar <= 0:
+            return
+        zakonczone = (job_id for job_id, job in self._jobs.items()
+                      if job["status"] in (STATUS_ZAKONCZONE, STATUS_BLAD))
+        for job_id in list(itertools.islice(zakonczone, nadmiar)):
+            del self._jobs[job_id]
+
+    def _set_status(self, job_ids, status, error=None):
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                job["status"] = status
+                job["blad"] = error
+                if status in (STATUS_ZAKONCZONE, STATUS_BLAD):
+                    job["zakonczono"] = datetime.now().isoformat()
+
+    def _set_result(self, job_ids, detected: dict):
+        """Status każdego zlecenia z wyników jego własnych zdjęć (nie pozostałych zdjęć osoby)."""
+        detected = {os.path.realpath(path): found for path, found in detected.items()}
+        for job_id in job_ids:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                # Plik usunięty przed przetworzeniem liczy się jak zdjęcie bez twarzy
+                job["twarze"] = {plik: detected.get(os.path.realpath(plik), False) for plik in job["pliki"]}
+                bez_twarzy = [plik for plik, found in job["twarze"].items() if not found]
+            if len(bez_twarzy) < len(job["pliki"]):
+                self._set_status([job_id], STATUS_ZAKONCZONE)
+            else:
+                self._set_status([job_id], STATUS_BLAD,
+                                 f"Nie wykryto twarzy na zdjęciach: {', '.join(map(os.path.basename, bez_twarzy))}")
+
+    def _collect_batch(self, first_job_id):
+        """Zbiera kolejne zlecenia do paczki (limit rozmiaru i czasu oczekiwania)."""
+        batch = [first_job_id]
+        deadline = time.monotonic() + ENROLLMENT_BATCH_WAIT_MS / 1000
+        while len(batch) < ENROLLMENT_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                job_id = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if job_id is None:
+                self._queue.put(None)
+                break
+            batch.append(job_id)
+        return batch
+
+    def _worker(self):
+        while not self._stop.is_set():
+            job_id = self._queue.get()
+            if job_id is None:
+                break
+
+            batch = self._collect_batch(job_id)
+
+            # Grupowanie po osobie - jedno przeliczenie wzorca na pracownika
+            by_person = OrderedDict()
+            with self._lock:
+                for jid in batch:
+                    job = self._jobs.get(jid)
+                    if job is not None:
+                        by_person.setdefault(job["id_pracownika"], []).append(jid)
+
+            for person_id, job_ids in by_person.items():
+                self._set_status(job_ids, STATUS_PRZETWARZANIE)
+                try:
+                    detected = update_person_embedding_files(person_id)
+                    if any(detected.values()):
+                        zarejestruj_zmiany(ZMIANA_WZORZEC, [person_id])
+                    self._set_result(job_ids, detected)
+                except Exception as e:
+                    print(f"Błąd przetwarzania zdjęć ({person_id}): {e}")
+                    self._set_status(job_ids, STATUS_BLAD, str(e))
+
+
+# Globalna instancja używana przez main.py
+enrollment_queue = EnrollmentQueue()
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+
+# --- KONFIGURACJA ---
+# Ile zdarzeń czeka na wolnego klienta; przy przepełnieniu najstarsze są odrzucane
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 256))
+# Co ile sekund wysyłać sygnał podtrzymania (SSE/WebSocket bez ruchu)
+EVENT_HEARTBEAT_S = float(os.getenv("EVENT_HEARTBEAT_S", 15))
+
+
+class Subskrypcja:
+    """Kolejka jednego podłączonego panelu z opcjonalnym filtrem bramek."""
+
+    def __init__(self, bramki=None, maxsize: int = EVENT_QUEUE_SIZE):
+        self.bramki = set(bramki) if bramki else None
+        self.kolejka = asyncio.Queue(maxsize=maxsize)
+        self.pominiete = 0  # Zdarzenia odrzucone, bo klient nie nadążał
+
+    def pasuje(self, zdarzenie: dict) -> bool:
+        return self.bramki is None or zdarzenie.get("bramka_id") in self.bramki
+
+    def wstaw(self, zdarzenie: dict):
+        # Wolny klient nie blokuje publikującego - tracimy najstarsze zdarzenie, nie najnowsze
+        if self.kolejka.full():
+            self.kolejka.get_nowait()
+            self.pominiete += 1
+        self.kolejka.put_nowait(zdarzenie)
+
+    async def nastepne(self, timeout: float = EVENT_HEARTBEAT_S):
+        """Kolejne zdarzenie lub None po `timeout` s bez zdarzeń (czas na heartbeat)."""
+        try:
+            zdarzenie = await asyncio.wait_for(self.kolejka.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if self.pominiete:
+            zdarzenie = {**zdarzenie, "pominiete": self.pominiete}
+            self.pominiete = 0
+        return zdarzenie
+
+
+class EventHub:
+    """
+    Rozgłaszanie zdarzeń z bramek (wyniki weryfikacji, alerty) do podłączonych paneli.
+    Publikacja to tylko wstawienie do kolejek w pamięci - liczba paneli nie zwiększa
+    obciążenia bazy. Wywoływane z pętli zdarzeń (kolejki asyncio nie są bezpieczne dla wątków).
+    """
+
+    def __init__(self):
+        self._subskrypcje = set()
+
+    def subskrybuj(self, bramki=None) -> Subskrypcja:
+        subskrypcja = Subskrypcja(bramki)
+        self._subskrypcje.add(subskrypcja)
+        return subskrypcja
+
+    def anuluj(self, subskrypcja: Subskrypcja):
+        self._subskrypcje.discard(subskrypcja)
+
+    def publikuj(self, typ: str, dane: dict):
+        if not self._subskrypcje:
+            return
+        zdarzenie = {"typ": typ, "czas": datetime.now(timezone.utc).isoformat(), **dane}
+        for subskrypcja in list(self._subskrypcje):
+            if subskrypcja.pasuje(zdarzenie):
+                subskrypcja.wstaw(zdarzenie)
+
+    @property
+    def subskrybenci(self) -> int:
+        return len(self._subskrypcje)
+
+
+def parsuj_bramki(bramki: str = None):
+    """Filtr z parametru zapytania "1,2,5" (None = wszystkie bramki)."""
+    if not bramki:
+        return None
+    try:
+        return {int(b) for b in bramki.split(",") if b.strip()}
+    except ValueError:
+        raise ValueError("Parametr bramki musi być listą liczb, np. 1,2")
+
+
+def format_sse(zdarzenie: dict) -> str:
+    return f"event: {zdarzenie['typ']}\ndata: {json.dumps(zdarzenie, ensure_ascii=False)}\n\n"
+
+
+# Globalna instancja używana przez main.py
+event_hub = EventHub()
@@ -0,0 +1,58 @@
+import os
+import time
+from datetime import datetime
+
+# --- KONFIGURACJA ---
+UPLOAD_DIR = "uploads"
+
+# Które zdjęcia z bramek zachowujemy jako dowód:
+#   "wszystkie"  - każdą próbę (również z nieprawidłowym QR)
+#   "biometria"  - próby, w których QR był poprawny i doszło do porównania twarzy
+#   "podejrzane" - tylko próby oznaczone jako podejrzane lub zakończone błędem
+#   "brak"       - nie zapisujemy zdjęć
+EVIDENCE_POLICY = os.getenv("EVIDENCE_POLICY", "biometria")
+# Po ilu dniach zdjęcia dowodowe są usuwane (0 = bez limitu)
+EVIDENCE_RETENTION_DAYS = int(os.getenv("EVIDENCE_RETENTION_DAYS", 90))
+
+POLICIES = ("wszystkie", "biometria", "podejrzane", "brak")
+if EVIDENCE_POLICY not in POLICIES:
+    raise ValueError(f"Nieznana polityka EVIDENCE_POLICY: {EVIDENCE_POLICY} (dozwolone: {', '.join(POLICIES)})")
+
+
+def czy_zachowac(qr_poprawny: bool, podejrzana: bool = False) -> bool:
+    """Czy zdjęcie z tej próby należy zapisać na dysku zgodnie z polityką."""
+    if EVIDENCE_POLICY == "wszystkie":
+        return True
+    if EVIDENCE_POLICY == "biometria":
+        return qr_poprawny
+    if EVIDENCE_POLICY == "podejrzane":
+        return podejrzana
+    return False
+
+
+def sciezka_dowodu(bramka_id: int) -> str:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return os.path.join(UPLOAD_DIR, f"entry_{bramka_id}_{timestamp}.jpg")
+
+
+def zapisz_dowod(dane: bytes, sciezka: str) -> str:
+    """Zapisuje bajty zdjęcia pod wskazaną ścieżką."""
+    with open(sciezka, "wb") as f:
+        f.write(dane)
+    return sciezka
+
+
+def usun_stare_dowody() -> int:
+    """Usuwa zdjęcia dowodowe starsze niż EVIDENCE_RETENTION_DAYS. Zwraca liczbę usuniętych plików."""
+    if EVIDENCE_RETENTION_DAYS <= 0 or not os.path.isdir(UPLOAD_DIR):
+        return 0
+    granica = time.time() - EVIDENCE_RETENTION_DAYS * 86400
+    usuniete = 0
+    with os.scandir(UPLOAD_DIR) as pliki:
+        for plik in pliki:
+            if plik.is_file() and plik.stat().st_mtime < granica:
+                os.remove(plik.path)
+                usuniete += 1
+    if usuniete:
+        print(f"-> [Dowody] Usunięto {usuniete} zdjęć starszych niż {EVIDENCE_RETENTION_DAYS} dni.")
+    return usuniete
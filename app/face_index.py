@@ -0,0 +1,372 @@
+import os
+import threading
+import numpy as np
+
+from similarity import EMBEDDING_QUANT, PQ_CENTROIDS, PQ_MIN_TRAIN, create_codec, normalize as _normalize
+
+# --- KONFIGURACJA ---
+# Backend indeksu wyszukiwania 1:N: "exact" (pełne mnożenie macierzy), "ivf" (lokalny IVF), "hnsw" (hnswlib)
+FACE_INDEX_BACKEND = os.getenv("FACE_INDEX_BACKEND", "exact")
+# IVF: liczba list (0 = automatycznie ~ sqrt(n)) i liczba przeszukiwanych list
+IVF_NLIST = int(os.getenv("IVF_NLIST", 0))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 8))
+# HNSW: parametry grafu
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 64))
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+def _top_k(similarities, k):
+    """Indeksy k największych podobieństw (argpartition + sortowanie tylko k elementów)."""
+    k = min(k, similarities.shape[0])
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-similarities, k - 1)[:k]
+    return top[np.argsort(-similarities[top])]
+
+
+class FaceIndex:
+    """
+    Interfejs indeksu wektorów twarzy. Wektory przechowywane są znormalizowane,
+    a wyniki zwracane jako lista (id osoby, dystans kosinusowy) rosnąco po dystansie.
+    """
+
+    name = "base"
+    # Przybliżone dystanse z kodów (int8 / pq) - wywołujący przelicza czołówkę dokładnie
+    quant = "float32"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._lock = threading.RLock()
+
+    def build(self, ids, matrix):
+        raise NotImplementedError
+
+    def add(self, person_id: str, vector):
+        raise NotImplementedError
+
+    def remove(self, person_id: str) -> bool:
+        raise NotImplementedError
+
+    def search(self, vector, top_k: int = 5):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class ExactIndex(FaceIndex):
+    """
+    Wyszukiwanie dokładne - jedno mnożenie macierz x wektor nad wszystkimi osobami.
+    Wiersze mogą być skompresowane (EMBEDDING_QUANT): int8 lub pq zmniejszają pamięć
+    i ruch pamięci przy skanie kosztem przybliżonych dystansów.
+    """
+
+    name = "exact"
+
+    def __init__(self, dim: int, quant: str = EMBEDDING_QUANT):
+        super().__init__(dim)
+        self.quant = quant
+        self._codec = create_codec(dim, quant)
+        self._ids = []
+        self._positions = {}
+        self._codes = self._codec.empty(0)
+        self._size = 0
+
+    def build(self, ids, matrix):
+        matrix = _normalize(matrix).reshape(-1, self.dim)
+        with self._lock:
+            if self.quant == "pq":
+                # Słowniki PQ uczone są na bazie - przy małej bazie wystarcza int8
+                enough = len(ids) >= max(PQ_MIN_TRAIN, PQ_CENTROIDS)
+                codec = create_codec(self.dim, "pq" if enough else "int8")
+                codec.train(matrix)
+                if codec.name != self._codec.name:
+                    print(f"--- [AI] Indeks: kwantyzacja '{codec.name}' ({len(ids)} osób, PQ od {PQ_MIN_TRAIN}) ---")
+                self._codec = codec
+            self._ids = list(ids)
+            self._positions = {person_id: i for i, person_id in enumerate(self._ids)}
+            self._codes = self._codec.encode(matrix)
+            self._size = len(self._ids)
+
+    def add(self, person_id, vector):
+        code = self._codec.encode(vector)[0]
+        with self._lock:
+            if person_id in self._positions:
+                self._codes[self._positions[person_id]] = code
+                return
+            # Pojemność rośnie dwukrotnie - dopisanie jest amortyzowane O(1)
+            if self._size == self._codes.shape[0]:
+                grown = self._codec.empty(max(16, self._size * 2))
+                grown[:self._size] = self._codes[:self._size]
+                self._codes = grown
+            self._codes[self._size] = code
+            self._positions[person_id] = self._size
+            self._ids.append(person_id)
+            self._size += 1
+
+    def remove(self, person_id):
+        with self._lock:
+            pos = self._positions.pop(person_id, None)
+            if pos is None:
+                return False
+            # Usunięcie przez zamianę z ostatnim wierszem
+            last = self._size - 1
+            if pos != last:
+                moved_id = self._ids[last]
+                self._codes[pos] = self._codes[last]
+                self._ids[pos] = moved_id
+                self._positions[moved_id] = pos
+            self._ids.pop()
+            self._size -= 1
+            return True
+
+    def search(self, vector, top_k=5):
+        query = _normalize(vector).reshape(-1)
+        with self._lock:
+            if self._size == 0:
+                return []
+            similarities = self._codec.similarities(self._codes[:self._size], query)
+            top = _top_k(similarities, top_k)
+            return [(self._ids[i], float(1.0 - similarities[i])) for i in top]
+
+    @property
+    def nbytes(self) -> int:
+        """Pamięć zajmowana przez wiersze indeksu."""
+        return self._size * self._codec.bytes_per_vector
+
+    def __len__(self):
+        return self._size
+
+
+class IVFIndex(FaceIndex):
+    """
+    Przybliżone wyszukiwanie IVF (inverted file): wektory podzielone k-means na listy,
+    zapytanie przeszukuje tylko nprobe najbliższych list.
+    """
+
+    name = "ivf"
+
+    def __init__(self, dim: int, nlist: int = IVF_NLIST, nprobe: int = IVF_NPROBE, seed: int = 0):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._rng = np.random.default_rng(seed)
+        self._centroids = None
+        self._lists = []  # Każda lista: [ids, macierz]
+        self._where = {}  # id -> (numer listy, pozycja)
+        self._trained_size = 0
+
+    def _train(self, matrix, iterations: int = 10):
+        n = matrix.shape[0]
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        centroids = matrix[self._rng.choice(n, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = self._assign(matrix, centroids)
+            for c in range(nlist):
+                members = matrix[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+                else:
+                    # Pusta lista - losujemy nowy środek
+                    centroids[c] = matrix[self._rng.integers(n)]
+            centroids = _normalize(centroids)
+        return centroids
+
+    @staticmethod
+    def _assign(matrix, centroids, chunk: int = 8192):
+        assignment = np.empty(matrix.shape[0], dtype=np.int64)
+        for start in range(0, matrix.shape[0], chunk):
+            assignment[start:start + chunk] = np.argmax(matrix[start:start + chunk] @ centroids.T, axis=1)
+        return assignment
+
+    def build(self, ids, matrix):
+        ids = list(ids)
+        matrix = _normalize(matrix).reshape(-1, self.dim)
+        with self._lock:
+            self._where = {}
+            if not ids:
+                self._centroids = None
+                self._lists = []
+                self._trained_size = 0
+                return
+
+            self._centroids = self._train(matrix)
+            assignment = self._assign(matrix, self._centroids)
+            self._lists = [[[], np.empty((0, self.dim), dtype=np.float32)] for _ in range(len(self._centroids))]
+            for c in range(len(self._centroids)):
+                members = np.flatnonzero(assignment == c)
+                self._lists[c] = [[ids[i] for i in members], matrix[members]]
+                for pos, i in enumerate(members):
+                    self._where[ids[i]] = (c, pos)
+            self._trained_size = len(ids)
+
+    def _all(self):
+        ids = []
+        parts = []
+        for list_ids, list_matrix in self._lists:
+            ids.extend(list_ids)
+            parts.append(list_matrix)
+        matrix = np.vstack(parts) if parts else np.empty((0, self.dim), dtype=np.float32)
+        return ids, matrix
+
+    def add(self, person_id, vector):
+        vector = _normalize(vector).reshape(-1)
+        with self._lock:
+            self.remove(person_id)
+            if self._centroids is None:
+                self.build([person_id], vector[None, :])
+                return
+
+            c = int(np.argmax(self._centroids @ vector))
+            list_ids, list_matrix = self._lists[c]
+            self._where[person_id] = (c, len(list_ids))
+            list_ids.append(person_id)
+            self._lists[c][1] = np.vstack([list_matrix, vector[None, :]])
+
+            # Po czterokrotnym wzroście bazy środki list przestają być reprezentatywne
+            if len(self._where) > 4 * self._trained_size:
+                self.build(*self._all())
+
+    def remove(self, person_id):
+        with self._lock:
+            where = self._where.pop(person_id, None)
+            if where is None:
+                return False
+            c, pos = where
+            list_ids, list_matrix = self._lists[c]
+            last = len(list_ids) - 1
+            if pos != last:
+                moved_id = list_ids[last]
+                list_ids[pos] = moved_id
+                list_matrix[pos] = list_matrix[last]
+                self._where[moved_id] = (c, pos)
+            list_ids.pop()
+            self._lists[c][1] = list_matrix[:last]
+            return True
+
+    def search(self, vector, top_k=5):
+        query = _normalize(vector).reshape(-1)
+        with self._lock:
+            if self._centroids is None or not self._where:
+                return []
+            probe = _top_k(self._centroids @ query, self.nprobe)
+            ids = []
+            parts = []
+            for c in probe:
+                list_ids, list_matrix = self._lists[c]
+                if list_ids:
+                    ids.extend(list_ids)
+                    parts.append(list_matrix)
+            if not ids:
+                return []
+            similarities = np.vstack(parts) @ query
+            top = _top_k(similarities, top_k)
+            return [(ids[i], float(1.0 - similarities[i])) for i in top]
+
+    def __len__(self):
+        return len(self._where)
+
+
+class HNSWIndex(FaceIndex):
+    """Przybliżone wyszukiwanie grafowe HNSW (opcjonalna biblioteka hnswlib)."""
+
+    name = "hnsw"
+
+    def __init__(self, dim: int, m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION,
+                 ef_search: int = HNSW_EF_SEARCH):
+        if hnswlib is None:
+            raise ImportError("Backend 'hnsw' wymaga pakietu hnswlib (pip install hnswlib)")
+        super().__init__(dim)
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._labels = {}  # id osoby -> etykieta w grafie
+        self._ids = {}  # etykieta -> id osoby
+        self._next_label = 0
+        self._index = None
+
+    def _create(self, capacity):
+        self._index = hnswlib.Index(space="ip", dim=self.dim)
+        self._index.init_index(max_elements=max(capacity, 16), ef_construction=self.ef_construction, M=self.m)
+        self._index.set_ef(self.ef_search)
+
+    def build(self, ids, matrix):
+        ids = list(ids)
+        with self._lock:
+            self._create(len(ids) * 2)
+            self._labels = {}
+            self._ids = {}
+            self._next_label = 0
+            if ids:
+                labels = np.arange(len(ids))
+                self._index.add_items(_normalize(matrix).reshape(-1, self.dim), labels)
+                self._labels = {person_id: i for i, person_id in enumerate(ids)}
+                self._ids = {i: person_id for i, person_id in enumerate(ids)}
+                self._next_label = len(ids)
+
+    def add(self, person_id, vector):
+        vector = _normalize(vector).reshape(1, -1)
+        with self._lock:
+            if self._index is None:
+                self._create(16)
+            self.remove(person_id)
+            if self._next_label >= self._index.get_max_elements():
+                self._index.resize_index(self._index.get_max_elements() * 2)
+            label = self._next_label
+            self._next_label += 1
+            self._index.add_items(vector, np.array([label]))
+            self._labels[person_id] = label
+            self._ids[label] = person_id
+
+    def remove(self, person_id):
+        with self._lock:
+            label = self._labels.pop(person_id, None)
+            if label is None:
+                return False
+            self._index.mark_deleted(label)
+            del self._ids[label]
+            return True
+
+    def search(self, vector, top_k=5):
+        query = _normalize(vector).reshape(1, -1)
+        with self._lock:
+            if not self._labels:
+                return []
+            k = min(top_k, len(self._labels))
+            labels, distances = self._index.knn_query(query, k=k)
+            # Przestrzeń "ip" zwraca 1 - iloczyn skalarny, czyli dystans kosinusowy
+            return [(self._ids[int(l)], float(d)) for l, d in zip(labels[0], distances[0])]
+
+    def __len__(self):
+        return len(self._labels)
+
+
+INDEX_BACKENDS = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+    "hnsw": HNSWIndex,
+}
+
+
+def create_index(dim: int, backend: str = FACE_INDEX_BACKEND, quant: str = EMBEDDING_QUANT) -> FaceIndex:
+    """
+    Tworzy indeks wybranego typu; przy braku hnswlib wraca do wyszukiwania dokładnego.
+    Kwantyzacja (quant) dotyczy indeksu dokładnego - IVF i HNSW trzymają wektory float32.
+    """
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Nieznany backend indeksu: {backend}")
+    if backend == "exact":
+        return ExactIndex(dim, quant)
+    try:
+        return INDEX_BACKENDS[backend](dim)
+    except ImportError as e:
+        print(f"--- [AI] {e} - używam indeksu dokładnego ---")
+        return ExactIndex(dim, quant)
@@ -1,53 +1,220 @@
 import os
 import pickle
+import hashlib
 import numpy as np
+import cv2
 from deepface import DeepFace
-from scipy.spatial.distance import cosine
+from embedding_store import EmbeddingStore
+from face_index import create_index
+from similarity import QUANT_RERANK, cosine_distance, cosine_distances, normalize
+from batch_scheduler import MicroBatcher, BATCH_INFERENCE, BATCH_MAX_SIZE
+from inference_pool import INFERENCE_WORKERS
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # --- KONFIGURACJA ---
 # Używamy katalogu reference_faces, który jest już w Twojej strukturze
 DB_FOLDER = "reference_faces"
-DB_FILE = os.path.join(DB_FOLDER, "face_db.pkl")
+# Stary format bazy (pickle) - importowany jednorazowo do nowej bazy mmap
+LEGACY_DB_FILE = os.path.join(DB_FOLDER, "face_db.pkl")
+# Tryb tylko do odczytu dla procesów, które współdzielą bazę i jej nie modyfikują
+DB_READ_ONLY = os.getenv("FACE_DB_READ_ONLY", "0") == "1"
 
 # Ustawienia modelu (z Twojego kodu)
 MODEL = "ArcFace"
-BACKEND = "retinaface"
+# Detektor twarzy: globalnie FACE_DETECTOR, dla bramki można ustawić inny (Bramka.detektor).
+# retinaface jest najdokładniejszy i najwolniejszy; "skip" pomija detekcję - zdjęcie
+# z bramki musi być już wykadrowaną twarzą (np. wycinek z gate_edge).
+BACKEND = os.getenv("FACE_DETECTOR", "retinaface")
+DETECTORS = ("retinaface", "mtcnn", "ssd", "opencv", "yunet", "mediapipe", "skip")
+if BACKEND not in DETECTORS:
+    raise ValueError(f"Nieznany detektor FACE_DETECTOR: {BACKEND} (dozwolone: {', '.join(DETECTORS)})")
 THRESHOLD = 0.50  # Dystans < 0.50 oznacza zgodność dla ArcFace
+THRESHOLD_PERCENT = 90.0  # Wymaganie z dokumentacji (str. 3 i 6) - odpowiada dystansowi THRESHOLD
 
-# Globalna zmienna na bazę w pamięci RAM
+# Globalna baza wektorów (EmbeddingStore - macierz float32 mapowana do pamięci, wiersze znormalizowane)
 _face_database = None
+_db_lock = threading.Lock()
+
+# Cache wektorów pojedynczych zdjęć referencyjnych, klucz: "<id osoby>:<sha256 pliku>"
+_image_cache = None
+# Przeliczenie wzorca jednej osoby naraz (kilka wątków rejestracji, get_reference_vector) -
+# inaczej wygrywa ostatni zapis, liczony z nieaktualnej listy plików. Stała pula blokad po hashu id
+_person_locks = [threading.Lock() for _ in range(64)]
+
+# Indeks wyszukiwania 1:N zsynchronizowany z bazą (generacja bazy, dla której jest aktualny)
+_face_index = None
+_index_generation = None
+_index_lock = threading.Lock()
 
 
 def load_db():
-    """Ładuje bazę wektorów z pliku pickle do pamięci."""
-    global _face_database
-    if os.path.exists(DB_FILE):
-        print(f"--- [AI] Ładowanie bazy wektorów z: {DB_FILE} ---")
-        with open(DB_FILE, 'rb') as f:
-            _face_database = pickle.load(f)
-    else:
-        print("--- [AI] Brak pliku bazy wektorów, tworzę nową. ---")
-        _face_database = {}
+    """Otwiera bazę wektorów (mmap). Przy pierwszym uruchomieniu importuje stary plik pickle."""
+    global _face_database, _image_cache
+    if _face_database is not None:
+        return _face_database
+    # Pierwsze użycie może nastąpić równolegle (rozgrzewka, pula inferencji, wątek rejestracji) -
+    # dwie instancje na tych samych plikach miałyby osobne listy wolnych wierszy
+    with _db_lock:
+        if _face_database is not None:
+            return _face_database
+        print(f"--- [AI] Otwieranie bazy wektorów w: {DB_FOLDER} ---")
+        database = EmbeddingStore(DB_FOLDER, read_only=DB_READ_ONLY, normalize=True)
+        _image_cache = EmbeddingStore(DB_FOLDER, name="image_cache", read_only=DB_READ_ONLY)
+
+        if len(database) == 0 and not DB_READ_ONLY and os.path.exists(LEGACY_DB_FILE):
+            print(f"--- [AI] Import bazy z pliku pickle: {LEGACY_DB_FILE} ---")
+            with open(LEGACY_DB_FILE, 'rb') as f:
+                legacy = pickle.load(f)
+            database.put_many(legacy)
+            os.replace(LEGACY_DB_FILE, LEGACY_DB_FILE + ".migrated")
+
+        _face_database = database
     return _face_database
 
 
-def save_db():
-    """Zapisuje aktualny stan bazy wektorów na dysk."""
-    global _face_database
-    if _face_database is not None:
-        with open(DB_FILE, 'wb') as f:
-            pickle.dump(_face_database, f)
-        print("-> [AI] Zapisano zmiany w bazie wektorów.")
+def _refresh_db():
+    """Dociąga zmiany bazy zapisane przez inne procesy (np. drugi worker, tryb tylko do odczytu)."""
+    if _face_database is None:
+        load_db()
+    _face_database.refresh()
+    _image_cache.refresh()
+
+
+def load_models():
+    """Buduje model ArcFace (DeepFace trzyma go później w pamięci)."""
+    DeepFace.build_model(MODEL)
+
+
+def _recognition_model():
+    """Model Keras ArcFace (nowsze wersje DeepFace opakowują go w klienta z atrybutem .model)."""
+    model = DeepFace.build_model(MODEL)
+    return getattr(model, "model", model)
+
+
+def _input_size():
+    shape = _recognition_model().input_shape  # (None, 112, 112, 3)
+    return shape[1], shape[2]
+
+
+def _resize_with_padding(face: np.ndarray, size) -> np.ndarray:
+    """Skalowanie z zachowaniem proporcji i dopełnieniem zerami (jak w DeepFace)."""
+    h, w = face.shape[:2]
+    factor = min(size[0] / h, size[1] / w)
+    resized = cv2.resize(face, (max(1, int(w * factor)), max(1, int(h * factor))))
+    dh, dw = size[0] - resized.shape[0], size[1] - resized.shape[1]
+    padded = np.pad(resized, ((dh // 2, dh - dh // 2), (dw // 2, dw - dw // 2), (0, 0)), "constant")
+    if padded.shape[:2] != tuple(size):
+        padded = cv2.resize(padded, (size[1], size[0]))
+    return padded
+
+
+def _extract_faces(img, size, detector_backend):
+    try:
+        return DeepFace.extract_faces(img_path=img, target_size=size, detector_backend=detector_backend,
+                                      enforce_detection=True, align=True)
+    except TypeError:
+        # Nowsze DeepFace nie przyjmują target_size - skalujemy sami
+        return DeepFace.extract_faces(img_path=img, detector_backend=detector_backend,
+                                      enforce_detection=True, align=True)
+
+
+def detect_face(img, detector_backend: str = None):
+    """
+    Wykrywa i wyrównuje pierwszą twarz. Zwraca wycinek w formacie wejścia ArcFace
+    (float32, BGR, 0-1, rozmiar wejścia modelu) lub None, gdy nie wykryto twarzy.
+    """
+    detector_backend = detector_backend or BACKEND
+    size = _input_size()
+    if detector_backend == "skip":
+        # Całe zdjęcie traktujemy jako wycinek twarzy
+        face = cv2.imread(img) if isinstance(img, str) else img
+        if face is None:
+            return None
+        return _resize_with_padding(face.astype(np.float32) / 255.0, size)
+    try:
+        faces = _extract_faces(img, size, detector_backend)
+    except ValueError:
+        # DeepFace zgłasza ValueError, gdy nie wykryje twarzy
+        return None
+    # extract_faces zwraca RGB, a represent podaje modelowi BGR
+    face = faces[0]["face"][:, :, ::-1]
+    if face.shape[:2] != size:
+        face = _resize_with_padding(face, size)
+    return face.astype(np.float32)
+
+
+def embed_faces(faces: np.ndarray) -> np.ndarray:
+    """Jedno przejście ArcFace dla paczki wycinków [N, H, W, 3] -> wektory [N, 512]."""
+    return np.asarray(_recognition_model().predict_on_batch(faces))
 
 
-def get_embedding(img_path):
-    """Generuje wektor cech dla podanego obrazu."""
+# Paczkowanie wycinków z równoległych weryfikacji (BATCH_INFERENCE=1). Każdy wątek puli czeka
+# na wynik swojej paczki, więc paczka większa niż pula nigdy by się nie zapełniła i każda
+# weryfikacja czekałaby pełne BATCH_MAX_WAIT_MS - rozmiar ograniczamy do liczby wątków.
+_batcher = MicroBatcher(embed_faces, max_size=max(1, min(BATCH_MAX_SIZE, INFERENCE_WORKERS)),
+                        name="arcface-batch") if BATCH_INFERENCE else None
+
+
+def batching_metrics() -> dict:
+    return _batcher.metrics() if _batcher is not None else {"wlaczone": False}
+
+
+def warm_up(detectors=()):
+    """
+    Rozgrzewka przy starcie aplikacji: ładuje ArcFace i detektory (globalny i ustawione
+    na bramkach), wykonuje próbną inferencję (kompilacja grafu TF) i wczytuje bazę wektorów.
+    """
+    load_models()
+    dummy = np.zeros((224, 224, 3), dtype=np.uint8)
+    for detector in dict.fromkeys((BACKEND, *detectors)):
+        DeepFace.represent(
+            img_path=dummy,
+            model_name=MODEL,
+            enforce_detection=False,
+            detector_backend=detector,
+            align=True
+        )
+    if _batcher is not None:
+        # Próbna paczka w pełnym rozmiarze
+        embed_faces(np.zeros((_batcher.max_size, *_input_size(), 3), dtype=np.float32))
+    if _face_database is None:
+        load_db()
+    _ensure_index()
+    print("--- [AI] Modele i baza wektorów gotowe ---")
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Dekoduje bajty JPEG/PNG prosto z uploadu do tablicy BGR (bez zapisu na dysk)."""
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Nie można zdekodować zdjęcia")
+    return img
+
+
+def _as_image(img):
+    """Ścieżka i tablica numpy idą do DeepFace bez zmian, bajty dekodujemy raz w pamięci."""
+    if isinstance(img, (bytes, bytearray, memoryview)):
+        return decode_image(bytes(img))
+    return img
+
+
+def get_embedding(img_path, detector_backend: str = None):
+    """
+    Generuje wektor cech dla podanego obrazu (ścieżka lub tablica numpy BGR).
+    detector_backend: detektor twarzy (domyślnie globalny FACE_DETECTOR).
+    """
+    detector_backend = detector_backend or BACKEND
     try:
+        if _batcher is not None:
+            # Detekcja w bieżącym wątku, ArcFace w paczce razem z innymi żądaniami
+            face = detect_face(img_path, detector_backend)
+            return None if face is None else _batcher(face).tolist()
         objs = DeepFace.represent(
             img_path=img_path,
             model_name=MODEL,
             enforce_detection=True,
-            detector_backend=BACKEND,
+            detector_backend=detector_backend,
             align=True
         )
         # DeepFace.represent zwraca listę, bierzemy pierwszą twarz
@@ -57,89 +224,299 @@ def get_embedding(img_path):
         return None
 
 
-def update_person_embedding(person_id: str):
+def _file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def update_person_embedding(person_id: str) -> bool:
+    """Wymusza aktualizację wektora osoby. True, jeśli na którymś zdjęciu wykryto twarz."""
+    return any(update_person_embedding_files(person_id).values())
+
+
+def update_person_embedding_files(person_id: str) -> dict:
     """
     Wymusza aktualizację wektora dla konkretnej osoby (np. po dodaniu zdjęcia).
-    Skanuje folder danej osoby i uśrednia wektory.
+    Skanuje folder danej osoby i uśrednia wektory. Przez model przechodzą tylko
+    nowe lub zmienione zdjęcia - pozostałe wektory pochodzą z cache (klucz: hash pliku).
+    Zwraca {ścieżka zdjęcia: czy wykryto twarz}.
     """
-    global _face_database
     if _face_database is None:
         load_db()
+    with _person_locks[hash(person_id) % len(_person_locks)]:
+        return _update_person_embedding_files(person_id)
 
+
+def _update_person_embedding_files(person_id: str) -> dict:
     person_path = os.path.join(DB_FOLDER, person_id)
     if not os.path.exists(person_path):
-        return False
+        return {}
 
     images = [os.path.join(person_path, f) for f in os.listdir(person_path)
               if f.lower().endswith(('.jpg', '.png', '.jpeg'))]
 
     embeddings = []
-    print(f"-> [AI] Przetwarzanie osoby: {person_id} ({len(images)} zdjęć)...")
+    new_entries = {}
+    current_keys = set()
+    detected = {}
 
     for img in images:
+        key = f"{person_id}:{_file_hash(img)}"
+        current_keys.add(key)
+        if key in _image_cache:
+            embeddings.append(_image_cache[key])
+            detected[img] = True
+            continue
+
         emb = get_embedding(img)
+        detected[img] = bool(emb)
         if emb:
             embeddings.append(emb)
+            new_entries[key] = emb
+
+    print(f"-> [AI] Przetwarzanie osoby: {person_id} ({len(images)} zdjęć, nowych wektorów: {len(new_entries)})...")
+
+    # Zapis nowych wektorów i usunięcie tych, których plików już nie ma
+    _image_cache.put_many(new_entries)
+    stale = [k for k in _image_cache.keys() if k.startswith(f"{person_id}:") and k not in current_keys]
+    _image_cache.delete_many(stale)
 
     if embeddings:
-        # Uśredniamy wektory wszystkich zdjęć tej osoby
-        _face_database[person_id] = np.mean(embeddings, axis=0)
-        save_db()
-        return True
-    return False
+        # Uśredniamy wektory wszystkich zdjęć tej osoby (zapis tylko jednego wiersza)
+        centroid = np.mean(embeddings, axis=0)
+        _set_person_vector(person_id, centroid)
+        print("-> [AI] Zapisano zmiany w bazie wektorów.")
+    return detected
 
 
-def verify_face(test_img: str, expected_person: str, threshold: float = THRESHOLD):
+def enroll_people_batch(person_images: dict, workers: int = 4):
     """
-    Główna funkcja wywoływana przez main.py.
-    Sprawdza, czy twarz na zdjęciu test_img należy do expected_person.
+    Wsadowe wyliczenie wzorców dla wielu osób naraz (import całego działu).
+    person_images: id osoby -> lista ścieżek zdjęć.
+    Zdjęcia wszystkich osób przetwarzane są równolegle, a baza wektorów
+    zapisywana jest raz na końcu (jedna podmiana nagłówka).
+    Zwraca (lista osób z wyliczonym wzorcem, lista zdjęć bez wykrytej twarzy).
     """
-    global _face_database
+    if _face_database is None:
+        load_db()
+
+    keys = {}
+    vectors = {}
+    to_embed = []
+    for person_id, paths in person_images.items():
+        for path in paths:
+            key = f"{person_id}:{_file_hash(path)}"
+            keys[path] = key
+            if key in _image_cache:
+                vectors[path] = _image_cache[key]
+            else:
+                to_embed.append(path)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        embedded = list(executor.map(get_embedding, to_embed))
+
+    new_entries = {}
+    failed = []
+    for path, emb in zip(to_embed, embedded):
+        if emb:
+            vectors[path] = emb
+            new_entries[keys[path]] = emb
+        else:
+            failed.append(path)
+    _image_cache.put_many(new_entries)
+
+    centroids = {}
+    for person_id, paths in person_images.items():
+        person_vectors = [vectors[p] for p in paths if p in vectors]
+        if person_vectors:
+            centroids[person_id] = np.mean(person_vectors, axis=0)
+    _set_person_vectors(centroids)
+
+    print(f"-> [AI] Import wsadowy: {len(centroids)} osób, {len(new_entries)} nowych wektorów, "
+          f"{len(failed)} zdjęć bez twarzy.")
+    return list(centroids), failed
+
+
+def _set_person_vector(person_id: str, vector):
+    """Zapisuje wektor w bazie i przyrostowo aktualizuje indeks wyszukiwania."""
+    _set_person_vectors({person_id: vector})
+
+
+def _set_person_vectors(vectors: dict):
+    """Zapisuje wiele wektorów jednym zapisem bazy i aktualizuje indeks wyszukiwania."""
+    global _index_generation
+    if not vectors:
+        return
+    with _index_lock:
+        generation = _face_database.generation
+        in_sync = _face_index is not None and _index_generation == generation
+        _face_database.put_many(vectors)
+        # Zapis dociąga też zmiany innych procesów - wtedy indeks zostaje do przebudowy
+        if in_sync and _face_database.generation == generation + 1:
+            for person_id, vector in vectors.items():
+                _face_index.add(person_id, vector)
+            _index_generation = _face_database.generation
 
-    # 1. Upewnij się, że baza jest załadowana
+
+def remove_person_embedding(person_id: str) -> bool:
+    """Usuwa wektor osoby z bazy i z indeksu (np. po usunięciu pracownika)."""
+    global _index_generation
     if _face_database is None:
         load_db()
+    with _index_lock:
+        generation = _face_database.generation
+        in_sync = _face_index is not None and _index_generation == generation
+        removed = _face_database.delete(person_id)
+        if removed and in_sync and _face_database.generation == generation + 1:
+            _face_index.remove(person_id)
+            _index_generation = _face_database.generation
+
+    # Wektory pojedynczych zdjęć tej osoby nie są już potrzebne
+    _image_cache.delete_many([k for k in _image_cache.keys() if k.startswith(f"{person_id}:")])
+    return removed
+
+
+def get_person_vectors(person_ids) -> dict:
+    """Wektory wzorcowe wskazanych osób (bez wzorca - pominięte), np. dla synchronizacji bramek."""
+    _refresh_db()
+    vectors = {}
+    for person_id in person_ids:
+        try:
+            vectors[person_id] = _face_database[person_id]
+        except KeyError:
+            pass
+    return vectors
+
+
+def distance_to_probability(dist: float, threshold: float = THRESHOLD) -> float:
+    """
+    Konwersja dystansu na procenty dla main.py (który wymaga > 90% dla sukcesu).
+    ArcFace: 0.0 to identyczne, >0.5 to różne.
+    Skalujemy tak, aby próg 0.5 odpowiadał 90% pewności w logice biznesowej.
+    """
+    if dist < threshold:
+        # Skalowanie: 0.0 -> 100%, threshold -> 90%
+        # Wzór: 100 - (dist / threshold) * 10
+        return max(90.0, 100.0 - (dist / threshold) * 10.0)
+    # Skalowanie reszty: threshold -> 89%, 1.0 -> 0%
+    return max(0.0, (1.0 - dist) * 100)
+
+
+def _ensure_index():
+    """
+    Buduje indeks od nowa, jeśli baza zmieniła się poza tym procesem (lub jeszcze go nie ma).
+    Zmiany innych procesów widać po odświeżeniu nagłówka bazy (nowa generacja).
+    """
+    global _face_index, _index_generation
+    _refresh_db()
+    with _index_lock:
+        if _face_index is None or _index_generation != _face_database.generation:
+            ids, matrix = _face_database.matrix()
+            index = create_index(_face_database.dim)
+            index.build(ids, matrix)
+            _face_index = index
+            _index_generation = _face_database.generation
+            print(f"--- [AI] Zbudowano indeks '{index.name}' ({len(ids)} osób) ---")
+        return _face_index
 
-    # 2. Jeśli osoby nie ma w cache (np. dopiero dodana), spróbuj ją przetworzyć
-    if expected_person not in _face_database:
-        print(f"-> [AI] Osoby {expected_person} brak w cache, próba generowania...")
-        found = update_person_embedding(expected_person)
+
+def search_embedding(vector, top_k: int = 5):
+    """
+    Wyszukiwanie 1:N w indeksie (dokładnym lub przybliżonym - FACE_INDEX_BACKEND).
+    Zwraca listę (id osoby, dystans kosinusowy) posortowaną rosnąco po dystansie.
+    Przy skompresowanym indeksie (EMBEDDING_QUANT) czołówka skanu jest przeliczana
+    dokładnie na wektorach float32 z bazy - dystanse są takie jak w verify_face.
+    """
+    index = _ensure_index()
+    if index.quant == "float32":
+        return index.search(vector, top_k)
+
+    shortlist = [person_id for person_id, _ in index.search(vector, max(top_k, QUANT_RERANK))]
+    vectors = get_person_vectors(shortlist)
+    if not vectors:
+        return []
+    ids = list(vectors)
+    dists = cosine_distances(vector, normalize(np.stack([vectors[i] for i in ids])))
+    return [(ids[i], float(dists[i])) for i in np.argsort(dists, kind="stable")[:top_k]]
+
+
+def identify_face(test_img, top_k: int = 5, threshold: float = THRESHOLD, detector_backend: str = None):
+    """
+    Identyfikacja 1:N - do kogo z bazy należy twarz na zdjęciu.
+    Zwraca None, gdy nie wykryto twarzy, w przeciwnym razie listę kandydatów.
+    """
+    current_vector = get_embedding(_as_image(test_img), detector_backend)
+    if current_vector is None:
+        print("-> [AI] Nie wykryto twarzy na zdjęciu do identyfikacji.")
+        return None
+
+    candidates = []
+    for person_id, dist in search_embedding(current_vector, top_k):
+        candidates.append({
+            "id_pracownika": person_id,
+            "dystans": dist,
+            "procent_podobienstwa": distance_to_probability(dist, threshold),
+            "zgodnosc": dist < threshold
+        })
+    return candidates
+
+
+def get_reference_vector(person_id: str):
+    """
+    Wektor wzorcowy osoby. Jeśli osoby nie ma w bazie (np. dopiero dodana), próbuje go
+    wyliczyć ze zdjęć referencyjnych. None, gdy nie ma zdjęć z wykrytą twarzą.
+    """
+    _refresh_db()
+
+    if person_id not in _face_database:
+        print(f"-> [AI] Osoby {person_id} brak w cache, próba generowania...")
+        found = update_person_embedding(person_id)
         if not found:
-            print(f"-> [AI] Nie znaleziono zdjęć referencyjnych dla {expected_person}")
-            return False, 0.0
+            print(f"-> [AI] Nie znaleziono zdjęć referencyjnych dla {person_id}")
+            return None
+    return _face_database[person_id]
+
+
+def embed_image(test_img, detector_backend: str = None):
+    """Wektor twarzy ze zdjęcia z bramki (ścieżka, tablica lub bajty); None, gdy brak twarzy."""
+    return get_embedding(_as_image(test_img), detector_backend)
+
+
+def verify_face(test_img, expected_person: str, threshold: float = THRESHOLD, detector_backend: str = None):
+    """
+    Główna funkcja wywoływana przez main.py.
+    Sprawdza, czy twarz na zdjęciu test_img należy do expected_person.
+    test_img: ścieżka, tablica numpy lub surowe bajty zdjęcia z bramki (dekodowane w pamięci).
+    detector_backend: detektor ustawiony dla bramki (None = globalny).
+    """
+    test_img = _as_image(test_img)
 
-    # 3. Pobierz wektor wzorcowy
-    target_vector = _face_database[expected_person]
+    # 1-3. Wektor wzorcowy (wyliczany, jeśli osoby nie ma jeszcze w bazie)
+    target_vector = get_reference_vector(expected_person)
+    if target_vector is None:
+        return False, 0.0
 
     # 4. Wygeneruj wektor dla zdjęcia z bramki
-    current_vector = get_embedding(test_img)
+    current_vector = get_embedding(test_img, detector_backend)
 
     if current_vector is None:
         print("-> [AI] Nie wykryto twarzy na zdjęciu z bramki.")
         return False, 0.0
 
-    # 5. Oblicz dystans
-    dist = cosine(current_vector, target_vector)
+    # 5. Oblicz dystans (iloczyn skalarny znormalizowanych wektorów float32)
+    dist = cosine_distance(current_vector, target_vector)
 
     # 6. Interpretacja wyniku
     is_match = dist < threshold
 
-    # Konwersja dystansu na procenty dla main.py (który wymaga > 90% dla sukcesu)
-    # ArcFace: 0.0 to identyczne, >0.5 to różne.
-    # Musimy to przeskalować tak, aby próg 0.5 odpowiadał np. 90% pewności w logice biznesowej.
-
-    if is_match:
-        # Skalowanie: 0.0 -> 100%, threshold -> 90%
-        # Wzór: 100 - (dist / threshold) * 10
-        probability = max(90.0, 100.0 - (dist / threshold) * 10.0)
-    else:
-        # Skalowanie reszty: threshold -> 89%, 1.0 -> 0%
-        probability = max(0.0, (1.0 - dist) * 100)
+    probability = distance_to_probability(dist, threshold)
 
     print(
         f"-> [AI] Wynik weryfikacji: {expected_person} | Dystans: {dist:.4f} | Prob: {probability:.2f}% | Match: {is_match}")
 
     return is_match, probability
 
-# Inicjalizacja przy starcie (opcjonalna, main.py i tak wywoła verify)
-# load_db()
\ No newline at end of file
+# Inicjalizacja przy starcie: main.py wywołuje warm_up() w zdarzeniu startup
\ No newline at end of file
@@ -0,0 +1,251 @@
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- KONFIGURACJA ---
+# Jeśli odpalasz bramkę lokalnie, a backend jest w Dockerze -> localhost:8000
+GATE_API_URL = os.getenv("GATE_API_URL", "http://localhost:8000")
+# Limity czasu: nawiązanie połączenia / odpowiedź (weryfikacja na zimnym serwerze trwa dłużej)
+GATE_CONNECT_TIMEOUT_S = float(os.getenv("GATE_CONNECT_TIMEOUT_S", 2))
+GATE_READ_TIMEOUT_S = float(os.getenv("GATE_READ_TIMEOUT_S", 15))
+# Ponowienia z wykładniczym odstępem (backoff * 2^n s). POST ponawiamy tylko przy błędzie połączenia -
+# żądanie nie dotarło do serwera, więc nie zapisze się dwa razy
+GATE_RETRIES = int(os.getenv("GATE_RETRIES", 3))
+GATE_BACKOFF_S = float(os.getenv("GATE_BACKOFF_S", 0.3))
+# Utrzymywane połączenia keep-alive i wątki wysyłające weryfikacje
+GATE_POOL_SIZE = int(os.getenv("GATE_POOL_SIZE", 4))
+GATE_WORKERS = int(os.getenv("GATE_WORKERS", 2))
+# Kolejka wyników do wysłania po odzyskaniu łączności (plik JSONL przetrwa restart bramki)
+GATE_OFFLINE_QUEUE = os.getenv("GATE_OFFLINE_QUEUE", "gate_offline_queue.jsonl")
+GATE_OFFLINE_FLUSH_S = float(os.getenv("GATE_OFFLINE_FLUSH_S", 10))
+GATE_OFFLINE_BATCH = int(os.getenv("GATE_OFFLINE_BATCH", 200))
+
+
+class OfflineQueue:
+    """
+    Trwała kolejka wpisów (ścieżka API, dane JSON) na czas braku łączności z backendem.
+    Wątek w tle co GATE_OFFLINE_FLUSH_S s wysyła zaległe wpisy paczkami (lista JSON
+    pod jedną ścieżkę) i usuwa z pliku te, które serwer przyjął.
+    """
+
+    def __init__(self, client, path: str = GATE_OFFLINE_QUEUE, interval_s: float = GATE_OFFLINE_FLUSH_S):
+        self.client = client
+        self.path = path
+        self.interval_s = interval_s
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="gate-offline-queue", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def dodaj(self, sciezka: str, dane: dict):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"sciezka": sciezka, "dane": dane}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self._wake.set()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._wczytaj())
+
+    def _wczytaj(self) -> list:
+        if not os.path.exists(self.path):
+            return []
+        wpisy = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    wpisy.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Niedokończony wpis po awarii zasilania
+                    print(f"⚠️ Pominięto uszkodzony wpis kolejki offline: {line[:80]}")
+        return wpisy
+
+    def _zapisz(self, wpisy: list):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for wpis in wpisy:
+                f.write(json.dumps(wpis, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def oproznij(self) -> int:
+        """Wysyła zaległe wpisy; zwraca liczbę wysłanych. Przy braku łączności kończy i próbuje później."""
+        with self._lock:
+            wpisy = self._wczytaj()
+        if not wpisy:
+            return 0
+
+        wyslane = set()
+        for sciezka in dict.fromkeys(w["sciezka"] for w in wpisy):
+            indeksy = [i for i, w in enumerate(wpisy) if w["sciezka"] == sciezka]
+            for start in range(0, len(indeksy), GATE_OFFLINE_BATCH):
+                paczka = indeksy[start:start + GATE_OFFLINE_BATCH]
+                try:
+                    response = self.client.post(sciezka, json=[wpisy[i]["dane"] for i in paczka])
+                except requests.exceptions.RequestException:
+                    break  # Backend dalej niedostępny
+                if response.status_code >= 500:
+                    break
+                if response.status_code >= 400:
+                    # Odrzucone przez serwer - ponawianie nic nie zmieni
+                    print(f"⚠️ Serwer odrzucił {len(paczka)} wpisów kolejki offline ({sciezka}): "
+                          f"{response.status_code} {response.text[:200]}")
+                wyslane.update(paczka)
+
+        if wyslane:
+            with self._lock:
+                # Wpisy dodane w trakcie wysyłania są na końcu pliku - zostają
+                aktualne = self._wczytaj()
+                self._zapisz([w for i, w in enumerate(aktualne) if i not in wyslane])
+            print(f"📤 Wysłano {len(wyslane)} zaległych wpisów z kolejki offline.")
+        return len(wyslane)
+
+    def _run(self):
+        while not self._stop:
+            try:
+                self.oproznij()
+            except Exception as e:
+                print(f"⚠️ Błąd kolejki offline: {e}")
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+
+class GateClient:
+    """
+    Klient API dla bramki: jedna sesja HTTP z pulą połączeń keep-alive (bez nowego
+    połączenia TCP przy każdej weryfikacji), limity czasu, ponowienia z backoffem
+    i weryfikacja w wątku roboczym, żeby pętla kamery nie stała w miejscu.
+    """
+
+    def __init__(self, api_url: str = GATE_API_URL, offline_queue_path: str = GATE_OFFLINE_QUEUE):
+        self.api_url = api_url.rstrip("/")
+        self.timeout = (GATE_CONNECT_TIMEOUT_S, GATE_READ_TIMEOUT_S)
+        self.session = requests.Session()
+        retry = Retry(
+            total=GATE_RETRIES,
+            connect=GATE_RETRIES,
+            read=GATE_RETRIES,
+            status=GATE_RETRIES,
+            backoff_factor=GATE_BACKOFF_S,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=GATE_POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=GATE_WORKERS, thread_name_prefix="gate-client")
+        self.offline_queue = OfflineQueue(self, offline_queue_path)
+
+    def start(self):
+        self.offline_queue.start()
+
+    def close(self):
+        self.offline_queue.stop()
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    # --- HTTP ---
+
+    def get(self, sciezka: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(self.api_url + sciezka, **kwargs)
+
+    def post(self, sciezka: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(self.api_url + sciezka, **kwargs)
+
+    # --- API ---
+
+    def gotowy(self) -> bool:
+        try:
+            return self.get("/health/ready", timeout=(GATE_CONNECT_TIMEOUT_S, 2)).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def bramki(self) -> list:
+        response = self.get("/setup/bramki")
+        response.raise_for_status()
+        return response.json()
+
+    def utworz_bramke(self, nazwa: str, lokalizacja: str) -> dict:
+        response = self.post("/setup/bramka", json={"nazwa": nazwa, "lokalizacja": lokalizacja})
+        response.raise_for_status()
+        return response.json()
+
+    def weryfikuj(self, obraz_jpeg: bytes, qr_data: str, bramka_id: int) -> dict:
+        """Weryfikacja (blokująca). Błąd sieci lub 5xx zwraca odmowę zamiast wyjątku (patrz _wynik_weryfikacji)."""
+        files = {'face_image': ('capture.jpg', obraz_jpeg, 'image/jpeg')}
+        data = {'bramka_id': bramka_id, 'qr_data': qr_data}
+        return self._wynik_weryfikacji(lambda: self.post("/verify", data=data, files=files))
+
+    @staticmethod
+    def _wynik_weryfikacji(wyslij) -> dict:
+        """
+        Flaga offline (decyzja lokalna w trybie "auto") tylko wtedy, gdy serwer na pewno nie
+        rozstrzygnął próby: brak połączenia albo 503. Po przekroczeniu czasu odpowiedzi lub
+        innym 5xx serwer mógł już zapisać próbę - bramka odmawia, a osoba próbuje ponownie.
+        """
+        try:
+            response = wyslij()
+            if response.status_code == 503:
+                return {"success": False, "message": "Serwer niedostępny (503)", "confidence": 0, "offline": True}
+            if response.status_code >= 500:
+                return {"success": False, "message": f"Błąd serwera ({response.status_code})", "confidence": 0}
+            return response.json()
+        except requests.exceptions.ConnectionError as e:
+            # Obejmuje ConnectTimeout - żądanie nie dotarło do serwera
+            return {"success": False, "message": f"Błąd sieci: {e}", "confidence": 0, "offline": True}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return {"success": False, "message": f"Brak odpowiedzi serwera: {e}", "confidence": 0}
+
+    def weryfikuj_serie(self, obrazy_jpeg: list, qr_data: str, bramka_id: int) -> dict:
+        """Weryfikacja wieloklatkowa: seria zdjęć (najlepsze pierwsze) w jednym żądaniu."""
+        files = [('face_images', (f'klatka_{i}.jpg', obraz, 'image/jpeg')) for i, obraz in enumerate(obrazy_jpeg)]
+        data = {'bramka_id': bramka_id, 'qr_data': qr_data}
+        return self._wynik_weryfikacji(lambda: self.post("/verify/seria", data=data, files=files))
+
+    def rozpocznij_sesje(self, qr_data: str, bramka_id: int) -> dict:
+        """Sesja wieloklatkowa dla bramki przesyłającej klatki na bieżąco (sesja_id w odpowiedzi)."""
+        data = {'bramka_id': bramka_id, 'qr_data': qr_data}
+        return self._wynik_weryfikacji(lambda: self.post("/verify/sesja", data=data))
+
+    def wyslij_klatke(self, sesja_id: str, obraz_jpeg: bytes) -> dict:
+        """Kolejna klatka sesji; zakonczona=True w odpowiedzi oznacza decyzję."""
+        files = {'face_image': ('klatka.jpg', obraz_jpeg, 'image/jpeg')}
+        return self._wynik_weryfikacji(lambda: self.post(f"/verify/sesja/{sesja_id}/klatka", files=files))
+
+    def weryfikuj_async(self, obraz_jpeg: bytes, qr_data: str, bramka_id: int) -> Future:
+        """Weryfikacja w wątku roboczym; wynik (dict jak z weryfikuj) w Future."""
+        return self._executor.submit(self.weryfikuj, obraz_jpeg, qr_data, bramka_id)
+
+    def weryfikuj_serie_async(self, obrazy_jpeg: list, qr_data: str, bramka_id: int) -> Future:
+        return self._executor.submit(self.weryfikuj_serie, obrazy_jpeg, qr_data, bramka_id)
+
+    def wyslij_pozniej(self, sciezka: str, dane: dict):
+        """Dodaje wpis do kolejki offline; wątek w tle wyśle go, gdy backend będzie dostępny."""
+        self.offline_queue.dodaj(sciezka, dane)
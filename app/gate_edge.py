@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# --- KONFIGURACJA ---
+# Skala klatki do dekodowania QR (0.5 = 640x480 -> 320x240); ROI wokół ostatniego kodu w pełnej rozdzielczości
+EDGE_QR_SCALE = float(os.getenv("EDGE_QR_SCALE", 0.5))
+# Detekcja twarzy (Haar) na pomniejszonej klatce
+EDGE_FACE_SCALE = float(os.getenv("EDGE_FACE_SCALE", 0.5))
+# Minimalna szerokość twarzy w pikselach pełnej klatki (dalej = za mało szczegółów dla ArcFace)
+EDGE_MIN_FACE_PX = int(os.getenv("EDGE_MIN_FACE_PX", 90))
+# Minimalna ostrość: wariancja Laplasjanu wycinka twarzy (poruszone / nieostre zdjęcia są odrzucane)
+EDGE_MIN_SHARPNESS = float(os.getenv("EDGE_MIN_SHARPNESS", 60))
+# Pozycja głowy z oczu: maks. przechylenie (stopnie) i przesunięcie środka oczu od środka twarzy (ułamek szerokości)
+EDGE_MAX_ROLL_DEG = float(os.getenv("EDGE_MAX_ROLL_DEG", 15))
+EDGE_MAX_YAW_OFFSET = float(os.getenv("EDGE_MAX_YAW_OFFSET", 0.12))
+# Margines wokół ramki twarzy w wycinku (ułamek szerokości/wysokości) - detektor na serwerze potrzebuje kontekstu
+EDGE_CROP_MARGIN = float(os.getenv("EDGE_CROP_MARGIN", 0.25))
+# Jakość JPEG wysyłanego wycinka
+EDGE_JPEG_QUALITY = int(os.getenv("EDGE_JPEG_QUALITY", 85))
+# Z ilu ostatnich sekund wybieramy najlepszą klatkę
+EDGE_BEST_WINDOW_S = float(os.getenv("EDGE_BEST_WINDOW_S", 1.5))
+# Ile najlepszych klatek z okna wysyłać jako serię do weryfikacji wieloklatkowej (1 = pojedyncze zdjęcie)
+EDGE_BURST_FRAMES = int(os.getenv("EDGE_BURST_FRAMES", 3))
+
+# Powody odrzucenia klatki (wyświetlane na ekranie bramki)
+BRAK_TWARZY = "Brak twarzy"
+ZA_DALEKO = "Podejdz blizej"
+NIEOSTRE = "Obraz nieostry"
+ZLA_POZA = "Patrz prosto w kamere"
+
+
+class QrScanner:
+    """
+    Dekodowanie QR w wątku w tle: pętla kamery tylko podaje najnowszą klatkę (starsze,
+    nieprzetworzone są nadpisywane) i odbiera zdekodowany tekst, nie czekając na dekoder.
+    """
+
+    def __init__(self, scale: float = EDGE_QR_SCALE):
+        self.scale = scale
+        self._detector = cv2.QRCodeDetector()
+        self._cond = threading.Condition()
+        self._frame = None
+        self._result = None
+        self._roi = None  # Ostatnia ramka kodu (x0, y0, x1, y1) w pełnej rozdzielczości
+        self._stop = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="qr-scanner", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def podaj(self, frame: np.ndarray):
+        """Przekazuje klatkę do dekodowania (nie blokuje)."""
+        with self._cond:
+            self._frame = frame
+            self._cond.notify()
+
+    def wynik(self):
+        """Zdekodowany kod QR (raz) albo None."""
+        with self._cond:
+            result, self._result = self._result, None
+            return result
+
+    def reset(self):
+        with self._cond:
+            self._frame = self._result = self._roi = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._frame is None and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                frame, self._frame = self._frame, None
+            data = self.dekoduj(frame)
+            if data:
+                with self._cond:
+                    self._result = data
+
+    def dekoduj(self, frame: np.ndarray):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        # 1. Okolica poprzedniego trafienia w pełnej rozdzielczości - mały obszar, dobra czytelność
+        if self._roi is not None:
+            x0, y0, x1, y1 = self._roi
+            data, points = self._decode(gray[y0:y1, x0:x1])
+            if data:
+                self._zapamietaj_roi(points + (x0, y0), gray.shape)
+                return data
+            self._roi = None
+        # 2. Cała klatka pomniejszona
+        small = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        data, points = self._decode(small)
+        if data:
+            self._zapamietaj_roi(points / self.scale, gray.shape)
+        return data
+
+    def _decode(self, gray: np.ndarray):
+        if gray.size == 0:
+            return None, None
+        try:
+            data, points, _ = self._detector.detectAndDecode(gray)
+        except cv2.error:
+            return None, None
+        if not data or points is None:
+            return None, None
+        return data, points.reshape(-1, 2)
+
+    def _zapamietaj_roi(self, points: np.ndarray, shape):
+        (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+        mx, my = (x1 - x0) * 0.5, (y1 - y0) * 0.5
+        h, w = shape[:2]
+        self._roi = (max(0, int(x0 - mx)), max(0, int(y0 - my)), min(w, int(x1 + mx)), min(h, int(y1 + my)))
+
+
+class KandydatTwarzy:
+    """Wycinek twarzy z jednej klatki wraz z oceną jakości."""
+
+    __slots__ = ("wycinek", "ramka", "ostrosc", "ocena", "czas")
+
+    def __init__(self, wycinek, ramka, ostrosc, ocena):
+        self.wycinek = wycinek
+        self.ramka = ramka  # (x, y, w, h) w pełnej klatce
+        self.ostrosc = ostrosc
+        self.ocena = ocena
+        self.czas = time.monotonic()
+
+
+class FaceScreener:
+    """
+    Tania wstępna selekcja na bramce: obecność twarzy (kaskada Haara), rozmiar, ostrość
+    i pozycja głowy. Na serwer trafia tylko wycinek, który ma szansę przejść weryfikację.
+    """
+
+    def __init__(self, scale: float = EDGE_FACE_SCALE):
+        self.scale = scale
+        self._faces = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        self._eyes = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_eye.xml")
+
+    def ocen(self, frame: np.ndarray):
+        """(KandydatTwarzy, None) dla klatki spełniającej wymagania, inaczej (None, powód)."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        min_size = max(1, int(EDGE_MIN_FACE_PX * self.scale * 0.8))
+        faces = self._faces.detectMultiScale(small, scaleFactor=1.15, minNeighbors=5, minSize=(min_size, min_size))
+        if len(faces) == 0:
+            return None, BRAK_TWARZY
+
+        # Największa twarz = osoba stojąca przy bramce
+        x, y, w, h = (int(v / self.scale) for v in max(faces, key=lambda f: f[2] * f[3]))
+        if w < EDGE_MIN_FACE_PX:
+            return None, ZA_DALEKO
+
+        twarz = gray[y:y + h, x:x + w]
+        ostrosc = float(cv2.Laplacian(twarz, cv2.CV_64F).var())
+        if ostrosc < EDGE_MIN_SHARPNESS:
+            return None, NIEOSTRE
+        if not self._poza_ok(twarz):
+            return None, ZLA_POZA
+
+        # Większa i ostrzejsza twarz = lepszy kandydat
+        ocena = ostrosc * min(1.0, w / (2 * EDGE_MIN_FACE_PX))
+        return KandydatTwarzy(self._wytnij(frame, x, y, w, h), (x, y, w, h), ostrosc, ocena), None
+
+    def _poza_ok(self, twarz: np.ndarray) -> bool:
+        # Oczy szukamy w górnej połowie twarzy; bez pary oczu (okulary, cień) nie odrzucamy klatki
+        h, w = twarz.shape
+        eyes = self._eyes.detectMultiScale(twarz[:h // 2], scaleFactor=1.1, minNeighbors=6,
+                                           minSize=(w // 8, w // 8))
+        if len(eyes) < 2:
+            return True
+        (ax, ay, aw, ah), (bx, by, bw, bh) = sorted(sorted(eyes, key=lambda e: e[2] * e[3])[-2:], key=lambda e: e[0])
+        lewe = np.array([ax + aw / 2, ay + ah / 2])
+        prawe = np.array([bx + bw / 2, by + bh / 2])
+        dx, dy = prawe - lewe
+        przechylenie = abs(np.degrees(np.arctan2(dy, dx)))
+        przesuniecie = abs((lewe[0] + prawe[0]) / 2 - w / 2) / w
+        return przechylenie <= EDGE_MAX_ROLL_DEG and przesuniecie <= EDGE_MAX_YAW_OFFSET
+
+    @staticmethod
+    def _wytnij(frame: np.ndarray, x: int, y: int, w: int, h: int) -> np.ndarray:
+        mx, my = int(w * EDGE_CROP_MARGIN), int(h * EDGE_CROP_MARGIN)
+        fh, fw = frame.shape[:2]
+        # Kopia - klatka jest potem zamalowywana nakładką UI
+        return frame[max(0, y - my):min(fh, y + h + my), max(0, x - mx):min(fw, x + w + mx)].copy()
+
+
+class NajlepszaKlatka:
+    """Najlepsi kandydaci z ostatnich EDGE_BEST_WINDOW_S sekund."""
+
+    def __init__(self, okno_s: float = EDGE_BEST_WINDOW_S):
+        self.okno_s = okno_s
+        self._kandydaci = deque(maxlen=64)  # Przy 30 kl./s i oknie 1.5 s wystarcza z zapasem
+
+    def _usun_stare(self):
+        granica = time.monotonic() - self.okno_s
+        while self._kandydaci and self._kandydaci[0].czas < granica:
+            self._kandydaci.popleft()
+
+    def dodaj(self, kandydat: KandydatTwarzy):
+        self._kandydaci.append(kandydat)
+        self._usun_stare()
+
+    def najlepsza(self):
+        self._usun_stare()
+        return max(self._kandydaci, key=lambda k: k.ocena, default=None)
+
+    def seria(self, n: int = EDGE_BURST_FRAMES) -> list:
+        """Do n najlepszych klatek z okna, od najlepszej (serwer kończy po pierwszej wystarczającej)."""
+        self._usun_stare()
+        return sorted(self._kandydaci, key=lambda k: k.ocena, reverse=True)[:n]
+
+    def reset(self):
+        self._kandydaci.clear()
+
+
+def zakoduj_jpeg(img: np.ndarray, jakosc: int = EDGE_JPEG_QUALITY) -> bytes:
+    ok, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, jakosc])
+    if not ok:
+        raise ValueError("Nie udało się zakodować obrazu")
+    return encoded.tobytes()
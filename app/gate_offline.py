@@ -0,0 +1,285 @@
+import base64
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+import numpy as np
+import requests
+
+from similarity import cosine_distance
+
+# --- KONFIGURACJA ---
+# Tryb decyzji bramki: "auto" - lokalnie tylko, gdy backend jest nieosiągalny (błąd połączenia / 503),
+# "zawsze" - zawsze lokalnie (czas decyzji niezależny od obciążenia backendu), "wylaczony" - tylko /verify
+GATE_OFFLINE_MODE = os.getenv("GATE_OFFLINE_MODE", "auto")
+TRYBY = ("auto", "zawsze", "wylaczony")
+# Lokalna kopia przepustek i wzorców (bramka po restarcie może działać bez backendu)
+GATE_SNAPSHOT_FILE = os.getenv("GATE_SNAPSHOT_FILE", "gate_snapshot.json")
+# Co ile sekund pobierać zmiany z /sync/snapshot
+GATE_SYNC_INTERVAL_S = float(os.getenv("GATE_SYNC_INTERVAL_S", 30))
+# Maksymalny wiek danych (od ostatniej udanej synchronizacji), przy którym bramka decyduje lokalnie.
+# Starsze dane mogą zawierać unieważnione przepustki - bramka odmawia (0 = bez limitu)
+GATE_SNAPSHOT_MAX_AGE_S = float(os.getenv("GATE_SNAPSHOT_MAX_AGE_S", 3600))
+# Detektor twarzy na bramce - wycinek z gate_edge jest już wykadrowaną twarzą
+GATE_OFFLINE_DETECTOR = os.getenv("GATE_OFFLINE_DETECTOR", "opencv")
+
+# Endpoint zbiorczego zapisu prób rozstrzygniętych lokalnie
+SCIEZKA_PROB = "/sync/proby"
+
+
+class LocalSnapshot:
+    """Przepustki i wzorce twarzy zsynchronizowane z backendem (w pamięci i w pliku)."""
+
+    def __init__(self, path: str = GATE_SNAPSHOT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.wersja = 0
+        self.prog = None
+        self.prog_procent = None
+        self.przepustki = {}  # kod QR -> dane przepustki i pracownika
+        self.wzorce = {}  # id_pracownika -> wektor (base64 float32)
+        self.zsynchronizowano = None  # Czas ostatniej udanej synchronizacji (time.time())
+        self._zapisano = None  # Czas synchronizacji zapisany w pliku
+
+    @property
+    def gotowy(self) -> bool:
+        """Czy bramka ma już dane (z synchronizacji lub pliku) do decyzji lokalnych."""
+        return self.prog is not None
+
+    def wiek(self):
+        """Sekundy od ostatniej udanej synchronizacji (None - nigdy)."""
+        if self.zsynchronizowano is None:
+            return None
+        return time.time() - self.zsynchronizowano
+
+    def aktualny(self, max_wiek_s: float = GATE_SNAPSHOT_MAX_AGE_S) -> bool:
+        wiek = self.wiek()
+        return max_wiek_s <= 0 or (wiek is not None and wiek <= max_wiek_s)
+
+    def wczytaj(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            stan = json.load(f)
+        with self._lock:
+            self.wersja = stan["wersja"]
+            self.prog = stan["prog"]
+            self.prog_procent = stan["prog_procent"]
+            self.przepustki = stan["przepustki"]
+            self.wzorce = stan["wzorce"]
+            # Plik sprzed wprowadzenia limitu wieku - dane nieaktualne do pierwszej synchronizacji
+            self.zsynchronizowano = self._zapisano = stan.get("zsynchronizowano")
+        print(f"📂 Wczytano lokalne dane bramki: wersja {self.wersja}, {len(self.przepustki)} przepustek.")
+        return True
+
+    def zapisz(self):
+        with self._lock:
+            stan = {"wersja": self.wersja, "prog": self.prog, "prog_procent": self.prog_procent,
+                    "przepustki": self.przepustki, "wzorce": self.wzorce,
+                    "zsynchronizowano": self.zsynchronizowano}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(stan, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._zapisano = stan["zsynchronizowano"]
+
+    def zastosuj(self, dane: dict) -> bool:
+        """Nakłada odpowiedź /sync/snapshot; zwraca True, jeśli coś się zmieniło."""
+        zmiana = dane["pelny"] or dane["wersja"] != self.wersja or any(
+            dane[k] for k in ("przepustki", "usuniete_przepustki", "wzorce", "usuniete_wzorce"))
+        with self._lock:
+            if dane["pelny"]:
+                self.przepustki, self.wzorce = {}, {}
+            for kod in dane["usuniete_przepustki"]:
+                self.przepustki.pop(kod, None)
+            for osoba in dane["usuniete_wzorce"]:
+                self.wzorce.pop(osoba, None)
+            self.przepustki.update({p["kod_qr"]: p for p in dane["przepustki"]})
+            self.wzorce.update(dane["wzorce"])
+            self.wersja = dane["wersja"]
+            self.prog = dane["prog"]
+            self.prog_procent = dane["prog_procent"]
+            self.zsynchronizowano = time.time()
+        return zmiana
+
+    def czas_zapisac(self, max_wiek_s: float = GATE_SNAPSHOT_MAX_AGE_S) -> bool:
+        """
+        Czy zapisać plik mimo braku zmian - po restarcie bez łączności bramka liczy wiek danych
+        od czasu w pliku. Zapis najwyżej co pół limitu (plik z wzorcami bywa duży).
+        """
+        if self._zapisano is None:
+            return True
+        return max_wiek_s > 0 and self.zsynchronizowano - self._zapisano >= max_wiek_s / 2
+
+    def przepustka(self, kod_qr: str):
+        return self.przepustki.get(kod_qr)
+
+    def wzorzec(self, id_pracownika: str):
+        zakodowany = self.wzorce.get(id_pracownika)
+        if zakodowany is None:
+            return None
+        return np.frombuffer(base64.b64decode(zakodowany), dtype="<f4")
+
+
+class OfflineVerifier:
+    """
+    Decyzje na bramce bez backendu: ważność przepustki i porównanie twarzy z lokalnym
+    wzorcem przy tych samych progach co verify_face. Próby rozstrzygnięte lokalnie trafiają
+    do kolejki offline klienta i są wysyłane zbiorczo na /sync/proby. Dane starsze niż
+    GATE_SNAPSHOT_MAX_AGE_S (od ostatniej udanej synchronizacji) nie wystarczą do wpuszczenia.
+    """
+
+    def __init__(self, client, tryb: str = GATE_OFFLINE_MODE, path: str = GATE_SNAPSHOT_FILE,
+                 interval_s: float = GATE_SYNC_INTERVAL_S, detector: str = GATE_OFFLINE_DETECTOR,
+                 max_wiek_s: float = GATE_SNAPSHOT_MAX_AGE_S):
+        if tryb not in TRYBY:
+            raise ValueError(f"Nieznany tryb GATE_OFFLINE_MODE: {tryb} (dozwolone: {', '.join(TRYBY)})")
+        self.client = client
+        self.tryb = tryb
+        self.detector = detector
+        self.interval_s = interval_s
+        self.max_wiek_s = max_wiek_s
+        self.snapshot = LocalSnapshot(path)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gate-offline")
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+
+    def start(self):
+        if self.tryb == "wylaczony" or self._thread is not None:
+            return
+        try:
+            self.snapshot.wczytaj()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Nie można wczytać lokalnych danych bramki ({e}) - pełna synchronizacja.")
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="gate-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._executor.shutdown(wait=True)
+
+    # --- SYNCHRONIZACJA ---
+
+    def synchronizuj(self) -> bool:
+        """Pobiera zmiany od ostatniej wersji. False przy braku łączności."""
+        try:
+            response = self.client.get("/sync/snapshot", params={"since": self.snapshot.wersja})
+            response.raise_for_status()
+            dane = response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            return False
+        if self.snapshot.zastosuj(dane) or self.snapshot.czas_zapisac(self.max_wiek_s):
+            self.snapshot.zapisz()
+            if dane["pelny"] or dane["przepustki"] or dane["usuniete_przepustki"]:
+                print(f"🔄 Synchronizacja bramki: wersja {dane['wersja']}, {len(self.snapshot.przepustki)} przepustek.")
+        return True
+
+    def _run(self):
+        while not self._stop:
+            try:
+                self.synchronizuj()
+            except Exception as e:
+                print(f"⚠️ Błąd synchronizacji bramki: {e}")
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+    # --- DECYZJA ---
+
+    def weryfikuj(self, face_crops: list, obrazy_jpeg: list, qr_data: str, bramka_id: int) -> Future:
+        """
+        Weryfikacja zgodnie z trybem; wynik (dict jak VerificationResponse) w Future.
+        Kilka klatek (od najlepszej) idzie na serwer jako seria; lokalnie decyduje najlepsza.
+        """
+        face_crop = face_crops[0]
+        if self.tryb == "zawsze":
+            return self._executor.submit(self.decyduj, face_crop, qr_data, bramka_id)
+
+        if len(obrazy_jpeg) > 1:
+            online = self.client.weryfikuj_serie_async(obrazy_jpeg, qr_data, bramka_id)
+        else:
+            online = self.client.weryfikuj_async(obrazy_jpeg[0], qr_data, bramka_id)
+        if self.tryb == "wylaczony":
+            return online
+
+        wynik = Future()
+
+        def po_odpowiedzi(f):
+            odpowiedz = f.result()
+            if not odpowiedz.get("offline") or not self.snapshot.gotowy:
+                wynik.set_result(odpowiedz)
+                return
+            lokalna = self._executor.submit(self.decyduj, face_crop, qr_data, bramka_id)
+            lokalna.add_done_callback(lambda l: wynik.set_result(l.result()))
+
+        online.add_done_callback(po_odpowiedzi)
+        return wynik
+
+    def decyduj(self, face_crop: np.ndarray, qr_data: str, bramka_id: int) -> dict:
+        """Decyzja lokalna - ta sama logika co /verify na serwerze."""
+        if not self.snapshot.gotowy:
+            return {"success": False, "message": "Brak danych do weryfikacji offline", "confidence": 0.0,
+                    "lokalnie": True}
+        if not self.snapshot.aktualny(self.max_wiek_s):
+            # Przepustka mogła zostać w międzyczasie unieważniona - bez decyzji na starych danych
+            wiek = self.snapshot.wiek()
+            opis = "brak synchronizacji" if wiek is None else f"ostatnia synchronizacja {wiek / 60:.0f} min temu"
+            return {"success": False, "message": f"Nieaktualne dane do weryfikacji offline ({opis})",
+                    "confidence": 0.0, "lokalnie": True}
+
+        # id_proby: serwer pomija próbę wysłaną ponownie (np. gdy zginęła odpowiedź na wysyłkę z kolejki)
+        rekord = {"bramka_id": bramka_id, "data_czas": datetime.now(timezone.utc).isoformat(),
+                  "id_proby": str(uuid.uuid4())}
+        przepustka = self.snapshot.przepustka(qr_data)
+        if not przepustka or date.fromisoformat(przepustka["data_waznosci"]) < date.today():
+            rekord.update(wynik_qr="INVALID", wynik_biometryczny="N/A", procent_podobienstwa=0.0,
+                          status_finalny="ODMOWA - nieprawidłowy QR", podejrzana=False)
+            self.client.wyslij_pozniej(SCIEZKA_PROB, rekord)
+            return {"success": False, "message": "Nieprawidłowa przepustka", "confidence": 0.0, "lokalnie": True}
+
+        imie_nazwisko = f"{przepustka['imie']} {przepustka['nazwisko']}"
+        rekord.update(pracownik_id=przepustka["pracownik_id"], wynik_qr="OK", podejrzana=False)
+        try:
+            conf_val = self._podobienstwo(face_crop, przepustka["id_pracownika"])
+            rekord["procent_podobienstwa"] = conf_val
+            if conf_val >= self.snapshot.prog_procent:
+                rekord.update(wynik_biometryczny="MATCH", status_finalny="SUKCES")
+                komunikat = f"Wejście dozwolone. Witaj {imie_nazwisko}"
+                success = True
+            else:
+                rekord.update(wynik_biometryczny="NO_MATCH", status_finalny="ODMOWA - niska zgodność",
+                              podejrzana=True)
+                komunikat = "Odmowa wejścia - weryfikacja nieudana"
+                success = False
+        except Exception as e:
+            print(f"Błąd weryfikacji offline: {e}")
+            rekord.update(procent_podobienstwa=0.0, status_finalny="BŁĄD SYSTEMU")
+            komunikat = "Błąd wewnętrzny przetwarzania obrazu"
+            success = False
+
+        self.client.wyslij_pozniej(SCIEZKA_PROB, rekord)
+        return {"success": success, "message": komunikat, "person_name": imie_nazwisko if success else None,
+                "confidence": rekord["procent_podobienstwa"], "lokalnie": True}
+
+    def _podobienstwo(self, face_crop: np.ndarray, id_pracownika: str) -> float:
+        # Model ładowany dopiero przy pierwszej decyzji lokalnej (tryb "auto" może go nie potrzebować)
+        from face_recognition_system import get_embedding, distance_to_probability
+
+        wzorzec = self.snapshot.wzorzec(id_pracownika)
+        if wzorzec is None:
+            return 0.0
+        wektor = get_embedding(face_crop, self.detector)
+        if wektor is None:
+            return 0.0
+        return distance_to_probability(cosine_distance(wektor, wzorzec), self.snapshot.prog)
@@ -3,48 +3,62 @@ import requests
 import time
 import sys
 
+from gate_client import GateClient
+from gate_offline import OfflineVerifier
+from gate_edge import (QrScanner, FaceScreener, NajlepszaKlatka, zakoduj_jpeg, EDGE_JPEG_QUALITY)
+
 # --- KONFIGURACJA ---
-# Jeśli odpalasz symulator lokalnie, a backend jest w Dockerze -> localhost:8000
-API_URL = "http://localhost:8000"
+# Adres backendu: GATE_API_URL (domyślnie localhost:8000 - backend w Dockerze, symulator lokalnie)
+client = GateClient()
+# Decyzje lokalne z zsynchronizowanych przepustek i wzorców: GATE_OFFLINE_MODE (auto / zawsze / wylaczony)
+offline = OfflineVerifier(client)
+
+
+def wait_for_backend_ready(timeout=300):
+    """Czeka, aż backend zgłosi gotowość (modele rozgrzane)."""
+    start = time.time()
+    print("⏳ Oczekiwanie na gotowość backendu...")
+    while time.time() - start < timeout:
+        if client.gotowy():
+            print("✅ Backend gotowy.")
+            return True
+        time.sleep(2)
+    print("⚠️ Backend nie zgłosił gotowości w wyznaczonym czasie.")
+    return False
 
 
 def get_available_gates():
     """Pobiera listę bramek z API."""
     try:
-        response = requests.get(f"{API_URL}/setup/bramki")
-        if response.status_code == 200:
-            return response.json()
+        return client.bramki()
     except requests.exceptions.ConnectionError:
         print("❌ Nie można połączyć się z API. Upewnij się, że backend działa.")
-        return []
+    except requests.exceptions.RequestException:
+        pass
     return []
 
 
 def create_gate(name, location):
     """Tworzy nową bramkę przez API."""
-    payload = {"nazwa": name, "lokalizacja": location}
     try:
-        response = requests.post(f"{API_URL}/setup/bramka", json=payload)
-        if response.status_code == 200:
-            print(f"✅ Utworzono bramkę: {name}")
-            return response.json()
+        gate = client.utworz_bramke(name, location)
+        print(f"✅ Utworzono bramkę: {name}")
+        return gate
     except Exception as e:
         print(f"❌ Błąd tworzenia bramki: {e}")
     return None
 
 
-def verify_entry_api(frame, qr_data, gate_id):
-    """Wysyła ramkę i kod QR do backendu"""
-    try:
-        _, img_encoded = cv2.imencode('.jpg', frame)
-        files = {'face_image': ('capture.jpg', img_encoded.tobytes(), 'image/jpeg')}
-        data = {'bramka_id': gate_id, 'qr_data': qr_data}
-
-        print(f"📡 Wysyłanie do weryfikacji (Bramka {gate_id})... QR: {qr_data}")
-        response = requests.post(f"{API_URL}/verify", data=data, files=files)
-        return response.json()
-    except Exception as e:
-        return {"success": False, "message": f"Błąd sieci: {e}", "confidence": 0}
+def verify_entry_api(face_crops, qr_data, gate_id, jpeg_quality=EDGE_JPEG_QUALITY):
+    """
+    Wysyła wycinki twarzy (najlepsze klatki z bramki, od najlepszej) i kod QR do backendu.
+    Serwer kończy po pierwszej klatce, która wystarcza do decyzji. Zwraca Future z wynikiem.
+    Bez łączności (lub w trybie "zawsze") decyzję podejmuje bramka na podstawie lokalnych danych.
+    """
+    images = [zakoduj_jpeg(crop, jpeg_quality) for crop in face_crops]
+    print(f"📡 Weryfikacja (Bramka {gate_id}, tryb {offline.tryb})... QR: {qr_data}, "
+          f"klatek: {len(images)}, {sum(map(len, images)) / 1024:.1f} KB")
+    return offline.weryfikuj(face_crops, images, qr_data, gate_id)
 
 
 def draw_text(img, text, y_pos, color=(0, 255, 0), scale=0.8):
@@ -95,13 +109,27 @@ def select_gate_menu():
 
 # --- GŁÓWNA PĘTLA ---
 def main():
+    client.start()
+    offline.start()
+
+    # 0. Nie wysyłamy ruchu zanim modele na serwerze nie będą rozgrzane
+    wait_for_backend_ready()
+
     # 1. Wybór bramki na starcie
     current_gate = select_gate_menu()
 
     cap = cv2.VideoCapture(0)
-    detector = cv2.QRCodeDetector()
+    # Dekodowanie QR w tle, wstępna ocena twarzy na miejscu - na serwer idzie tylko najlepszy wycinek
+    qr_scanner = QrScanner()
+    qr_scanner.start()
+    screener = FaceScreener()
+    best_face = NajlepszaKlatka()
+    face_hint = None
     state = 'SCANNING'
     current_qr = None
+    face_crops = None
+    pending = None  # Future weryfikacji w toku
+    request_start = 0
     result_data = None
     result_timer = 0
 
@@ -120,6 +148,16 @@ def main():
         ret, frame = cap.read()
         if not ret: break
 
+        # --- ANALIZA NA BRAMCE (przed rysowaniem nakładek na klatce) ---
+        if state == 'SCANNING':
+            qr_scanner.podaj(frame)
+        elif state == 'WAIT_FOR_USER':
+            candidate, face_hint = screener.ocen(frame)
+            if candidate is not None:
+                best_face.dodaj(candidate)
+                x, y, w, h = candidate.ramka
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+
         # --- NAGŁÓWEK ---
         # Pasek statusu na górze
         cv2.rectangle(frame, (0, 0), (640, 40), (50, 50, 50), -1)
@@ -130,9 +168,10 @@ def main():
             draw_text(frame, "STATUS: SKANOWANIE QR...", 80, (255, 255, 255))
             draw_text(frame, "[G] - Zmien bramke", 450, (200, 200, 200), 0.6)
 
-            data, bbox, _ = detector.detectAndDecode(frame)
+            data = qr_scanner.wynik()
             if data:
                 current_qr = data
+                best_face.reset()
                 state = 'WAIT_FOR_USER'
 
         elif state == 'WAIT_FOR_USER':
@@ -140,25 +179,36 @@ def main():
             cv2.rectangle(overlay, (0, 50), (640, 200), (0, 0, 0), -1)
             cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
 
+            best = best_face.najlepsza()
             draw_text(frame, f"QR: {current_qr}", 90, (0, 255, 255))
-            draw_text(frame, "[SPACJA] - Weryfikuj", 130, (0, 255, 0))
+            if best is not None:
+                draw_text(frame, "[SPACJA] - Weryfikuj", 130, (0, 255, 0))
+            else:
+                draw_text(frame, f"{face_hint or 'Szukanie twarzy...'}", 130, (0, 165, 255))
             draw_text(frame, "[ESC] - Anuluj", 170, (0, 0, 255))
 
             key = cv2.waitKey(1) & 0xFF
-            if key == 32:  # Spacja
+            if key == 32 and best is not None:  # Spacja - tylko gdy mamy dobrą klatkę
+                face_crops = [c.wycinek for c in best_face.seria()]
                 state = 'PROCESSING'
             elif key == 27:  # ESC
                 state = 'SCANNING'
                 current_qr = None
+                qr_scanner.reset()
 
         elif state == 'PROCESSING':
-            draw_text(frame, "PRZETWARZANIE...", 100, (0, 165, 255))
-            cv2.imshow('System Kontroli', frame)
-            cv2.waitKey(1)
-
-            result_data = verify_entry_api(frame, current_qr, current_gate['id'])
-            state = 'RESULT'
-            result_timer = time.time()
+            # Żądanie idzie w wątku klienta - kamera i ekran działają dalej
+            if pending is None:
+                pending = verify_entry_api(face_crops, current_qr, current_gate['id'])
+                request_start = time.time()
+            dots = "." * (1 + int((time.time() - request_start) * 3) % 3)
+            draw_text(frame, f"PRZETWARZANIE{dots}", 100, (0, 165, 255))
+
+            if pending.done():
+                result_data = pending.result()
+                pending = None
+                state = 'RESULT'
+                result_timer = time.time()
 
         elif state == 'RESULT':
             success = result_data.get('success', False)
@@ -176,10 +226,14 @@ def main():
                 draw_text(frame, f"Osoba: {name}", 160, (0, 255, 0), 0.7)
 
             draw_text(frame, f"Podobienstwo: {conf:.1f}%", 190, (200, 200, 200), 0.6)
+            if result_data.get('lokalnie'):
+                draw_text(frame, "TRYB OFFLINE - decyzja bramki", 230, (0, 165, 255), 0.6)
 
             if time.time() - result_timer > 5:
                 state = 'SCANNING'
                 current_qr = None
+                face_crops = None
+                qr_scanner.reset()
 
         # --- OBSŁUGA KLAWISZY GLOBALNYCH ---
         key = cv2.waitKey(1) & 0xFF
@@ -195,6 +249,9 @@ def main():
 
         cv2.imshow('System Kontroli', frame)
 
+    qr_scanner.stop()
+    offline.stop()
+    client.close()
     cap.release()
     cv2.destroyAllWindows()
 
@@ -0,0 +1,102 @@
+import asyncio
+import base64
+import os
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+
+from database import SessionLocal
+from face_recognition_system import THRESHOLD, THRESHOLD_PERCENT, get_person_vectors
+from models import Przepustka, ZmianaSynchronizacji
+
+# --- KONFIGURACJA ---
+# Zmiany młodsze niż N s są wysyłane, ale wersja bramki nie przesuwa się za nie: numery (id)
+# nadawane są przy INSERT, więc wolniejsza transakcja może zatwierdzić niższe id później
+SYNC_SAFETY_S = float(os.getenv("SYNC_SAFETY_S", 10))
+
+# Typy wpisów dziennika zmian
+ZMIANA_PRZEPUSTKA = "przepustka"  # klucz = kod QR
+ZMIANA_WZORZEC = "wzorzec"  # klucz = id_pracownika
+
+
+def zmiany(typ: str, klucze) -> list:
+    """Wpisy dziennika do dodania w transakcji, która zmienia przepustki / wzorce."""
+    return [ZmianaSynchronizacji(typ=typ, klucz=klucz) for klucz in dict.fromkeys(klucze) if klucz]
+
+
+def zarejestruj_zmiany(typ: str, klucze):
+    """Zapis wpisów dziennika z wątków roboczych (np. po przeliczeniu wzorca w tle)."""
+    wpisy = zmiany(typ, klucze)
+    if not wpisy:
+        return
+    with SessionLocal() as db:
+        db.add_all(wpisy)
+        db.commit()
+
+
+def _zakoduj_wektor(wektor) -> str:
+    return base64.b64encode(np.asarray(wektor, dtype="<f4").tobytes()).decode("ascii")
+
+
+def _przepustka(p: Przepustka) -> dict:
+    return {
+        "kod_qr": p.kod_qr,
+        "data_waznosci": p.data_waznosci.isoformat(),
+        "pracownik_id": p.pracownik.id,
+        "id_pracownika": p.pracownik.id_pracownika,
+        "imie": p.pracownik.imie,
+        "nazwisko": p.pracownik.nazwisko,
+    }
+
+
+async def snapshot(db, since: int = 0) -> dict:
+    """
+    Stan dla bramki offline: przepustki i wzorce twarzy zmienione po wersji `since`
+    (since=0 lub wersja spoza dziennika - pełny stan). Bramka zapamiętuje zwróconą
+    "wersja" i podaje ją przy kolejnej synchronizacji.
+    """
+    # Wersję ustalamy przed odczytem danych - zmiany w trakcie trafią najwyżej do następnej paczki
+    najnowsza = (await db.execute(select(func.max(ZmianaSynchronizacji.id)))).scalar() or 0
+    granica = datetime.now(timezone.utc) - timedelta(seconds=SYNC_SAFETY_S)
+    stabilna = (await db.execute(
+        select(func.max(ZmianaSynchronizacji.id)).where(ZmianaSynchronizacji.data_czas < granica)
+    )).scalar() or 0
+
+    pelny = since <= 0 or since > najnowsza
+    zapytanie = select(Przepustka).where(Przepustka.aktywna == True).options(joinedload(Przepustka.pracownik))
+    usuniete_przepustki, usuniete_wzorce = [], []
+
+    if pelny:
+        since = 0
+        przepustki = (await db.execute(
+            zapytanie.where(Przepustka.data_waznosci >= date.today())
+        )).scalars().all()
+        osoby = {p.pracownik.id_pracownika for p in przepustki}
+    else:
+        wpisy = (await db.execute(
+            select(ZmianaSynchronizacji.typ, ZmianaSynchronizacji.klucz)
+            .where(ZmianaSynchronizacji.id > since).distinct()
+        )).all()
+        kody = {klucz for typ, klucz in wpisy if typ == ZMIANA_PRZEPUSTKA}
+        osoby = {klucz for typ, klucz in wpisy if typ == ZMIANA_WZORZEC}
+        przepustki = (await db.execute(zapytanie.where(Przepustka.kod_qr.in_(kody)))).scalars().all() if kody else []
+        usuniete_przepustki = sorted(kody - {p.kod_qr for p in przepustki})
+        # Nowa przepustka - bramka potrzebuje też wzorca jej właściciela
+        osoby |= {p.pracownik.id_pracownika for p in przepustki}
+
+    wektory = await asyncio.to_thread(get_person_vectors, sorted(osoby))
+    if not pelny:
+        usuniete_wzorce = sorted(osoby - set(wektory))
+
+    return {
+        "wersja": max(since, stabilna),
+        "pelny": pelny,
+        "prog": THRESHOLD,
+        "prog_procent": THRESHOLD_PERCENT,
+        "przepustki": [_przepustka(p) for p in przepustki],
+        "usuniete_przepustki": usuniete_przepustki,
+        "wzorce": {osoba: _zakoduj_wektor(w) for osoba, w in wektory.items()},
+        "usuniete_wzorce": usuniete_wzorce,
+    }
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# --- KONFIGURACJA ---
+# Liczba wątków wykonujących inferencję DeepFace (RetinaFace + ArcFace)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2))
+# Ile zadań może czekać w kolejce ponad liczbę pracujących wątków
+INFERENCE_QUEUE_DEPTH = int(os.getenv("INFERENCE_QUEUE_DEPTH", 16))
+# Jak długo zadanie startowe czeka, aż pozostałe wątki załadują modele (s)
+INFERENCE_START_TIMEOUT_S = float(os.getenv("INFERENCE_START_TIMEOUT_S", 600))
+
+
+class InferenceQueueFull(Exception):
+    """Kolejka zadań inferencji jest pełna - bramka powinna ponowić próbę."""
+
+
+def _init_worker():
+    """Ładuje modele raz na wątek roboczy (DeepFace trzyma je w cache modułu)."""
+    from face_recognition_system import load_models
+    load_models()
+
+
+def _czekaj_na_watki(bariera: threading.Barrier):
+    try:
+        bariera.wait(INFERENCE_START_TIMEOUT_S)
+    except threading.BrokenBarrierError:
+        print("⚠️ [AI] Nie wszystkie wątki inferencji wystartowały w zadanym czasie")
+
+
+class InferencePool:
+    """
+    Dedykowana pula wątków dla obliczeń rozpoznawania twarzy.
+    Dzięki niej endpointy async nie blokują pętli zdarzeń uvicorna.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, queue_depth: int = INFERENCE_QUEUE_DEPTH):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def start(self):
+        """Tworzy wątki i od razu ładuje w nich modele."""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="inference",
+                initializer=_init_worker
+            )
+        # ThreadPoolExecutor tworzy wątki leniwie i oddaje zadanie wolnemu wątkowi, jeśli taki jest.
+        # Zadania startowe czekają na siebie nawzajem, więc każde zajmuje osobny wątek - powstają
+        # wszystkie i każdy ładuje modele. Zadania ustawione później (rozgrzewka) ruszają po nich
+        bariera = threading.Barrier(self.workers)
+        for _ in range(self.workers):
+            self._executor.submit(_czekaj_na_watki, bariera)
+        print(f"--- [AI] Pula inferencji: {self.workers} wątków, kolejka {self.queue_depth} ---")
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, fn, *args, **kwargs):
+        """Wykonuje funkcję w puli i czeka na wynik bez blokowania pętli zdarzeń."""
+        if self._executor is None:
+            self.start()
+
+        with self._lock:
+            if self._pending >= self.workers + self.queue_depth:
+                raise InferenceQueueFull()
+            self._pending += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+# Globalna instancja używana przez main.py
+inference_pool = InferencePool()
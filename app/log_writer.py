@@ -0,0 +1,315 @@
+import glob
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+
+from database import engine
+from models import ProbaWejscia
+from raporty import zapisz_statystyki
+
+# --- KONFIGURACJA ---
+# Zapis do bazy następuje po zebraniu LOG_BATCH_SIZE wpisów lub po LOG_FLUSH_INTERVAL_MS
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 200))
+LOG_FLUSH_INTERVAL_MS = int(os.getenv("LOG_FLUSH_INTERVAL_MS", 500))
+# Lokalny plik zabezpieczający wpisy, które nie trafiły jeszcze do bazy
+LOG_SPOOL_DIR = os.getenv("LOG_SPOOL_DIR", "spool")
+# fsync pliku spool (bezpieczniej przy awarii zasilania). Wykonywany grupowo przez wątek zapisu
+# co LOG_SPOOL_FSYNC_MS - wywołujący (pętla zdarzeń) tylko dopisuje linie do pliku
+LOG_SPOOL_FSYNC = os.getenv("LOG_SPOOL_FSYNC", "1") == "1"
+LOG_SPOOL_FSYNC_MS = int(os.getenv("LOG_SPOOL_FSYNC_MS", 20))
+
+# Wpisy odrzucone przez bazę (np. bramka usunięta przed zapisem) - poza wzorcem plików spool
+LOG_DEAD_LETTER_FILE = "odrzucone.jsonl"
+
+# Kolumny zapisywane przez writer (id nadaje baza)
+_COLUMNS = [c.name for c in ProbaWejscia.__table__.columns if c.name != "id"]
+
+
+def _to_json(record: dict) -> str:
+    return json.dumps({k: v.isoformat() if isinstance(v, datetime) else v for k, v in record.items()})
+
+
+def _from_json(line: str) -> dict:
+    record = json.loads(line)
+    if record.get("data_czas"):
+        record["data_czas"] = datetime.fromisoformat(record["data_czas"])
+    return record
+
+
+def _blad_danych(e: Exception) -> bool:
+    """Błąd wynikający z treści wpisu (klucz obcy, typ, wartość) - ponowienie nic nie zmieni."""
+    return isinstance(e, (IntegrityError, DataError))
+
+
+class AccessLogWriter:
+    """
+    Buforowany zapis prób wejścia (ProbaWejscia).
+    Odpowiedź dla bramki nie czeka na commit w Postgresie: wpis trafia do bufora
+    i do lokalnego pliku spool, a wątek w tle zapisuje paczki jednym
+    wielowierszowym INSERT-em. Po restarcie niezapisane wpisy są odtwarzane z pliku.
+    """
+
+    def __init__(self, spool_dir: str = LOG_SPOOL_DIR):
+        self.spool_dir = spool_dir
+        self._buffer = []
+        self._covered_files = []  # Pliki spool, których wpisy są w buforze
+        self._cond = threading.Condition()
+        self._spool = None
+        self._spool_path = None
+        self._thread = None
+        self._stop = False
+        self._dirty = False  # Dopisane linie czekają na fsync
+        self._sequence = 0
+        self.flushed_total = 0
+
+    # --- PLIKI SPOOL ---
+
+    def _open_spool(self):
+        self._sequence += 1
+        self._spool_path = os.path.join(self.spool_dir, f"proba_wejscia_{time.time_ns()}_{self._sequence}.jsonl")
+        self._spool = open(self._spool_path, "a", encoding="utf-8")
+
+    def _rotate_spool(self):
+        """Zamyka bieżący plik spool (jego wpisy idą do zapisu) i otwiera nowy."""
+        self._spool.close()
+        self._covered_files.append(self._spool_path)
+        self._open_spool()
+
+    def _recover(self):
+        """Wczytuje wpisy, które nie zdążyły trafić do bazy przed wyłączeniem/awarią."""
+        recovered = 0
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, "proba_wejscia_*.jsonl"))):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self._buffer.append(_from_json(line))
+                        recovered += 1
+                    except ValueError:
+                        # Ostatnia linia mogła zostać urwana przy awarii
+                        print(f"⚠️ [Logi] Pominięto uszkodzony wpis w {path}")
+            self._covered_files.append(path)
+        if recovered:
+            print(f"-> [Logi] Odtworzono {recovered} niezapisanych prób wejścia z pliku spool.")
+
+    # --- API ---
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._stop = False
+        self._recover()
+        self._open_spool()
+        self._thread = threading.Thread(target=self._run, name="access-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Zatrzymuje wątek i zapisuje wszystko, co zostało w buforze."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+        self._spool.close()
+        if os.path.exists(self._spool_path) and os.path.getsize(self._spool_path) == 0:
+            os.remove(self._spool_path)
+
+    def zapisz(self, proba: ProbaWejscia):
+        """Dodaje próbę wejścia do kolejki zapisu (bez czekania na bazę)."""
+        self.zapisz_rekordy([{name: getattr(proba, name) for name in _COLUMNS}])
+
+    def zapisz_rekordy(self, records):
+        """Dodaje gotowe słowniki kolumn (np. wpisy zbuforowane przez bramkę offline)."""
+        records = [{name: r.get(name) for name in _COLUMNS} for r in records]
+        now = datetime.now(timezone.utc)
+        for record in records:
+            if record["data_czas"] is None:
+                # Czas nadajemy od razu - wpis może trafić do bazy z opóźnieniem
+                record["data_czas"] = now
+            if record["podejrzana"] is None:
+                record["podejrzana"] = False
+        with self._cond:
+            for record in records:
+                self._spool.write(_to_json(record) + "\n")
+            self._spool.flush()
+            self._dirty = True
+            self._buffer.extend(records)
+            if len(self._buffer) >= LOG_BATCH_SIZE:
+                self._cond.notify()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    # --- WĄTEK ZAPISU ---
+
+    def _run(self):
+        interval = LOG_FLUSH_INTERVAL_MS / 1000
+        # Przy fsync wątek budzi się częściej niż co paczkę - jeden fsync obejmuje wszystkie nowe wpisy
+        wait = min(interval, LOG_SPOOL_FSYNC_MS / 1000) if LOG_SPOOL_FSYNC else interval
+        next_flush = time.monotonic() + interval
+        while True:
+            batch = None
+            with self._cond:
+                if not self._stop and len(self._buffer) < LOG_BATCH_SIZE:
+                    self._cond.wait(timeout=wait)
+                stopping = self._stop
+                dirty, self._dirty = self._dirty, False
+                spool = self._spool
+                if not self._buffer and stopping:
+                    return
+                if self._buffer and (stopping or len(self._buffer) >= LOG_BATCH_SIZE
+                                     or time.monotonic() >= next_flush):
+                    batch, self._buffer = self._buffer, []
+                    self._rotate_spool()
+                    files, self._covered_files = self._covered_files, []
+
+            # fsync poza blokadą: plik zamyka tylko ten wątek, wywołujący dopisują dalej
+            if dirty and LOG_SPOOL_FSYNC:
+                if batch is None:
+                    os.fsync(spool.fileno())
+                else:
+                    self._fsync_path(files[-1])
+            if batch is None:
+                continue
+            next_flush = time.monotonic() + interval
+
+            try:
+                self._flush(batch)
+                zapisane = batch
+            except Exception as e:
+                if not _blad_danych(e):
+                    # Brak połączenia / przeciążenie bazy - cała paczka czeka na ponowienie.
+                    # Błąd w kodzie (np. w statystykach) też: wpisy nie trafiają do odrzuconych
+                    if isinstance(e, SQLAlchemyError):
+                        print(f"❌ [Logi] Błąd zapisu paczki ({len(batch)} wpisów), ponowię: {e}")
+                    else:
+                        print(f"❌ [Logi] Nieoczekiwany błąd zapisu paczki ({len(batch)} wpisów), ponowię:")
+                        traceback.print_exc()
+                    self._requeue(batch, files)
+                    if stopping:
+                        return
+                    time.sleep(interval)
+                    continue
+                # Jeden błędny wpis nie może blokować pozostałych - zapis pojedynczo
+                print(f"⚠️ [Logi] Paczka odrzucona przez bazę ({e.__class__.__name__}), zapis pojedynczo")
+                zapisane, pozostale = self._flush_pojedynczo(batch)
+                if pozostale:
+                    # Część wpisów jest już w bazie - spool przepisujemy tylko z niezapisanymi
+                    self._requeue(pozostale, [self._zapisz_spool(pozostale)])
+                    for path in files:
+                        os.remove(path)
+                    self.flushed_total += len(batch) - len(pozostale)
+                    if stopping:
+                        return
+                    time.sleep(interval)
+                    continue
+
+            for path in files:
+                os.remove(path)
+            self.flushed_total += len(zapisane)
+
+            if stopping and not self._buffer:
+                return
+
+    def _requeue(self, records, files):
+        with self._cond:
+            # Wpisy wracają na początek bufora, pliki spool zostają na dysku
+            self._buffer = records + self._buffer
+            self._covered_files = files + self._covered_files
+
+    def _flush_pojedynczo(self, batch):
+        """
+        Zapis wpis po wpisie. Wpisy, których baza nie przyjmuje, trafiają do pliku
+        LOG_DEAD_LETTER_FILE. Zwraca (zapisane, niezapisane przez utratę połączenia).
+        """
+        zapisane = []
+        for i, record in enumerate(batch):
+            try:
+                self._flush([record])
+                zapisane.append(record)
+            except Exception as e:
+                if not _blad_danych(e):
+                    return zapisane, batch[i:]
+                self._odrzuc(record, e)
+        return zapisane, []
+
+    def _odrzuc(self, record, error):
+        path = os.path.join(self.spool_dir, LOG_DEAD_LETTER_FILE)
+        wpis = json.loads(_to_json(record))
+        wpis["blad"] = f"{error.__class__.__name__}: {str(error).splitlines()[0] if str(error) else ''}"
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(wpis) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"❌ [Logi] Wpis odrzucony przez bazę zapisano w {path}: {wpis['blad']}")
+
+    def _zapisz_spool(self, records):
+        """Osobny plik spool dla wpisów do ponowienia (odtwarzany po restarcie)."""
+        with self._cond:
+            self._sequence += 1
+            path = os.path.join(self.spool_dir, f"proba_wejscia_{time.time_ns()}_{self._sequence}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(_to_json(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return path
+
+    @staticmethod
+    def _fsync_path(path):
+        """fsync zamkniętego już pliku spool (dane są w pamięci podręcznej systemu)."""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _flush(self, batch):
+        # Wielowierszowe INSERT-y (insertmanyvalues w SQLAlchemy 2.0) w jednej transakcji,
+        # żeby ponowienie po błędzie nie dublowało części paczki (ani liczników statystyk)
+        bez_id, z_id = [], {}
+        for record in batch:
+            if record.get("id_proby"):
+                # Ta sama próba dwa razy w jednej paczce (ponowna wysyłka z bramki)
+                z_id.setdefault((record["id_proby"], record["data_czas"]), record)
+            else:
+                bez_id.append({**record, "id_proby": None})
+
+        with engine.begin() as conn:
+            for start in range(0, len(bez_id), LOG_BATCH_SIZE):
+                conn.execute(insert(ProbaWejscia), bez_id[start:start + LOG_BATCH_SIZE])
+            zapisane = bez_id + self._wstaw_bez_duplikatow(conn, list(z_id.values()))
+            zapisz_statystyki(conn, zapisane)
+
+    @staticmethod
+    def _wstaw_bez_duplikatow(conn, records) -> list:
+        """Wstawia próby z id_proby, pomijając już zapisane. Zwraca faktycznie wstawione."""
+        if not records:
+            return []
+        dialekt = postgresql if conn.dialect.name == "postgresql" else sqlite
+        stmt = (
+            dialekt.insert(ProbaWejscia)
+            .on_conflict_do_nothing(index_elements=["id_proby", "data_czas"])
+            .returning(ProbaWejscia.id_proby)
+        )
+        wstawione = set()
+        for start in range(0, len(records), LOG_BATCH_SIZE):
+            wstawione.update(conn.execute(stmt, records[start:start + LOG_BATCH_SIZE]).scalars())
+        return [r for r in records if r["id_proby"] in wstawione]
+
+
+# Globalna instancja używana przez main.py
+access_log_writer = AccessLogWriter()
@@ -1,25 +1,48 @@
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Form
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Form, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, date
 import shutil
 import os
+import asyncio
+import tempfile
 import qrcode
 from io import BytesIO
 from fastapi.middleware.cors import CORSMiddleware
 
 # Importy modułów projektu
-from database import engine, get_db
-from models import Base, Administrator, Pracownik, Przepustka, Bramka, ProbaWejscia, ZdjecieReferencyjne
+from database import engine, get_async_db, AsyncSessionLocal
+from models import Base, Administrator, Pracownik, Przepustka, Bramka, ProbaWejscia, ZdjecieReferencyjne, Raport
 from schemas import PracownikCreate, PracownikResponse, PrzepustkaCreate, VerificationResponse, BramkaCreate
+from schemas import BramkaDetektor
+from schemas import IdentificationResponse, RaportCreate, RaportResponse, ProbaOffline, SesjaResponse
+from typing import Optional, List
 
 # System rozpoznawania twarzy
-from face_recognition_system import verify_face, update_person_embedding
+from face_recognition_system import verify_face, warm_up, identify_face, DETECTORS, THRESHOLD_PERCENT
+from face_recognition_system import remove_person_embedding, batching_metrics, get_reference_vector, embed_image
+from inference_pool import inference_pool, InferenceQueueFull
+from enrollment import enrollment_queue
+from bulk_import import importuj_z_pliku
+from evidence import UPLOAD_DIR, czy_zachowac, sciezka_dowodu, zapisz_dowod, usun_stare_dowody
+from log_writer import access_log_writer
+from pass_cache import pobierz_przepustke, pobierz_bramke, uniewaznij_przepustke, uniewaznij_bramke
+from migrate import uruchom_migracje, utrzymanie_partycji
+from pagination import (PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, FORMATS, MEDIA_TYPES, wybierz_kolumny,
+                        po_kursorze, strona, eksportuj)
+from anomaly_detector import anomaly_detector, WYNIK_OK, WYNIK_QR, WYNIK_BIOMETRIA, WYNIK_BLAD
+from event_hub import event_hub, parsuj_bramki, format_sse
+from raporty import ZIARNA, WYMIARY, TYPY_RAPORTOW, statystyki, generuj_raport, przelicz_statystyki
+from gate_sync import snapshot, zmiany, ZMIANA_PRZEPUSTKA, ZMIANA_WZORZEC
+from verification_session import SesjaWeryfikacji, sesje, SESSION_MAX_FRAMES, SESSION_SWEEP_S
 
 from fastapi import BackgroundTasks
 from email_utils import send_qr_email
-# Inicjalizacja bazy danych
+# Inicjalizacja bazy danych (brakujące tabele + migracje z Database/migrations)
 Base.metadata.create_all(bind=engine)
+uruchom_migracje()
 
 app = FastAPI(title="System Kontroli Wejść - Zgodny z Inżynierią Wymagań")
 
@@ -33,35 +56,149 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Konfiguracja folderów
-UPLOAD_DIR = "uploads"
+# Konfiguracja folderów (UPLOAD_DIR - zdjęcia dowodowe, patrz evidence.py)
 REF_DIR = "reference_faces"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(REF_DIR, exist_ok=True)
 
 
+# Stan gotowości aplikacji (ustawiany po rozgrzewce modeli)
+_gotowosc = {"ready": False, "blad": None}
+
+
+async def _rozgrzej_modele():
+    try:
+        # Detektory ustawione na bramkach ładujemy od razu - pierwsze wejście nie czeka na model
+        async with AsyncSessionLocal() as db:
+            detektory = (await db.execute(
+                select(Bramka.detektor).where(Bramka.detektor.isnot(None)).distinct()
+            )).scalars().all()
+        await inference_pool.run(warm_up, detektory)
+        _gotowosc["ready"] = True
+    except Exception as e:
+        print(f"Błąd rozgrzewki modeli: {e}")
+        _gotowosc["blad"] = str(e)
+
+
+async def _zadania_dobowe():
+    """Raz na dobę: usuwa stare zdjęcia dowodowe i utrzymuje partycje tabeli logów."""
+    while True:
+        try:
+            await asyncio.to_thread(usun_stare_dowody)
+        except Exception as e:
+            print(f"Błąd sprzątania zdjęć dowodowych: {e}")
+        try:
+            await asyncio.to_thread(utrzymanie_partycji)
+        except Exception as e:
+            print(f"Błąd utrzymania partycji logów: {e}")
+        await asyncio.sleep(24 * 3600)
+
+
+async def _zamykaj_porzucone_sesje():
+    """Sesje wieloklatkowe, w których bramka przestała wysyłać klatki - odmowa po czasie w logach."""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_S)
+        try:
+            zadania = BackgroundTasks()
+            for sesja in sesje.values():
+                if not sesja.zakonczona and sesja.po_czasie():
+                    _zakoncz_sesje(zadania, sesja)
+            await zadania()
+        except Exception as e:
+            print(f"Błąd zamykania sesji weryfikacji: {e}")
+
+
+@app.on_event("startup")
+async def uruchom_pule_inferencji():
+    """Startuje pulę wątków z modelami i rozgrzewkę w tle przed przyjęciem ruchu z bramek."""
+    inference_pool.start()
+    enrollment_queue.start()
+    access_log_writer.start()
+    app.state.rozgrzewka = asyncio.create_task(_rozgrzej_modele())
+    app.state.sprzatanie = asyncio.create_task(_zadania_dobowe())
+    app.state.sesje = asyncio.create_task(_zamykaj_porzucone_sesje())
+
+
+@app.on_event("shutdown")
+async def zatrzymaj_pule_inferencji():
+    enrollment_queue.stop()
+    inference_pool.shutdown()
+    await asyncio.to_thread(access_log_writer.stop)
+
+
+# ==========================================
+# 0. STAN APLIKACJI
+# ==========================================
+
+@app.get("/health/live")
+async def health_live():
+    """Proces działa (nie oznacza gotowości do weryfikacji)."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Zwraca 200 dopiero po załadowaniu modeli i bazy wektorów."""
+    if _gotowosc["ready"]:
+        return {"status": "ready"}
+    return JSONResponse(
+        status_code=503,
+        content={"status": "warming_up" if not _gotowosc["blad"] else "error", "detail": _gotowosc["blad"]}
+    )
+
+
+@app.get("/metryki/inferencja")
+async def metryki_inferencji():
+    """Obciążenie puli inferencji, skuteczność paczkowania ArcFace (BATCH_INFERENCE) i podłączone panele."""
+    return {
+        "pula": {"watki": inference_pool.workers, "oczekujace": inference_pool.pending},
+        "paczkowanie": batching_metrics(),
+        "panele": {"subskrybenci": event_hub.subskrybenci},
+    }
+
+
 # ==========================================
 # 1. SETUP I KONFIGURACJA (Admin, Bramki)
 # ==========================================
 
 @app.post("/setup/bramka")
-async def stworz_bramke(bramka: BramkaCreate, db: Session = Depends(get_db)):
+async def stworz_bramke(bramka: BramkaCreate, db: AsyncSession = Depends(get_async_db)):
     """Tworzy punkt kontrolny (bramkę)."""
-    nowa_bramka = Bramka(nazwa=bramka.nazwa, lokalizacja=bramka.lokalizacja)
+    if bramka.detektor is not None and bramka.detektor not in DETECTORS:
+        raise HTTPException(status_code=400, detail=f"Nieznany detektor (dozwolone: {', '.join(DETECTORS)})")
+    nowa_bramka = Bramka(nazwa=bramka.nazwa, lokalizacja=bramka.lokalizacja, detektor=bramka.detektor)
     db.add(nowa_bramka)
-    db.commit()
-    db.refresh(nowa_bramka)
+    await db.commit()
+    # Mogła być zapamiętana odpowiedź "bramka nie istnieje" dla tego ID
+    uniewaznij_bramke(nowa_bramka.id)
     return {"msg": "Bramka utworzona", "id": nowa_bramka.id}
 
 @app.get("/setup/bramki")
-async def pobierz_bramki(db: Session = Depends(get_db)):
+async def pobierz_bramki(db: AsyncSession = Depends(get_async_db)):
     """Zwraca listę wszystkich zarejestrowanych bramek."""
-    bramki = db.query(Bramka).all()
+    bramki = (await db.execute(select(Bramka))).scalars().all()
     return bramki
+
+@app.put("/setup/bramka/{bramka_id}/detektor")
+async def ustaw_detektor_bramki(bramka_id: int, dane: BramkaDetektor, db: AsyncSession = Depends(get_async_db)):
+    """
+    Detektor twarzy dla bramki (np. tańszy "yunet" albo "skip", gdy kamera wysyła wycinek
+    twarzy). null przywraca globalny FACE_DETECTOR.
+    """
+    if dane.detektor is not None and dane.detektor not in DETECTORS:
+        raise HTTPException(status_code=400, detail=f"Nieznany detektor (dozwolone: {', '.join(DETECTORS)})")
+    bramka = await db.get(Bramka, bramka_id)
+    if not bramka:
+        raise HTTPException(status_code=404, detail="Bramka nie istnieje")
+    bramka.detektor = dane.detektor
+    await db.commit()
+    uniewaznij_bramke(bramka_id)
+    return {"msg": "Detektor zmieniony", "id": bramka_id, "detektor": dane.detektor}
+
 @app.post("/setup/admin")
-async def stworz_admina(db: Session = Depends(get_db)):
+async def stworz_admina(db: AsyncSession = Depends(get_async_db)):
     """Tworzy domyślnego administratora wymaganego do relacji."""
-    if db.query(Administrator).first():
+    if (await db.execute(select(Administrator).limit(1))).scalars().first():
         return {"msg": "Admin już istnieje"}
 
     admin = Administrator(
@@ -69,7 +206,7 @@ async def stworz_admina(db: Session = Depends(get_db)):
         imie="Jan", nazwisko="Admin"
     )
     db.add(admin)
-    db.commit()
+    await db.commit()
     return {"msg": "Administrator utworzony", "id": admin.id}
 
 
@@ -78,15 +215,16 @@ async def stworz_admina(db: Session = Depends(get_db)):
 # ==========================================
 
 @app.post("/pracownik", response_model=PracownikResponse)
-async def dodaj_pracownika(pracownik: PracownikCreate, db: Session = Depends(get_db)):
+async def dodaj_pracownika(pracownik: PracownikCreate, db: AsyncSession = Depends(get_async_db)):
     """Rejestruje pracownika i tworzy folder na zdjęcia referencyjne."""
 
     # Sprawdzenie unikalności ID pracownika (folderu)
-    if db.query(Pracownik).filter(Pracownik.id_pracownika == pracownik.id_pracownika).first():
+    istniejacy = await db.execute(select(Pracownik.id).where(Pracownik.id_pracownika == pracownik.id_pracownika))
+    if istniejacy.first():
         raise HTTPException(status_code=400, detail="Pracownik o tym ID już istnieje")
 
     # Sprawdzenie czy istnieje administrator (Foreign Key)
-    if not db.query(Administrator).filter(Administrator.id == pracownik.administrator_id).first():
+    if not await db.get(Administrator, pracownik.administrator_id):
         raise HTTPException(status_code=400, detail="Brak administratora. Użyj /setup/admin")
 
     nowy_pracownik = Pracownik(
@@ -99,8 +237,8 @@ async def dodaj_pracownika(pracownik: PracownikCreate, db: Session = Depends(get
         data_zatrudnienia=pracownik.data_zatrudnienia
     )
     db.add(nowy_pracownik)
-    db.commit()
-    db.refresh(nowy_pracownik)
+    await db.commit()
+    await db.refresh(nowy_pracownik)
 
     # Tworzenie fizycznego folderu dla DeepFace
     os.makedirs(os.path.join(REF_DIR, pracownik.id_pracownika), exist_ok=True)
@@ -108,32 +246,68 @@ async def dodaj_pracownika(pracownik: PracownikCreate, db: Session = Depends(get
     return nowy_pracownik
 
 
+async def _zapisz_zdjecia_referencyjne(pracownik: Pracownik, pliki, db: AsyncSession):
+    """Zapisuje pliki w folderze pracownika i rejestruje je w bazie (jeden commit)."""
+    sciezki = []
+    for plik in pliki:
+        sciezka = os.path.join(REF_DIR, pracownik.id_pracownika, plik.filename)
+        with open(sciezka, "wb") as buffer:
+            shutil.copyfileobj(plik.file, buffer)
+        db.add(ZdjecieReferencyjne(pracownik_id=pracownik.id, sciezka_pliku=sciezka))
+        sciezki.append(sciezka)
+    await db.commit()
+    return sciezki
+
+
 @app.post("/pracownik/zdjecie")
 async def dodaj_zdjecie_referencyjne(
         pracownik_id: int = Form(...),
         plik: UploadFile = File(...),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    """Wgrywa zdjęcie 'wzorca' do folderu pracownika."""
-    pracownik = db.query(Pracownik).filter(Pracownik.id == pracownik_id).first()
+    """
+    Wgrywa zdjęcie 'wzorca' do folderu pracownika.
+    Wektor twarzy liczony jest w tle - status pod GET /enrollment/{job_id}.
+    """
+    pracownik = await db.get(Pracownik, pracownik_id)
+    if not pracownik:
+        raise HTTPException(status_code=404, detail="Pracownik nie istnieje")
+
+    sciezka, = await _zapisz_zdjecia_referencyjne(pracownik, [plik], db)
+    job_id = enrollment_queue.submit(pracownik.id_pracownika, [sciezka])
+
+    return {"msg": "Zdjęcie dodane", "path": sciezka, "job_id": job_id}
+
+
+@app.post("/pracownik/zdjecia")
+async def dodaj_zdjecia_referencyjne(
+        pracownik_id: int = Form(...),
+        pliki: List[UploadFile] = File(...),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """Wgrywa kilka zdjęć naraz - jedno zlecenie i jedno przeliczenie wzorca."""
+    pracownik = await db.get(Pracownik, pracownik_id)
     if not pracownik:
         raise HTTPException(status_code=404, detail="Pracownik nie istnieje")
 
-    sciezka = os.path.join(REF_DIR, pracownik.id_pracownika, plik.filename)
+    sciezki = await _zapisz_zdjecia_referencyjne(pracownik, pliki, db)
+    job_id = enrollment_queue.submit(pracownik.id_pracownika, sciezki)
+
+    return {"msg": f"Dodano zdjęć: {len(sciezki)}", "paths": sciezki, "job_id": job_id}
 
-    with open(sciezka, "wb") as buffer:
-        shutil.copyfileobj(plik.file, buffer)
 
-    db_zdjecie = ZdjecieReferencyjne(pracownik_id=pracownik.id, sciezka_pliku=sciezka)
-    db.add(db_zdjecie)
-    db.commit()
+@app.get("/enrollment/{job_id}")
+async def status_przetwarzania(job_id: str):
+    """Status zlecenia wyliczenia wektora twarzy (oczekuje/przetwarzanie/zakonczone/blad)."""
+    job = enrollment_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Zlecenie nie istnieje")
+    return job
 
-    update_person_embedding(pracownik.id_pracownika)
 
-    return {"msg": "Zdjęcie dodane", "path": sciezka}
 @app.delete("/pracownik/{id}")
-async def usun_pracownika(id: int, db: Session = Depends(get_db)):
-    pracownik = db.query(Pracownik).filter(Pracownik.id == id).first()
+async def usun_pracownika(id: int, db: AsyncSession = Depends(get_async_db)):
+    pracownik = await db.get(Pracownik, id, options=[selectinload(Pracownik.przepustka)])
     if not pracownik:
         raise HTTPException(status_code=404, detail="Pracownik nie istnieje")
 
@@ -142,14 +316,81 @@ async def usun_pracownika(id: int, db: Session = Depends(get_db)):
     if os.path.exists(folder_path):
         shutil.rmtree(folder_path)
 
-    db.delete(pracownik)
-    db.commit()
+    # Usunięcie wektora z bazy i indeksu wyszukiwania 1:N
+    remove_person_embedding(pracownik.id_pracownika)
+
+    kod_qr = pracownik.przepustka.kod_qr if pracownik.przepustka else None
+
+    await db.delete(pracownik)
+    # Bramki offline usuwają przepustkę i wzorzec przy następnej synchronizacji
+    db.add_all(zmiany(ZMIANA_PRZEPUSTKA, [kod_qr]) + zmiany(ZMIANA_WZORZEC, [pracownik.id_pracownika]))
+    await db.commit()
+    if kod_qr:
+        uniewaznij_przepustke(kod_qr)
     return {"msg": "Pracownik usunięty"}
 
 
+@app.post("/pracownicy/import")
+async def importuj_pracownikow_csv(
+        plik_csv: UploadFile = File(...),
+        zdjecia: Optional[UploadFile] = File(None),
+        administrator_id: int = Form(1)
+):
+    """
+    Import całego działu: plik CSV + archiwum zip ze zdjęciami (podkatalogi <id_pracownika>/).
+    Zwraca przepustowość (zdjęcia/s) oraz błędy dla poszczególnych wierszy.
+    """
+    csv_text = (await plik_csv.read()).decode("utf-8-sig")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        zrodlo = None
+        if zdjecia is not None:
+            zrodlo = os.path.join(tmp, "zdjecia.zip")
+            with open(zrodlo, "wb") as buffer:
+                shutil.copyfileobj(zdjecia.file, buffer)
+
+        try:
+            # Import trwa długo - wykonujemy go w osobnym wątku, poza pętlą zdarzeń
+            return await asyncio.to_thread(importuj_z_pliku, csv_text, zrodlo, administrator_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _lista(db, stmt, klucz, kursor, typy, limit, format, malejaco=False, nazwa="eksport"):
+    """Wspólna obsługa list: strona JSON z kursorem albo strumień NDJSON/CSV od kursora do końca."""
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Nieznany format (dozwolone: {', '.join(FORMATS)})")
+    try:
+        stmt = po_kursorze(stmt, klucz, kursor, typy, malejaco)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if format == "json":
+        return await strona(db, stmt, klucz, limit)
+    return StreamingResponse(
+        eksportuj(stmt, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={nazwa}.{format}"}
+    )
+
+
 @app.get("/pracownicy")
-async def pobierz_pracownikow(db: Session = Depends(get_db)):
-    return db.query(Pracownik).all()
+async def pobierz_pracownikow(
+        kursor: Optional[str] = None,
+        limit: int = PAGE_SIZE_DEFAULT,
+        kolumny: Optional[str] = None,
+        format: str = "json",
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Lista pracowników stronicowana po id. Odpowiedź: {"items": [...], "next_cursor": ...};
+    kolejną stronę pobiera się z ?kursor=<next_cursor>. format=ndjson|csv zwraca całość strumieniem.
+    """
+    try:
+        wybrane = wybierz_kolumny(Pracownik.__table__, kolumny, wymagane=("id",))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    klucz = (Pracownik.id,)
+    return await _lista(db, select(*wybrane), klucz, kursor, (int,), limit, format, nazwa="pracownicy")
 
 
 # ==========================================
@@ -160,10 +401,10 @@ async def pobierz_pracownikow(db: Session = Depends(get_db)):
 async def generuj_przepustke_qr(
         dane: PrzepustkaCreate,
         background_tasks: BackgroundTasks,  # <--- Wstrzyknięcie zadań w tle
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     """Generuje kod QR i wysyła go mailem."""
-    pracownik = db.query(Pracownik).filter(Pracownik.id == dane.pracownik_id).first()
+    pracownik = await db.get(Pracownik, dane.pracownik_id)
     if not pracownik:
         raise HTTPException(status_code=404, detail="Pracownik nie istnieje")
 
@@ -171,9 +412,12 @@ async def generuj_przepustke_qr(
     qr_content = f"UID:{pracownik.id_pracownika}"
 
     # Logika zapisu w bazie (bez zmian)
-    existing_pass = db.query(Przepustka).filter(Przepustka.pracownik_id == pracownik.id).first()
+    existing_pass = (await db.execute(
+        select(Przepustka).where(Przepustka.pracownik_id == pracownik.id)
+    )).scalars().first()
     if existing_pass:
         existing_pass.aktywna = False  # Dezaktywuj starą jeśli istnieje
+        uniewaznij_przepustke(existing_pass.kod_qr)
 
     nowa_przepustka = Przepustka(
         pracownik_id=pracownik.id,
@@ -182,7 +426,9 @@ async def generuj_przepustke_qr(
         aktywna=True
     )
     db.add(nowa_przepustka)
-    db.commit()
+    db.add_all(zmiany(ZMIANA_PRZEPUSTKA, [existing_pass.kod_qr if existing_pass else None, qr_content]))
+    await db.commit()
+    uniewaznij_przepustke(qr_content)
 
     # Generowanie obrazka PNG
     qr = qrcode.QRCode(version=1, box_size=10, border=5)
@@ -217,88 +463,161 @@ async def generuj_przepustke_qr(
 # 4. WERYFIKACJA (CORE SYSTEMU)
 # ==========================================
 
+async def _sprawdz_przepustke(db: AsyncSession, bramka_id: int, qr_data: str):
+    """Zwraca (bramka, przepustka lub None gdy QR nieprawidłowy/przeterminowany)."""
+    bramka = await pobierz_bramke(db, bramka_id)
+    if not bramka:
+        raise HTTPException(status_code=404, detail="Bramka nie istnieje")
+
+    przepustka = await pobierz_przepustke(db, qr_data)
+    if not przepustka or przepustka["data_waznosci"] < date.today():
+        return bramka, None
+    return bramka, przepustka
+
+
+def _opublikuj_probe(log_entry: ProbaWejscia, alerty: list, osoba: Optional[str] = None):
+    """Wynik próby i nowe alerty do podłączonych paneli (bez zapytań do bazy)."""
+    event_hub.publikuj("weryfikacja", {
+        "bramka_id": log_entry.bramka_id,
+        "pracownik_id": log_entry.pracownik_id,
+        "osoba": osoba,
+        "wynik_qr": log_entry.wynik_qr,
+        "wynik_biometryczny": log_entry.wynik_biometryczny,
+        "status_finalny": log_entry.status_finalny,
+        "procent_podobienstwa": log_entry.procent_podobienstwa,
+        "podejrzana": bool(log_entry.podejrzana),
+    })
+    for alert in alerty:
+        event_hub.publikuj("alert", alert)
+
+
+def _odmowa_qr(bramka: dict, background_tasks: Optional[BackgroundTasks] = None,
+               dane_zdjecia: Optional[bytes] = None):
+    """Rejestruje próbę z nieprawidłowym QR i zwraca odpowiedź odmowną."""
+    podejrzana, alerty = anomaly_detector.zdarzenie(bramka, WYNIK_QR)
+
+    # Zdjęcie (jeśli bramka je przysłała) zgodnie z polityką - po werdykcie reguł anomalii,
+    # żeby EVIDENCE_POLICY=podejrzane zachowała dowód np. serii prób z cudzymi kodami
+    sciezka_zdjecia = None
+    if dane_zdjecia is not None and czy_zachowac(qr_poprawny=False, podejrzana=podejrzana):
+        sciezka_zdjecia = sciezka_dowodu(bramka["id"])
+        background_tasks.add_task(zapisz_dowod, dane_zdjecia, sciezka_zdjecia)
+
+    log_entry = ProbaWejscia(
+        bramka_id=bramka["id"],
+        sciezka_zdjecia=sciezka_zdjecia,
+        procent_podobienstwa=0.0,
+        podejrzana=podejrzana,
+        wynik_qr="INVALID",
+        status_finalny="ODMOWA - nieprawidłowy QR",  # Zgodne z diagramem
+        wynik_biometryczny="N/A"
+    )
+    access_log_writer.zapisz(log_entry)
+    _opublikuj_probe(log_entry, alerty)
+
+    return VerificationResponse(
+        success=False,
+        message="Nieprawidłowa przepustka",
+        confidence=0.0
+    )
+
+
+@app.post("/verify/qr", response_model=VerificationResponse)
+async def verify_qr(
+        bramka_id: int = Form(...),
+        qr_data: str = Form(...),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Lekka wstępna weryfikacja samego kodu QR (bez zdjęcia).
+    Bramka może ją wywołać zaraz po zeskanowaniu kodu i nie wysyłać zdjęcia,
+    jeśli przepustka jest nieprawidłowa.
+    """
+    bramka, przepustka = await _sprawdz_przepustke(db, bramka_id, qr_data)
+    if not przepustka:
+        return _odmowa_qr(bramka)
+
+    return VerificationResponse(success=True, message="Przepustka ważna - prosimy spojrzeć w kamerę")
+
+
 @app.post("/verify", response_model=VerificationResponse)
 async def verify_entry(
+        background_tasks: BackgroundTasks,  # Zapis zdjęcia dowodowego po wysłaniu odpowiedzi
         bramka_id: int = Form(...),
         qr_data: str = Form(...),
         face_image: UploadFile = File(...),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     """
     Implementacja logiki z Diagramu Aktywności (Dokumentacja, str. 6).
-    1. Sprawdź ważność QR.
+    1. Sprawdź ważność QR (zanim cokolwiek trafi na dysk).
     2. Jeśli QR OK -> Wykonaj porównanie twarzy.
     3. Jeśli podobieństwo >= 90% -> SUKCES.
     4. W przeciwnym razie -> ODMOWA.
+    Zdjęcie zostaje na dysku tylko zgodnie z polityką EVIDENCE_POLICY.
     """
 
-    # --- KROK 0: Kontekst Bramki ---
-    bramka = db.query(Bramka).filter(Bramka.id == bramka_id).first()
-    if not bramka:
-        raise HTTPException(status_code=404, detail="Bramka nie istnieje")
+    # --- KROK 0 i 1: Bramka i weryfikacja QR (cache, bez operacji na pliku) ---
+    bramka, przepustka = await _sprawdz_przepustke(db, bramka_id, qr_data)
 
-    # Przygotowanie obiektu logu
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    temp_image_path = os.path.join(UPLOAD_DIR, f"entry_{bramka_id}_{timestamp}.jpg")
+    # Przypadek: Błędny QR lub przeterminowany
+    if not przepustka:
+        return _odmowa_qr(bramka, background_tasks, await face_image.read())
 
-    # Zapisz zdjęcie z kamery (wymagane do analizy i dowodów)
-    with open(temp_image_path, "wb") as buffer:
-        shutil.copyfileobj(face_image.file, buffer)
+    # --- KROK 2: QR Poprawny -> Weryfikacja Biometryczna ---
+    # Zdjęcie zostaje w pamięci - dekodowane raz i przekazywane do detekcji jako tablica
+    dane_zdjecia = await face_image.read()
 
-    log_entry = ProbaWejscia(
-        bramka_id=bramka.id,
-        sciezka_zdjecia=temp_image_path,
-        procent_podobienstwa=0.0,
-        podejrzana=False
-    )
+    try:
+        # Wywołanie zewnętrznego modułu rozpoznawania (w puli wątków, poza pętlą zdarzeń)
+        is_matched_deepface, conf_val = await inference_pool.run(
+            verify_face,
+            test_img=dane_zdjecia,
+            expected_person=przepustka["id_pracownika"],
+            detector_backend=bramka["detektor"]
+        )
 
-    # --- KROK 1: Weryfikacja QR ---
-    przepustka = db.query(Przepustka).filter(
-        Przepustka.kod_qr == qr_data,
-        Przepustka.aktywna == True
-    ).first()
+    except InferenceQueueFull:
+        # Wszystkie wątki zajęte - bramka ponawia próbę, nie zapisujemy logu
+        raise HTTPException(status_code=503, detail="Serwer przeciążony, spróbuj ponownie")
 
-    # Przypadek: Błędny QR lub przeterminowany
-    if not przepustka or przepustka.data_waznosci < date.today():
-        log_entry.wynik_qr = "INVALID"
-        log_entry.status_finalny = "ODMOWA - nieprawidłowy QR"  # Zgodne z diagramem
-        log_entry.wynik_biometryczny = "N/A"
-
-        db.add(log_entry)
-        db.commit()
-
-        return VerificationResponse(
-            success=False,
-            message="Nieprawidłowa przepustka",
-            confidence=0.0
-        )
+    except Exception as e:
+        print(f"Błąd krytyczny DeepFace: {e}")
+        conf_val = None
 
-    # --- KROK 2: QR Poprawny -> Weryfikacja Biometryczna ---
-    log_entry.wynik_qr = "OK"
-    pracownik = przepustka.pracownik
-    log_entry.pracownik_id = pracownik.id
+    return _rozstrzygnij(background_tasks, bramka, przepustka, qr_data, conf_val, dane_zdjecia)
 
-    # Wyciągamy identyfikator folderu ze zdjęciami tego pracownika
-    folder_ref = pracownik.id_pracownika
 
-    try:
-        # Wywołanie zewnętrznego modułu rozpoznawania
-        is_matched_deepface, conf_val = verify_face(
-            test_img=temp_image_path,
-            expected_person=folder_ref
-        )
+def _rozstrzygnij(background_tasks: BackgroundTasks, bramka: dict, przepustka: dict, qr_data: str,
+                  conf_val: Optional[float], dane_zdjecia: Optional[bytes]) -> VerificationResponse:
+    """
+    Decyzja dla poprawnej przepustki na podstawie podobieństwa twarzy (None = błąd systemu):
+    wpis w logach, reguły anomalii, zdjęcie dowodowe i zdarzenie dla paneli.
+    Jedna próba wejścia = jedno wywołanie, niezależnie od liczby klatek.
+    """
+    log_entry = ProbaWejscia(
+        bramka_id=bramka["id"],
+        procent_podobienstwa=0.0,
+        podejrzana=False
+    )
+    log_entry.wynik_qr = "OK"
+    log_entry.pracownik_id = przepustka["pracownik_id"]
+    imie_nazwisko = f"{przepustka['imie']} {przepustka['nazwisko']}"
 
+    if conf_val is None:
+        log_entry.status_finalny = "BŁĄD SYSTEMU"
+        komunikat = "Błąd wewnętrzny serwera przetwarzania obrazu"
+        db_success = False
+    else:
         # Zapisz wynik liczbowy
         log_entry.procent_podobienstwa = conf_val
 
         # --- KROK 3: Decyzja (Próg 90%) ---
-        THRESHOLD = 90.0  # Wymaganie z dokumentacji (str. 3 i 6)
-
-        if conf_val >= THRESHOLD:
+        if conf_val >= THRESHOLD_PERCENT:
             # SUKCES
             log_entry.wynik_biometryczny = "MATCH"
             log_entry.status_finalny = "SUKCES"
-            komunikat = f"Wejście dozwolone. Witaj {pracownik.imie} {pracownik.nazwisko}"
+            komunikat = f"Wejście dozwolone. Witaj {imie_nazwisko}"
             db_success = True
         else:
             # ODMOWA BIOMETRYCZNA
@@ -308,34 +627,411 @@ async def verify_entry(
             komunikat = "Odmowa wejścia - weryfikacja nieudana"
             db_success = False
 
-    except Exception as e:
-        print(f"Błąd krytyczny DeepFace: {e}")
-        log_entry.status_finalny = "BŁĄD SYSTEMU"
-        komunikat = "Błąd wewnętrzny serwera przetwarzania obrazu"
-        db_success = False
-        log_entry.procent_podobienstwa = 0.0
-
-    # Zapisz log w bazie
-    db.add(log_entry)
-    db.commit()
+    # Reguły w przesuwnych oknach (powtarzane odmowy, ta sama przepustka na odległych bramkach)
+    if log_entry.status_finalny == "BŁĄD SYSTEMU":
+        wynik_proby = WYNIK_BLAD
+    else:
+        wynik_proby = WYNIK_OK if db_success else WYNIK_BIOMETRIA
+    podejrzana, alerty = anomaly_detector.zdarzenie(bramka, wynik_proby, qr_data, przepustka["pracownik_id"])
+    if podejrzana:
+        log_entry.podejrzana = True
+
+    # Zdjęcie zapisywane jako dowód (w tle, po odpowiedzi) tylko, jeśli wymaga tego polityka
+    do_wyjasnienia = log_entry.podejrzana or log_entry.status_finalny == "BŁĄD SYSTEMU"
+    if dane_zdjecia is not None and czy_zachowac(qr_poprawny=True, podejrzana=do_wyjasnienia):
+        sciezka = sciezka_dowodu(bramka["id"])
+        log_entry.sciezka_zdjecia = sciezka
+        background_tasks.add_task(zapisz_dowod, dane_zdjecia, sciezka)
+
+    # Zapisz log w bazie (buforowany zapis w tle - odpowiedź nie czeka na commit)
+    access_log_writer.zapisz(log_entry)
+    _opublikuj_probe(log_entry, alerty, imie_nazwisko)
 
     return VerificationResponse(
         success=db_success,
         message=komunikat,
-        person_name=f"{pracownik.imie} {pracownik.nazwisko}" if db_success else None,
+        person_name=imie_nazwisko if db_success else None,
         confidence=log_entry.procent_podobienstwa
     )
 
 
+async def _otworz_sesje(background_tasks: BackgroundTasks, bramka: dict, przepustka: dict, qr_data: str):
+    """(sesja, None) albo (None, odpowiedź), gdy nie da się pobrać wzorca (błąd systemu)."""
+    try:
+        wzorzec = await inference_pool.run(get_reference_vector, przepustka["id_pracownika"])
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail="Serwer przeciążony, spróbuj ponownie")
+    except Exception as e:
+        print(f"Błąd krytyczny DeepFace: {e}")
+        odpowiedz = _rozstrzygnij(background_tasks, bramka, przepustka, qr_data, None, None)
+        return None, SesjaResponse(**odpowiedz.dict())
+    return SesjaWeryfikacji(bramka, przepustka, qr_data, wzorzec), None
+
+
+def _zakoncz_sesje(background_tasks: BackgroundTasks, sesja: SesjaWeryfikacji, blad: bool = False) -> SesjaResponse:
+    """Jeden wpis w logach dla całej sesji; kolejne klatki dostają tę samą odpowiedź."""
+    odpowiedz = _rozstrzygnij(background_tasks, sesja.bramka, sesja.przepustka, sesja.qr_data,
+                              None if blad else sesja.procent, sesja.najlepsze_zdjecie)
+    sesja.odpowiedz = SesjaResponse(**odpowiedz.dict(), sesja_id=sesja.id, klatki=sesja.klatki)
+    return sesja.odpowiedz
+
+
+async def _klatka_sesji(background_tasks: BackgroundTasks, sesja: SesjaWeryfikacji, dane_zdjecia: bytes) -> SesjaResponse:
+    try:
+        wektor = await inference_pool.run(embed_image, dane_zdjecia, sesja.bramka["detektor"])
+    except InferenceQueueFull:
+        # Klatka nie jest liczona do budżetu - bramka może ją wysłać ponownie
+        raise HTTPException(status_code=503, detail="Serwer przeciążony, spróbuj ponownie")
+    except Exception as e:
+        print(f"Błąd krytyczny DeepFace: {e}")
+        return sesja.odpowiedz or _zakoncz_sesje(background_tasks, sesja, blad=True)
+
+    # Równoległa klatka tej samej sesji mogła już rozstrzygnąć
+    if sesja.zakonczona:
+        return sesja.odpowiedz
+    if sesja.dodaj(wektor, dane_zdjecia) is None:
+        return SesjaResponse(success=False, message="Prosimy patrzeć w kamerę", confidence=sesja.procent,
+                             sesja_id=sesja.id, zakonczona=False, klatki=sesja.klatki)
+    return _zakoncz_sesje(background_tasks, sesja)
+
+
+@app.post("/verify/sesja", response_model=SesjaResponse)
+async def rozpocznij_sesje(
+        background_tasks: BackgroundTasks,
+        bramka_id: int = Form(...),
+        qr_data: str = Form(...),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Weryfikacja wieloklatkowa, krok 1: sprawdza QR i otwiera sesję. Bramka wysyła kolejne
+    klatki na /verify/sesja/{sesja_id}/klatka, dopóki odpowiedź ma zakonczona=False.
+    Decyzja zapada, gdy połączony wynik klatek przekroczy próg albo skończy się budżet klatek.
+    """
+    bramka, przepustka = await _sprawdz_przepustke(db, bramka_id, qr_data)
+    if not przepustka:
+        return SesjaResponse(**_odmowa_qr(bramka).dict())
+
+    sesja, odpowiedz = await _otworz_sesje(background_tasks, bramka, przepustka, qr_data)
+    if odpowiedz:
+        return odpowiedz
+    for porzucona in sesje.set(sesja.id, sesja):
+        # Limit otwartych sesji - najstarsza nierozstrzygnięta też zostaje w logach
+        if not porzucona.zakonczona:
+            _zakoncz_sesje(background_tasks, porzucona)
+    return SesjaResponse(success=False, message="Przepustka ważna - prosimy spojrzeć w kamerę",
+                         sesja_id=sesja.id, zakonczona=False)
+
+
+@app.post("/verify/sesja/{sesja_id}/klatka", response_model=SesjaResponse)
+async def klatka_sesji(
+        sesja_id: str,
+        background_tasks: BackgroundTasks,
+        face_image: UploadFile = File(...)
+):
+    """Weryfikacja wieloklatkowa, krok 2: kolejna klatka (wczesne wyjście po decyzji)."""
+    sesja = sesje.get(sesja_id)
+    if sesja is None:
+        raise HTTPException(status_code=404, detail="Sesja nie istnieje lub wygasła")
+    if sesja.zakonczona:
+        return sesja.odpowiedz
+    return await _klatka_sesji(background_tasks, sesja, await face_image.read())
+
+
+@app.post("/verify/seria", response_model=SesjaResponse)
+async def verify_seria(
+        background_tasks: BackgroundTasks,
+        bramka_id: int = Form(...),
+        qr_data: str = Form(...),
+        face_images: List[UploadFile] = File(...),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Seria klatek w jednym żądaniu (najlepsza pierwsza). Klatki przetwarzane są po kolei
+    do decyzji - pozostałe nie przechodzą przez model. Jeden wpis w logach na serię.
+    """
+    bramka, przepustka = await _sprawdz_przepustke(db, bramka_id, qr_data)
+    if not przepustka:
+        return SesjaResponse(**_odmowa_qr(bramka, background_tasks, await face_images[0].read()).dict())
+
+    sesja, odpowiedz = await _otworz_sesje(background_tasks, bramka, przepustka, qr_data)
+    if odpowiedz:
+        return odpowiedz
+    for plik in face_images[:SESSION_MAX_FRAMES]:
+        odpowiedz = await _klatka_sesji(background_tasks, sesja, await plik.read())
+        if odpowiedz.zakonczona:
+            return odpowiedz
+    # Bramka przysłała mniej klatek niż budżet - decyzja na podstawie tego, co jest
+    return _zakoncz_sesje(background_tasks, sesja)
+
+
+@app.post("/identify", response_model=IdentificationResponse)
+async def identify_entry(
+        face_image: UploadFile = File(...),
+        top_k: int = Form(5, ge=1, le=100),
+        qr_data: Optional[str] = Form(None),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Identyfikacja 1:N - ranking najbardziej podobnych pracowników z całej bazy.
+    Jeśli podano qr_data, sprawdza czy twarz nie należy do kogoś innego niż właściciel QR
+    (przekazywanie przepustek).
+    """
+    dane_zdjecia = await face_image.read()
+
+    try:
+        candidates = await inference_pool.run(identify_face, dane_zdjecia, top_k=top_k)
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail="Serwer przeciążony, spróbuj ponownie")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    qr_owner = None
+    if qr_data:
+        przepustka = await pobierz_przepustke(db, qr_data)
+        if przepustka:
+            qr_owner = przepustka["id_pracownika"]
+
+    if candidates is None:
+        return IdentificationResponse(face_detected=False, qr_owner=qr_owner)
+
+    # Dane osobowe kandydatów jednym zapytaniem
+    wynik = await db.execute(
+        select(Pracownik).where(Pracownik.id_pracownika.in_([c["id_pracownika"] for c in candidates]))
+    )
+    pracownicy = {p.id_pracownika: p for p in wynik.scalars().all()}
+    for c in candidates:
+        p = pracownicy.get(c["id_pracownika"])
+        if p:
+            c.update(pracownik_id=p.id, imie=p.imie, nazwisko=p.nazwisko)
+
+    qr_sharing = bool(
+        qr_owner and candidates and candidates[0]["zgodnosc"]
+        and candidates[0]["id_pracownika"] != qr_owner
+    )
+
+    return IdentificationResponse(
+        face_detected=True,
+        candidates=candidates,
+        qr_owner=qr_owner,
+        qr_sharing=qr_sharing
+    )
+
+
 # ==========================================
 # 5. RAPORTY I LOGI
 # ==========================================
 
 @app.get("/logi/")
-async def pobierz_logi(pracownik_id: int, db: Session = Depends(get_db)):
-    """Pobiera historię wejść pracownika."""
-    logi = db.query(ProbaWejscia).filter(ProbaWejscia.pracownik_id == pracownik_id) \
-        .order_by(ProbaWejscia.data_czas.desc()).all()
-    return logi
+async def pobierz_logi(
+        pracownik_id: Optional[int] = None,
+        bramka_id: Optional[int] = None,
+        kursor: Optional[str] = None,
+        limit: int = PAGE_SIZE_DEFAULT,
+        kolumny: Optional[str] = None,
+        format: str = "json",
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Historia wejść (od najnowszych), stronicowana po (data_czas, id) - koszt strony nie rośnie
+    z głębokością historii. format=ndjson|csv eksportuje wszystkie wpisy od kursora strumieniem.
+    """
+    try:
+        wybrane = wybierz_kolumny(ProbaWejscia.__table__, kolumny, wymagane=("data_czas", "id"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    stmt = select(*wybrane)
+    if pracownik_id is not None:
+        stmt = stmt.where(ProbaWejscia.pracownik_id == pracownik_id)
+    if bramka_id is not None:
+        stmt = stmt.where(ProbaWejscia.bramka_id == bramka_id)
+
+    klucz = (ProbaWejscia.data_czas, ProbaWejscia.id)
+    return await _lista(db, stmt, klucz, kursor, (datetime.fromisoformat, int), limit, format,
+                        malejaco=True, nazwa="logi")
+
+
+# ==========================================
+# 6. ALERTY I ZDARZENIA NA ŻYWO
+# ==========================================
+
+@app.get("/alerty")
+async def pobierz_alerty(po_id: int = 0, limit: int = Query(100, ge=1, le=PAGE_SIZE_MAX)):
+    """
+    Ostatnie alerty detektora anomalii (bufor w pamięci, od najstarszego).
+    Panel odpytuje z ?po_id=<id ostatniego otrzymanego alertu>.
+    """
+    alerty = anomaly_detector.alerty(po_id, limit)
+    return {"items": alerty, "ostatnie_id": alerty[-1]["id"] if alerty else po_id}
+
+
+@app.websocket("/ws/zdarzenia")
+async def ws_zdarzenia(websocket: WebSocket, bramki: Optional[str] = None):
+    """Zdarzenia z bramek na żywo (weryfikacje, alerty); ?bramki=1,2 ogranicza do wybranych bramek."""
+    try:
+        filtr = parsuj_bramki(bramki)
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    subskrypcja = event_hub.subskrybuj(filtr)
+    # Klient nic nie wysyła - odbiór służy tylko do natychmiastowego wykrycia rozłączenia
+    rozlaczenie = asyncio.create_task(_czekaj_na_rozlaczenie(websocket))
+    try:
+        while True:
+            pobranie = asyncio.create_task(subskrypcja.nastepne())
+            await asyncio.wait({pobranie, rozlaczenie}, return_when=asyncio.FIRST_COMPLETED)
+            if rozlaczenie.done():
+                pobranie.cancel()
+                break
+            # Heartbeat utrzymuje połączenie przez proxy, gdy na bramkach nic się nie dzieje
+            await websocket.send_json(pobranie.result() or {"typ": "heartbeat"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        rozlaczenie.cancel()
+        event_hub.anuluj(subskrypcja)
+
+
+async def _czekaj_na_rozlaczenie(websocket: WebSocket):
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/zdarzenia/stream")
+async def sse_zdarzenia(request: Request, bramki: Optional[str] = None):
+    """To samo co /ws/zdarzenia jako Server-Sent Events (EventSource w przeglądarce)."""
+    try:
+        filtr = parsuj_bramki(bramki)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def strumien():
+        subskrypcja = event_hub.subskrybuj(filtr)
+        try:
+            yield ": polaczono\n\n"
+            while not await request.is_disconnected():
+                zdarzenie = await subskrypcja.nastepne()
+                yield format_sse(zdarzenie) if zdarzenie else ": heartbeat\n\n"
+        finally:
+            event_hub.anuluj(subskrypcja)
+
+    return StreamingResponse(strumien(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# ==========================================
+# 7. STATYSTYKI I RAPORTY CSV
+# ==========================================
+
+@app.get("/raporty/statystyki")
+async def pobierz_statystyki(
+        wymiar: str = "bramka",
+        wymiar_id: Optional[int] = None,
+        ziarno: str = "dzien",
+        od: Optional[date] = None,
+        do: Optional[date] = None,
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Statystyki wejść z tabeli agregatów (bez skanowania historii logów): szereg czasowy
+    godzinowy/dobowy dla bramki lub pracownika (bez wymiar_id - łącznie) oraz podsumowanie.
+    """
+    if wymiar not in WYMIARY:
+        raise HTTPException(status_code=400, detail=f"Nieznany wymiar (dozwolone: {', '.join(WYMIARY)})")
+    if ziarno not in ZIARNA:
+        raise HTTPException(status_code=400, detail=f"Nieznane ziarno (dozwolone: {', '.join(ZIARNA)})")
+    return await statystyki(db, wymiar, ziarno, od, do, wymiar_id)
+
+
+@app.post("/raporty/odswiez")
+async def odswiez_statystyki(od: Optional[date] = None, do: Optional[date] = None):
+    """Przelicza agregaty od nowa z proba_wejscia dla podanych dób (domyślnie cała historia)."""
+    try:
+        okresy = await asyncio.to_thread(przelicz_statystyki, od, do)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return {"msg": "Statystyki przeliczone", "okresy": okresy}
+
+
+@app.post("/raporty/generuj", response_model=RaportResponse)
+async def generuj_raport_csv(dane: RaportCreate, db: AsyncSession = Depends(get_async_db)):
+    """Raport CSV (bramki / pracownicy) za zakres dat, zapisany w tabeli raport."""
+    if dane.typ not in TYPY_RAPORTOW:
+        raise HTTPException(status_code=400, detail=f"Nieznany typ raportu (dozwolone: {', '.join(TYPY_RAPORTOW)})")
+    if dane.data_od > dane.data_do:
+        raise HTTPException(status_code=400, detail="data_od jest późniejsza niż data_do")
+    if not await db.get(Administrator, dane.administrator_id):
+        raise HTTPException(status_code=400, detail="Brak administratora. Użyj /setup/admin")
+    return await generuj_raport(db, dane.administrator_id, dane.typ, dane.data_od, dane.data_do)
+
+
+@app.get("/raporty", response_model=List[RaportResponse])
+async def lista_raportow(limit: int = Query(50, ge=1, le=PAGE_SIZE_MAX), db: AsyncSession = Depends(get_async_db)):
+    return (await db.execute(
+        select(Raport).order_by(Raport.id.desc()).limit(limit)
+    )).scalars().all()
 
 
+@app.get("/raporty/{raport_id}/plik")
+async def pobierz_plik_raportu(raport_id: int, db: AsyncSession = Depends(get_async_db)):
+    raport = await db.get(Raport, raport_id)
+    if not raport or not raport.sciezka_pliku or not os.path.exists(raport.sciezka_pliku):
+        raise HTTPException(status_code=404, detail="Raport nie istnieje")
+    return FileResponse(raport.sciezka_pliku, media_type="text/csv",
+                        filename=os.path.basename(raport.sciezka_pliku))
+
+
+# ==========================================
+# 8. SYNCHRONIZACJA BRAMEK (TRYB OFFLINE)
+# ==========================================
+
+@app.get("/sync/snapshot")
+async def snapshot_dla_bramki(since: int = 0, db: AsyncSession = Depends(get_async_db)):
+    """
+    Przepustki i wzorce twarzy dla bramek decydujących lokalnie: zmiany po wersji `since`
+    (0 = pełny stan). Wzorce to wektory float32 (little-endian) zakodowane w base64.
+    """
+    return await snapshot(db, since)
+
+
+@app.post("/sync/proby")
+async def przyjmij_proby_offline(proby: List[ProbaOffline], db: AsyncSession = Depends(get_async_db)):
+    """
+    Zbiorczy zapis prób rozstrzygniętych przez bramki bez łączności (buforowany zapis logów).
+    Próby z nieistniejących bramek są odrzucane; pracownik usunięty w międzyczasie - pomijany.
+    Próba z id_proby zapisana już wcześniej (ponowna wysyłka z kolejki bramki) jest pomijana przy zapisie.
+    """
+    if not proby:
+        return {"przyjete": 0, "odrzucone": 0}
+    bramki = set((await db.execute(
+        select(Bramka.id).where(Bramka.id.in_({p.bramka_id for p in proby}))
+    )).scalars())
+    pracownicy = set((await db.execute(
+        select(Pracownik.id).where(Pracownik.id.in_({p.pracownik_id for p in proby if p.pracownik_id}))
+    )).scalars())
+
+    rekordy = []
+    for proba in proby:
+        if proba.bramka_id not in bramki:
+            continue
+        rekord = proba.dict()
+        if rekord["pracownik_id"] not in pracownicy:
+            rekord["pracownik_id"] = None
+        if rekord["id_proby"]:
+            rekord["id_proby"] = str(rekord["id_proby"])
+        rekordy.append(rekord)
+
+    # Reguły anomalii jak dla prób online (w kolejności czasu prób, nie wysyłki)
+    for rekord in sorted(rekordy, key=lambda r: r["data_czas"]):
+        podejrzana, alerty = anomaly_detector.zdarzenie_offline(rekord)
+        rekord["podejrzana"] = rekord["podejrzana"] or podejrzana
+        for alert in alerty:
+            event_hub.publikuj("alert", alert)
+
+    access_log_writer.zapisz_rekordy(rekordy)
+    return {"przyjete": len(rekordy), "odrzucone": len(proby) - len(rekordy)}
@@ -0,0 +1,161 @@
+import argparse
+import glob
+import os
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+from database import engine
+
+# --- KONFIGURACJA ---
+# Katalog z plikami NNN_opis.sql (w docker-compose montowany z Database/migrations)
+MIGRATIONS_DIR = os.getenv("MIGRATIONS_DIR", "migrations")
+# Na ile miesięcy do przodu utrzymywać gotowe partycje proba_wejscia
+LOG_PARTITIONS_AHEAD = int(os.getenv("LOG_PARTITIONS_AHEAD", 3))
+# Partycje starsze niż N miesięcy są odłączane do schematu "archiwum" (0 = nigdy)
+LOG_RETENTION_MONTHS = int(os.getenv("LOG_RETENTION_MONTHS", 0))
+
+ARCHIVE_SCHEMA = "archiwum"
+# Stały klucz blokady doradczej - kilka procesów uvicorn nie migruje bazy równocześnie
+_LOCK_KEY = 48151623
+
+# Wyłącza statement_timeout silnika (database.py) tylko w bieżącej transakcji
+_BEZ_LIMITU_CZASU = "SET LOCAL statement_timeout = 0"
+
+_PARTITION_NAME = re.compile(r"^proba_wejscia_(\d{4})_(\d{2})$")
+
+
+def _postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def _pliki_migracji():
+    return sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql")))
+
+
+def uruchom_migracje() -> list:
+    """Wykonuje niezastosowane pliki migracji (każdy w osobnej transakcji). Zwraca ich nazwy."""
+    if not _postgres():
+        return []
+
+    zastosowane = []
+    with engine.connect() as conn:
+        with conn.begin():
+            # Drugi proces czeka tu, aż pierwszy skończy migracje - dłużej niż DB_STATEMENT_TIMEOUT_MS
+            conn.execute(text(_BEZ_LIMITU_CZASU))
+            # Blokada na poziomie sesji - obowiązuje też w kolejnych transakcjach
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _LOCK_KEY})
+        try:
+            with conn.begin():
+                conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                    " wersja VARCHAR(255) PRIMARY KEY,"
+                    " data_zastosowania TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP)"
+                ))
+                wykonane = set(conn.execute(text("SELECT wersja FROM schema_migrations")).scalars())
+
+            for sciezka in _pliki_migracji():
+                wersja = os.path.basename(sciezka)
+                if wersja in wykonane:
+                    continue
+                with open(sciezka, encoding="utf-8") as f:
+                    sql = f.read()
+                with conn.begin():
+                    # Migracje przepisują całe tabele (partycjonowanie, statystyki) - bez limitu czasu zapytań
+                    conn.execute(text(_BEZ_LIMITU_CZASU))
+                    # Plik może zawierać wiele instrukcji i bloki DO $$ ... $$
+                    conn.exec_driver_sql(sql)
+                    conn.execute(text("INSERT INTO schema_migrations (wersja) VALUES (:w)"), {"w": wersja})
+                zastosowane.append(wersja)
+                print(f"-> [Migracje] Zastosowano {wersja}")
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_KEY})
+            conn.commit()
+    return zastosowane
+
+
+def _dodaj_miesiace(dzien: date, miesiace: int) -> date:
+    indeks = dzien.year * 12 + dzien.month - 1 + miesiace
+    return date(indeks // 12, indeks % 12 + 1, 1)
+
+
+def utworz_partycje(miesiecy: int = LOG_PARTITIONS_AHEAD) -> None:
+    """Zakłada partycje proba_wejscia od bieżącego miesiąca na `miesiecy` do przodu."""
+    if not _postgres():
+        return
+    poczatek = date.today().replace(day=1)
+    with engine.begin() as conn:
+        conn.execute(
+            text("SELECT utworz_partycje_proba_wejscia(:od, :do_)"),
+            {"od": poczatek, "do_": _dodaj_miesiace(poczatek, miesiecy + 1)}
+        )
+
+
+def partycje() -> list:
+    """Nazwy miesięcznych partycji proba_wejscia (posortowane od najstarszej)."""
+    with engine.connect() as conn:
+        nazwy = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i"
+            " JOIN pg_class c ON c.oid = i.inhrelid"
+            " WHERE i.inhparent = 'proba_wejscia'::regclass"
+        )).scalars().all()
+    return sorted(n for n in nazwy if _PARTITION_NAME.match(n))
+
+
+def archiwizuj_partycje(starsze_niz_miesiecy: int = LOG_RETENTION_MONTHS) -> list:
+    """
+    Odłącza partycje z miesięcy starszych niż `starsze_niz_miesiecy` i przenosi je do
+    schematu "archiwum" (dane zostają w bazie, ale nie obciążają zapytań o bieżące logi).
+    """
+    if not _postgres() or starsze_niz_miesiecy <= 0:
+        return []
+
+    granica = _dodaj_miesiace(date.today().replace(day=1), -starsze_niz_miesiecy)
+    odlaczone = []
+    for nazwa in partycje():
+        rok, miesiac = map(int, _PARTITION_NAME.match(nazwa).groups())
+        if date(rok, miesiac, 1) >= granica:
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+            conn.execute(text(f'ALTER TABLE proba_wejscia DETACH PARTITION "{nazwa}"'))
+            conn.execute(text(f'ALTER TABLE "{nazwa}" SET SCHEMA {ARCHIVE_SCHEMA}'))
+        odlaczone.append(nazwa)
+        print(f"-> [Migracje] Partycja {nazwa} przeniesiona do schematu {ARCHIVE_SCHEMA}")
+    return odlaczone
+
+
+def utrzymanie_partycji() -> None:
+    """Okresowe utrzymanie: nowe partycje na kolejne miesiące i archiwizacja najstarszych."""
+    utworz_partycje()
+    archiwizuj_partycje()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migracje schematu i partycje tabeli proba_wejscia")
+    sub = parser.add_subparsers(dest="polecenie", required=True)
+    sub.add_parser("migruj", help="Zastosuj niewykonane migracje")
+    p_partycje = sub.add_parser("partycje", help="Utwórz partycje na kolejne miesiące")
+    p_partycje.add_argument("--miesiecy", type=int, default=LOG_PARTITIONS_AHEAD)
+    p_archiwum = sub.add_parser("archiwizuj", help="Odłącz partycje starsze niż N miesięcy")
+    p_archiwum.add_argument("--miesiecy", type=int, required=True)
+    sub.add_parser("lista", help="Wypisz partycje proba_wejscia")
+    args = parser.parse_args()
+
+    if args.polecenie == "migruj":
+        wykonane = uruchom_migracje()
+        print(f"✅ Zastosowano migracji: {len(wykonane)}")
+    elif args.polecenie == "partycje":
+        utworz_partycje(args.miesiecy)
+        print("✅ Partycje gotowe")
+    elif args.polecenie == "archiwizuj":
+        odlaczone = archiwizuj_partycje(args.miesiecy)
+        print(f"✅ Zarchiwizowano partycji: {len(odlaczone)}")
+    else:
+        for nazwa in partycje():
+            print(nazwa)
+
+
+if __name__ == "__main__":
+    main()
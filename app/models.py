@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base # Importujemy Base z database.py, aby uniknąć cyklicznych importów
@@ -48,10 +48,12 @@ class Pracownik(Base):
         cascade="all, delete-orphan"
     )
 
+    # Logi usuwa baza (ON DELETE CASCADE) - bez wczytywania wszystkich prób do pamięci
     proby_wejscia = relationship(
         "ProbaWejscia",
         back_populates="pracownik",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
 class Przepustka(Base):
@@ -70,7 +72,7 @@ class ZdjecieReferencyjne(Base):
     __tablename__ = "zdjecie_referencyjne"
 
     id = Column(Integer, primary_key=True, index=True)
-    pracownik_id = Column(Integer, ForeignKey("pracownik.id"), nullable=False)
+    pracownik_id = Column(Integer, ForeignKey("pracownik.id"), nullable=False, index=True)
     sciezka_pliku = Column(String, nullable=False)
     data_dodania = Column(DateTime(timezone=True), server_default=func.now())
     aktywne = Column(Boolean, default=True)
@@ -85,16 +87,19 @@ class Bramka(Base):
     lokalizacja = Column(String)
     aktywna = Column(Boolean, default=True)
     adres_ip = Column(String)
+    detektor = Column(String)  # Detektor twarzy dla tej bramki (NULL = globalny FACE_DETECTOR)
 
     proby_wejscia = relationship("ProbaWejscia", back_populates="bramka")
 
 class ProbaWejscia(Base):
+    # W Postgresie tabela jest partycjonowana po miesiącach (data_czas) - patrz migrate.py
     __tablename__ = "proba_wejscia"
 
-    id = Column(Integer, primary_key=True, index=True)
+    # Klucz (id, data_czas) jak w bazie po migracji 002 - klucz partycjonowanej tabeli musi zawierać data_czas
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     bramka_id = Column(Integer, ForeignKey("bramka.id"), nullable=False)
-    pracownik_id = Column(Integer, ForeignKey("pracownik.id"), nullable=True) # Null, jeśli nie rozpoznano
-    data_czas = Column(DateTime(timezone=True), server_default=func.now())
+    pracownik_id = Column(Integer, ForeignKey("pracownik.id", ondelete="CASCADE"), nullable=True) # Null, jeśli nie rozpoznano
+    data_czas = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), nullable=False)
 
     wynik_qr = Column(String) # 'OK', 'INVALID'
     wynik_biometryczny = Column(String) # 'MATCH', 'NO_MATCH'
@@ -102,10 +107,59 @@ class ProbaWejscia(Base):
     status_finalny = Column(String, nullable=False) # 'GRANTED', 'DENIED'
     sciezka_zdjecia = Column(String) # Zdjęcie z wejścia
     podejrzana = Column(Boolean, default=False)
+    id_proby = Column(String(36), nullable=True) # UUID nadany przez bramkę (próby offline), NULL dla /verify
 
     bramka = relationship("Bramka", back_populates="proby_wejscia")
     pracownik = relationship("Pracownik", back_populates="proby_wejscia")
 
+    __table_args__ = (
+        # Historia pracownika (/logi/), od najnowszych
+        Index("ix_proba_wejscia_pracownik_czas", pracownik_id, data_czas.desc()),
+        # Raporty per bramka w zakresie dat
+        Index("ix_proba_wejscia_bramka_czas", bramka_id, data_czas),
+        # Przegląd prób podejrzanych (mały indeks częściowy)
+        Index("ix_proba_wejscia_podejrzane", data_czas, postgresql_where=podejrzana.is_(True)),
+        # Ponowna wysyłka próby z kolejki offline bramki nie tworzy duplikatu
+        Index("ux_proba_wejscia_id_proby", id_proby, data_czas, unique=True),
+    )
+
+class StatystykaWejsc(Base):
+    """
+    Zagregowane próby wejścia (godzinowo i dobowo, per bramka i per pracownik).
+    Aktualizowane przyrostowo przy zapisie logów - raporty nie skanują proba_wejscia.
+    """
+    __tablename__ = "statystyka_wejsc"
+
+    ziarno = Column(String, primary_key=True)  # 'godzina', 'dzien'
+    wymiar = Column(String, primary_key=True)  # 'bramka', 'pracownik'
+    wymiar_id = Column(Integer, primary_key=True)
+    poczatek = Column(DateTime, primary_key=True)  # Początek okresu (UTC)
+
+    proby = Column(Integer, nullable=False, default=0)
+    wejscia = Column(Integer, nullable=False, default=0)
+    bledy_qr = Column(Integer, nullable=False, default=0)
+    bledy_biometrii = Column(Integer, nullable=False, default=0)
+    podejrzane = Column(Integer, nullable=False, default=0)
+    suma_podobienstwa = Column(Float, nullable=False, default=0.0)
+    liczba_porownan = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Wykresy jednej bramki / pracownika w zakresie dat
+        Index("ix_statystyka_wejsc_okres", ziarno, wymiar, poczatek),
+    )
+
+class ZmianaSynchronizacji(Base):
+    """
+    Dziennik zmian danych potrzebnych bramkom offline (przepustki, wzorce twarzy).
+    Id wpisu jest numerem wersji - bramka pobiera zmiany nowsze niż ostatnio znana wersja.
+    """
+    __tablename__ = "zmiana_synchronizacji"
+
+    id = Column(Integer, primary_key=True)
+    typ = Column(String, nullable=False)  # 'przepustka' (klucz = kod QR), 'wzorzec' (klucz = id_pracownika)
+    klucz = Column(String, nullable=False)
+    data_czas = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
 class Raport(Base):
     __tablename__ = "raport"
 
@@ -0,0 +1,114 @@
+import base64
+import csv
+import io
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import text, tuple_
+
+from database import AsyncSessionLocal
+
+# --- KONFIGURACJA ---
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", 100))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", 1000))
+# Ile wierszy pobiera naraz kursor serwerowy przy eksporcie NDJSON/CSV
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", 1000))
+
+FORMATS = ("json", "ndjson", "csv")
+
+
+# --- KURSOR ---
+# Kursor jest nieprzezroczysty dla klienta: base64 z wartościami klucza sortowania ostatniego wiersza
+
+def zakoduj_kursor(*wartosci) -> str:
+    dane = [v.isoformat() if isinstance(v, datetime) else v for v in wartosci]
+    return base64.urlsafe_b64encode(json.dumps(dane).encode()).decode().rstrip("=")
+
+
+def odkoduj_kursor(kursor: str, typy: tuple) -> tuple:
+    """Odczytuje kursor; `typy` to konwertery kolejnych wartości (np. datetime.fromisoformat, int)."""
+    try:
+        dane = json.loads(base64.urlsafe_b64decode(kursor + "=" * (-len(kursor) % 4)))
+        if len(dane) != len(typy):
+            raise ValueError
+        return tuple(typ(v) for typ, v in zip(typy, dane))
+    except (ValueError, TypeError):
+        raise ValueError("Nieprawidłowy kursor")
+
+
+def wybierz_kolumny(tabela, kolumny, wymagane=()):
+    """Kolumny tabeli z parametru `kolumny` ("a,b,c"); klucz sortowania jest dołączany zawsze."""
+    if not kolumny:
+        return list(tabela.columns)
+    nazwy = [k.strip() for k in kolumny.split(",") if k.strip()]
+    nieznane = [k for k in nazwy if k not in tabela.columns]
+    if nieznane:
+        raise ValueError(f"Nieznane kolumny: {', '.join(nieznane)}")
+    for k in wymagane:
+        if k not in nazwy:
+            nazwy.append(k)
+    return [tabela.columns[k] for k in nazwy]
+
+
+# --- STRONICOWANIE ---
+
+def po_kursorze(stmt, klucz, kursor, typy, malejaco=False):
+    """Dokłada warunek keyset (klucz) > / < (wartości z kursora) i sortowanie po kluczu."""
+    if kursor:
+        wartosci = odkoduj_kursor(kursor, typy)
+        warunek = tuple_(*klucz) < wartosci if malejaco else tuple_(*klucz) > wartosci
+        stmt = stmt.where(warunek)
+    return stmt.order_by(*[k.desc() if malejaco else k for k in klucz])
+
+
+async def strona(db, stmt, klucz, limit: int):
+    """Jedna strona wyników (słowniki) i kursor następnej strony (None na końcu)."""
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+    wiersze = (await db.execute(stmt.limit(limit + 1))).mappings().all()
+    nastepny = None
+    if len(wiersze) > limit:
+        wiersze = wiersze[:limit]
+        ostatni = wiersze[-1]
+        nastepny = zakoduj_kursor(*[ostatni[k.name] for k in klucz])
+    return {"items": [dict(w) for w in wiersze], "next_cursor": nastepny}
+
+
+# --- EKSPORT STRUMIENIOWY ---
+
+def _wartosc(v):
+    return v.isoformat() if hasattr(v, "isoformat") else v
+
+
+async def eksportuj(stmt, format: str):
+    """
+    Generator linii NDJSON/CSV czytający wiersze kursorem serwerowym (stała pamięć
+    niezależnie od liczby wierszy). Używa własnej sesji, bo żyje dłużej niż endpoint.
+    """
+    async with AsyncSessionLocal() as db:
+        if db.bind.dialect.name == "postgresql":
+            # Eksport może trwać dłużej niż limit czasu zwykłych zapytań
+            await db.execute(text("SET LOCAL statement_timeout = 0"))
+        wynik = await db.stream(stmt.execution_options(yield_per=EXPORT_FETCH_SIZE))
+        kolumny = list(wynik.keys())
+
+        if format == "csv":
+            bufor = io.StringIO()
+            pisarz = csv.writer(bufor)
+            pisarz.writerow(kolumny)
+            async for paczka in wynik.partitions():
+                for wiersz in paczka:
+                    pisarz.writerow([_wartosc(v) for v in wiersz])
+                yield bufor.getvalue()
+                bufor.seek(0)
+                bufor.truncate()
+            yield bufor.getvalue()
+        else:
+            async for paczka in wynik.mappings().partitions():
+                yield "".join(
+                    json.dumps({k: _wartosc(v) for k, v in w.items()}, ensure_ascii=False) + "\n"
+                    for w in paczka
+                )
+
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
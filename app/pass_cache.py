@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from models import Bramka, Przepustka
+
+# --- KONFIGURACJA ---
+# Czas życia wpisu (s) i maksymalna liczba wpisów (LRU)
+PASS_CACHE_TTL = float(os.getenv("PASS_CACHE_TTL", 60))
+PASS_CACHE_SIZE = int(os.getenv("PASS_CACHE_SIZE", 10000))
+
+# Znacznik "sprawdzono - nie istnieje" (odrzucony QR też trafia do cache)
+_BRAK = object()
+
+
+class TTLCache:
+    """Prosty cache LRU z czasem życia wpisów, bezpieczny dla wątków."""
+
+    def __init__(self, maxsize: int = PASS_CACHE_SIZE, ttl: float = PASS_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> list:
+        """Zapisuje wartość; zwraca wartości usunięte z powodu limitu rozmiaru (najstarsze)."""
+        usuniete = []
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                usuniete.append(self._data.popitem(last=False)[1][0])
+        return usuniete
+
+    def values(self) -> list:
+        """Migawka niewygasłych wartości."""
+        now = time.monotonic()
+        with self._lock:
+            return [value for value, expires in self._data.values() if expires >= now]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Przepustki: klucz = treść kodu QR
+pass_cache = TTLCache()
+# Bramki: klucz = id bramki
+gate_cache = TTLCache()
+
+
+async def pobierz_przepustke(db, qr_data: str):
+    """
+    Aktywna przepustka wraz z danymi pracownika potrzebnymi do decyzji (słownik)
+    lub None. Jedno zapytanie (JOIN) przy braku w cache, zero przy trafieniu.
+    """
+    cached = pass_cache.get(qr_data)
+    if cached is not None:
+        return None if cached is _BRAK else cached
+
+    wynik = await db.execute(
+        select(Przepustka).where(
+            Przepustka.kod_qr == qr_data,
+            Przepustka.aktywna == True
+        ).options(joinedload(Przepustka.pracownik)).limit(1)
+    )
+    przepustka = wynik.scalars().first()
+
+    if not przepustka:
+        pass_cache.set(qr_data, _BRAK)
+        return None
+
+    pracownik = przepustka.pracownik
+    wpis = {
+        "przepustka_id": przepustka.id,
+        "data_waznosci": przepustka.data_waznosci,
+        "pracownik_id": pracownik.id,
+        "id_pracownika": pracownik.id_pracownika,
+        "imie": pracownik.imie,
+        "nazwisko": pracownik.nazwisko,
+    }
+    pass_cache.set(qr_data, wpis)
+    return wpis
+
+
+async def pobierz_bramke(db, bramka_id: int):
+    """Dane bramki (słownik) lub None."""
+    cached = gate_cache.get(bramka_id)
+    if cached is not None:
+        return None if cached is _BRAK else cached
+
+    bramka = await db.get(Bramka, bramka_id)
+    if not bramka:
+        gate_cache.set(bramka_id, _BRAK)
+        return None
+
+    wpis = {"id": bramka.id, "nazwa": bramka.nazwa, "lokalizacja": bramka.lokalizacja,
+            "detektor": bramka.detektor}
+    gate_cache.set(bramka_id, wpis)
+    return wpis
+
+
+def uniewaznij_przepustke(qr_data: str):
+    pass_cache.invalidate(qr_data)
+
+
+def uniewaznij_bramke(bramka_id: int):
+    gate_cache.invalidate(bramka_id)
@@ -0,0 +1,252 @@
+import argparse
+import csv
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import delete, func, insert, literal, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import engine
+from models import Bramka, Pracownik, ProbaWejscia, Raport, StatystykaWejsc
+
+# --- KONFIGURACJA ---
+RAPORTY_DIR = os.getenv("RAPORTY_DIR", "raporty")
+
+ZIARNA = ("godzina", "dzien")
+WYMIARY = ("bramka", "pracownik")
+TYPY_RAPORTOW = {"bramki": "bramka", "pracownicy": "pracownik"}
+
+# Liczniki sumowane przy każdym zapisie paczki logów
+LICZNIKI = ("proby", "wejscia", "bledy_qr", "bledy_biometrii", "podejrzane",
+            "suma_podobienstwa", "liczba_porownan")
+
+_STATUS_SUKCES = "SUKCES"
+_WYNIKI_BIOMETRII = ("MATCH", "NO_MATCH")
+
+
+def _poczatek(data_czas: datetime, ziarno: str) -> datetime:
+    """Początek godziny/doby (UTC, bez strefy) dla znacznika czasu próby."""
+    if data_czas.tzinfo is not None:
+        data_czas = data_czas.astimezone(timezone.utc).replace(tzinfo=None)
+    if ziarno == "dzien":
+        return datetime.combine(data_czas.date(), time())
+    return data_czas.replace(minute=0, second=0, microsecond=0)
+
+
+# --- AKTUALIZACJA PRZYROSTOWA (wywoływana przez log_writer) ---
+
+def agreguj(rekordy) -> dict:
+    """Sumuje paczkę wpisów proba_wejscia do liczników per (ziarno, wymiar, id, początek okresu)."""
+    wynik = defaultdict(lambda: dict.fromkeys(LICZNIKI, 0))
+    for r in rekordy:
+        biometria = r.get("wynik_biometryczny") in _WYNIKI_BIOMETRII
+        przyrost = {
+            "proby": 1,
+            "wejscia": int(r.get("status_finalny") == _STATUS_SUKCES),
+            "bledy_qr": int(r.get("wynik_qr") != "OK"),
+            "bledy_biometrii": int(r.get("wynik_biometryczny") == "NO_MATCH"),
+            "podejrzane": int(bool(r.get("podejrzana"))),
+            "suma_podobienstwa": (r.get("procent_podobienstwa") or 0.0) if biometria else 0.0,
+            "liczba_porownan": int(biometria),
+        }
+        for wymiar, wymiar_id in (("bramka", r.get("bramka_id")), ("pracownik", r.get("pracownik_id"))):
+            if wymiar_id is None:
+                continue
+            for ziarno in ZIARNA:
+                liczniki = wynik[(ziarno, wymiar, wymiar_id, _poczatek(r["data_czas"], ziarno))]
+                for k, v in przyrost.items():
+                    liczniki[k] += v
+    return wynik
+
+
+def zapisz_statystyki(conn, rekordy) -> None:
+    """Dodaje paczkę wpisów do tabeli statystyk (UPSERT) w transakcji zapisu logów."""
+    zagregowane = agreguj(rekordy)
+    if not zagregowane:
+        return
+
+    wiersze = [
+        {"ziarno": z, "wymiar": w, "wymiar_id": i, "poczatek": p, **liczniki}
+        for (z, w, i, p), liczniki in zagregowane.items()
+    ]
+    dialekt = postgresql if conn.dialect.name == "postgresql" else sqlite
+    stmt = dialekt.insert(StatystykaWejsc)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["ziarno", "wymiar", "wymiar_id", "poczatek"],
+        set_={k: getattr(StatystykaWejsc, k) + stmt.excluded[k] for k in LICZNIKI}
+    )
+    conn.execute(stmt, wiersze)
+
+
+# --- PRZELICZENIE OD NOWA (po imporcie, naprawie danych, zmianie reguł) ---
+
+def _zakres(od: date = None, do: date = None):
+    """Warunki na data_czas / poczatek dla pełnych dób [od, do]."""
+    warunki_log, warunki_stat = [], []
+    if od:
+        poczatek = datetime.combine(od, time())
+        warunki_log.append(ProbaWejscia.data_czas >= poczatek.replace(tzinfo=timezone.utc))
+        warunki_stat.append(StatystykaWejsc.poczatek >= poczatek)
+    if do:
+        koniec = datetime.combine(do + timedelta(days=1), time())
+        warunki_log.append(ProbaWejscia.data_czas < koniec.replace(tzinfo=timezone.utc))
+        warunki_stat.append(StatystykaWejsc.poczatek < koniec)
+    return warunki_log, warunki_stat
+
+
+def _zakres_historii():
+    """Pierwsza i ostatnia doba (UTC) z logami lub statystykami; None, gdy obie tabele są puste."""
+    with engine.connect() as conn:
+        skrajne = [
+            *conn.execute(select(func.min(ProbaWejscia.data_czas), func.max(ProbaWejscia.data_czas))).one(),
+            *conn.execute(select(func.min(StatystykaWejsc.poczatek), func.max(StatystykaWejsc.poczatek))).one(),
+        ]
+    dni = [_poczatek(d, "dzien").date() for d in skrajne if d is not None]
+    return (min(dni), max(dni)) if dni else None
+
+
+def _przelicz_dobe(dzien: date) -> int:
+    """Odbudowa statystyk jednej doby w osobnej transakcji (blokada tylko na jej czas)."""
+    warunki_log, warunki_stat = _zakres(dzien, dzien)
+    biometria = ProbaWejscia.wynik_biometryczny.in_(_WYNIKI_BIOMETRII)
+    kolumny = ["ziarno", "wymiar", "wymiar_id", "poczatek", *LICZNIKI]
+    wstawione = 0
+
+    with engine.begin() as conn:
+        # Agregacja doby przy dużym ruchu może trwać dłużej niż limit czasu zwykłych zapytań
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        conn.execute(text("LOCK TABLE statystyka_wejsc IN EXCLUSIVE MODE"))
+        conn.execute(delete(StatystykaWejsc).where(*warunki_stat))
+
+        for ziarno, jednostka in (("godzina", "hour"), ("dzien", "day")):
+            poczatek = func.date_trunc(jednostka, func.timezone("UTC", ProbaWejscia.data_czas))
+            for wymiar, kolumna in (("bramka", ProbaWejscia.bramka_id), ("pracownik", ProbaWejscia.pracownik_id)):
+                zrodlo = select(
+                    literal(ziarno), literal(wymiar), kolumna, poczatek,
+                    func.count(),
+                    func.count().filter(ProbaWejscia.status_finalny == _STATUS_SUKCES),
+                    func.count().filter(func.coalesce(ProbaWejscia.wynik_qr, "") != "OK"),
+                    func.count().filter(ProbaWejscia.wynik_biometryczny == "NO_MATCH"),
+                    func.count().filter(ProbaWejscia.podejrzana.is_(True)),
+                    func.coalesce(func.sum(ProbaWejscia.procent_podobienstwa).filter(biometria), 0.0),
+                    func.count().filter(biometria),
+                ).where(kolumna.isnot(None), *warunki_log).group_by(kolumna, poczatek)
+                wstawione += conn.execute(insert(StatystykaWejsc).from_select(kolumny, zrodlo)).rowcount
+    return wstawione
+
+
+def przelicz_statystyki(od: date = None, do: date = None) -> int:
+    """
+    Odbudowuje statystyki z proba_wejscia dla dób [od, do] (domyślnie cała historia).
+    Każda doba to osobna transakcja: tabela statystyk jest blokowana tylko na czas
+    przeliczenia jednej doby - równoległe zapisy logów czekają i dopisują swoje
+    liczniki po niej, więc nic nie jest liczone podwójnie.
+    """
+    if engine.dialect.name != "postgresql":
+        raise NotImplementedError("Przeliczenie statystyk wymaga PostgreSQL")
+
+    if od is None or do is None:
+        historia = _zakres_historii()
+        if historia is None:
+            return 0
+        od, do = od or historia[0], do or historia[1]
+
+    wstawione = 0
+    dzien = od
+    while dzien <= do:
+        wstawione += _przelicz_dobe(dzien)
+        dzien += timedelta(days=1)
+
+    print(f"-> [Raporty] Przeliczono statystyki {od} - {do} ({wstawione} okresów)")
+    return wstawione
+
+
+# --- ODCZYT ---
+
+def _z_licznikow(wiersz) -> dict:
+    """Liczniki + wskaźniki pochodne (średnia zgodność, skuteczność)."""
+    wynik = {k: wiersz[k] or 0 for k in LICZNIKI if k != "suma_podobienstwa"}
+    porownania = wynik.pop("liczba_porownan")
+    wynik["porownania"] = porownania
+    wynik["srednie_podobienstwo"] = round(wiersz["suma_podobienstwa"] / porownania, 2) if porownania else None
+    wynik["skutecznosc"] = round(100.0 * wynik["wejscia"] / wynik["proby"], 2) if wynik["proby"] else None
+    return wynik
+
+
+def _sumy():
+    return [func.sum(getattr(StatystykaWejsc, k)).label(k) for k in LICZNIKI]
+
+
+async def statystyki(db, wymiar: str, ziarno: str, od: date, do: date, wymiar_id: int = None) -> dict:
+    """Szereg czasowy dla bramki / pracownika (lub sumarycznie dla wszystkich) i podsumowanie zakresu."""
+    _, warunki = _zakres(od, do)
+    warunki += [StatystykaWejsc.ziarno == ziarno, StatystykaWejsc.wymiar == wymiar]
+    if wymiar_id is not None:
+        warunki.append(StatystykaWejsc.wymiar_id == wymiar_id)
+
+    szereg = (await db.execute(
+        select(StatystykaWejsc.poczatek, *_sumy()).where(*warunki)
+        .group_by(StatystykaWejsc.poczatek).order_by(StatystykaWejsc.poczatek)
+    )).mappings().all()
+    suma = (await db.execute(select(*_sumy()).where(*warunki))).mappings().one()
+
+    return {
+        "wymiar": wymiar,
+        "wymiar_id": wymiar_id,
+        "ziarno": ziarno,
+        "szereg": [{"poczatek": w["poczatek"], **_z_licznikow(w)} for w in szereg],
+        "podsumowanie": _z_licznikow(suma),
+    }
+
+
+async def generuj_raport(db, administrator_id: int, typ: str, data_od: date, data_do: date) -> Raport:
+    """Raport CSV (jeden wiersz na bramkę / pracownika) z dobowych statystyk; zapisywany jako Raport."""
+    wymiar = TYPY_RAPORTOW[typ]
+    _, warunki = _zakres(data_od, data_do)
+    wiersze = (await db.execute(
+        select(StatystykaWejsc.wymiar_id, *_sumy())
+        .where(StatystykaWejsc.ziarno == "dzien", StatystykaWejsc.wymiar == wymiar, *warunki)
+        .group_by(StatystykaWejsc.wymiar_id).order_by(StatystykaWejsc.wymiar_id)
+    )).mappings().all()
+
+    if wymiar == "bramka":
+        nazwy = dict((await db.execute(select(Bramka.id, Bramka.nazwa))).all())
+    else:
+        nazwy = {
+            r.id: f"{r.id_pracownika} ({r.imie} {r.nazwisko})"
+            for r in await db.execute(select(Pracownik.id, Pracownik.id_pracownika, Pracownik.imie, Pracownik.nazwisko)
+                                      .where(Pracownik.id.in_([w["wymiar_id"] for w in wiersze])))
+        }
+
+    os.makedirs(RAPORTY_DIR, exist_ok=True)
+    sciezka = os.path.join(
+        RAPORTY_DIR, f"raport_{typ}_{data_od:%Y%m%d}_{data_do:%Y%m%d}_{datetime.now():%Y%m%d_%H%M%S}.csv"
+    )
+    naglowek = ["id", "nazwa", "proby", "wejscia", "bledy_qr", "bledy_biometrii", "podejrzane",
+                "porownania", "srednie_podobienstwo", "skutecznosc"]
+    with open(sciezka, "w", newline="", encoding="utf-8") as f:
+        pisarz = csv.writer(f)
+        pisarz.writerow(naglowek)
+        for w in wiersze:
+            dane = {"id": w["wymiar_id"], "nazwa": nazwy.get(w["wymiar_id"], ""), **_z_licznikow(w)}
+            pisarz.writerow([dane[k] for k in naglowek])
+
+    raport = Raport(administrator_id=administrator_id, typ=typ, data_od=data_od, data_do=data_do,
+                    sciezka_pliku=sciezka)
+    db.add(raport)
+    await db.commit()
+    await db.refresh(raport)
+    return raport
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Przeliczenie statystyk wejść z tabeli proba_wejscia")
+    parser.add_argument("--od", type=date.fromisoformat, help="Pierwszy dzień (RRRR-MM-DD)")
+    parser.add_argument("--do", type=date.fromisoformat, help="Ostatni dzień (RRRR-MM-DD)")
+    args = parser.parse_args()
+    przelicz_statystyki(args.od, args.do)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
 from pydantic import BaseModel
-from datetime import date
-from typing import Optional
+from datetime import date, datetime
+from typing import Optional, List
+from uuid import UUID
 
 # --- BRAMKA ---
 # Używane przy tworzeniu nowej bramki (POST /setup/bramka)
 class BramkaCreate(BaseModel):
     nazwa: str
     lokalizacja: str
+    detektor: Optional[str] = None  # Detektor twarzy (None = globalny FACE_DETECTOR)
+
+# Zmiana detektora twarzy bramki (PUT /setup/bramka/{id}/detektor)
+class BramkaDetektor(BaseModel):
+    detektor: Optional[str] = None
 
 # --- PRACOWNIK ---
 # Dane potrzebne do rejestracji pracownika
@@ -43,4 +49,62 @@ class VerificationResponse(BaseModel):
     success: bool
     message: str
     person_name: Optional[str] = None
-    confidence: Optional[float] = None
\ No newline at end of file
+    confidence: Optional[float] = None
+
+# Próba wejścia rozstrzygnięta lokalnie przez bramkę offline (POST /sync/proby)
+class ProbaOffline(BaseModel):
+    bramka_id: int
+    pracownik_id: Optional[int] = None
+    data_czas: datetime  # Czas decyzji na bramce
+    wynik_qr: Optional[str] = None
+    wynik_biometryczny: Optional[str] = None
+    procent_podobienstwa: Optional[float] = None
+    status_finalny: str
+    podejrzana: bool = False
+    id_proby: Optional[UUID] = None  # Nadawany przez bramkę - ponowna wysyłka nie tworzy duplikatu
+
+# Odpowiedź weryfikacji wieloklatkowej (/verify/sesja, /verify/seria)
+class SesjaResponse(VerificationResponse):
+    sesja_id: Optional[str] = None
+    zakonczona: bool = True  # False - bramka wysyła kolejną klatkę
+    klatki: int = 0  # Klatki przetworzone w sesji
+
+# --- IDENTYFIKACJA 1:N ---
+# Jeden kandydat z rankingu (najbliższe wektory w bazie)
+class IdentificationCandidate(BaseModel):
+    id_pracownika: str
+    pracownik_id: Optional[int] = None
+    imie: Optional[str] = None
+    nazwisko: Optional[str] = None
+    dystans: float
+    procent_podobienstwa: float
+    zgodnosc: bool
+
+# Odpowiedź endpointu /identify
+class IdentificationResponse(BaseModel):
+    face_detected: bool
+    candidates: List[IdentificationCandidate] = []
+    qr_owner: Optional[str] = None  # Właściciel przepustki (jeśli podano qr_data)
+    qr_sharing: bool = False  # Twarz należy do innego pracownika niż właściciel QR
+
+
+# --- RAPORTY ---
+# Zlecenie wygenerowania raportu (POST /raporty/generuj)
+class RaportCreate(BaseModel):
+    administrator_id: int = 1
+    typ: str  # "bramki" lub "pracownicy"
+    data_od: date
+    data_do: date
+
+# Zapisany raport (plik CSV w sciezka_pliku)
+class RaportResponse(BaseModel):
+    id: int
+    administrator_id: int
+    typ: str
+    data_wygenerowania: Optional[datetime] = None
+    data_od: date
+    data_do: date
+    sciezka_pliku: Optional[str] = None
+
+    class Config:
+        orm_mode = True
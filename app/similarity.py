@@ -0,0 +1,215 @@
+import os
+import numpy as np
+
+# --- KONFIGURACJA ---
+# Reprezentacja wektorów w indeksie 1:N: "float32" (2 KB na osobę), "int8" (516 B - 4x mniej pamięci),
+# "pq" (kwantyzacja iloczynowa: PQ_M bajtów na osobę, np. 64 B). Decyzje i tak zapadają na float32.
+EMBEDDING_QUANT = os.getenv("EMBEDDING_QUANT", "float32")
+# PQ: liczba podprzestrzeni (wymiar wektora musi być jej wielokrotnością), 256 środków w każdej
+PQ_M = int(os.getenv("PQ_M", 64))
+# PQ potrzebuje danych do treningu słowników - przy mniejszej bazie indeks używa int8
+PQ_MIN_TRAIN = int(os.getenv("PQ_MIN_TRAIN", 4096))
+# Ilu najlepszych kandydatów z przybliżonego skanu przeliczać dokładnie (float32 z bazy)
+QUANT_RERANK = int(os.getenv("QUANT_RERANK", 32))
+
+# Wiersze dekodowane naraz przy skanie int8 / pq (bufor float32 ~ CHUNK_ROWS x dim)
+CHUNK_ROWS = 4096
+PQ_CENTROIDS = 256
+
+
+def normalize(vectors) -> np.ndarray:
+    """Wektory (lub macierz wierszy) jako float32 o długości 1; zerowe zostają bez zmian."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def cosine_distance(a, b) -> float:
+    """
+    Dystans kosinusowy 1:1 (odpowiednik scipy.spatial.distance.cosine) jako iloczyn
+    skalarny znormalizowanych wektorów float32.
+    """
+    a, b = normalize(a).reshape(-1), normalize(b).reshape(-1)
+    # Jak scipy: błąd zaokrągleń nie daje dystansu ujemnego
+    return float(np.clip(1.0 - np.dot(a, b), 0.0, 2.0))
+
+
+def cosine_distances(queries, matrix) -> np.ndarray:
+    """
+    Dystanse kosinusowe 1:N jednym mnożeniem macierzy. Wiersze `matrix` muszą być już
+    znormalizowane (baza wzorców, indeks). Zapytanie [dim] -> [n], paczka [q, dim] -> [q, n].
+    """
+    queries = normalize(queries)
+    return np.clip(1.0 - queries @ np.asarray(matrix, dtype=np.float32).T, 0.0, 2.0)
+
+
+class Codec:
+    """
+    Zapis znormalizowanych wektorów w indeksie. Kody to jedna tablica numpy
+    (wiersz = osoba), więc indeks może je powiększać, nadpisywać i przestawiać
+    tak samo jak zwykłą macierz float32.
+    """
+
+    name = "base"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def train(self, matrix):
+        """Uczenie na pełnej bazie (tylko PQ); wywoływane przy budowie indeksu."""
+
+    def empty(self, n: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def encode(self, matrix) -> np.ndarray:
+        raise NotImplementedError
+
+    def similarities(self, codes, query) -> np.ndarray:
+        """Iloczyny skalarne znormalizowanego zapytania z zakodowanymi wierszami."""
+        raise NotImplementedError
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.empty(1).nbytes
+
+
+class Float32Codec(Codec):
+    """Bez kompresji - wynik dokładny."""
+
+    name = "float32"
+
+    def empty(self, n):
+        return np.empty((n, self.dim), dtype=np.float32)
+
+    def encode(self, matrix):
+        return normalize(matrix).reshape(-1, self.dim)
+
+    def similarities(self, codes, query):
+        return codes @ query
+
+
+class Int8Codec(Codec):
+    """
+    Kwantyzacja skalarna: wiersz zapisany jako int8 ze skalą float32 (maks. |x| / 127).
+    Błąd iloczynu skalarnego dla ArcFace jest rzędu 1e-3. NumPy nie ma mnożenia macierzy
+    int8, więc wiersze są dekodowane paczkami - zysk to pamięć, nie czas skanu.
+    """
+
+    name = "int8"
+
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self.dtype = np.dtype([("q", np.int8, (dim,)), ("s", np.float32)])
+
+    def empty(self, n):
+        return np.zeros(n, dtype=self.dtype)
+
+    def encode(self, matrix):
+        matrix = normalize(matrix).reshape(-1, self.dim)
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = self.empty(matrix.shape[0])
+        codes["q"] = np.rint(matrix / scales[:, None])
+        codes["s"] = scales
+        return codes
+
+    def similarities(self, codes, query):
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], CHUNK_ROWS):
+            chunk = codes[start:start + CHUNK_ROWS]
+            out[start:start + CHUNK_ROWS] = (chunk["q"].astype(np.float32) @ query) * chunk["s"]
+        return out
+
+
+class PQCodec(Codec):
+    """
+    Kwantyzacja iloczynowa: wektor dzielony na m podwektorów, każdy zapisany jako numer
+    najbliższego z 256 środków (k-means) swojej podprzestrzeni - m bajtów na osobę.
+    Zapytanie nie jest kwantyzowane: dla każdej podprzestrzeni liczona jest tablica
+    iloczynów ze środkami, a podobieństwo to suma m odczytów z tablic.
+    """
+
+    name = "pq"
+
+    def __init__(self, dim: int, m: int = PQ_M, seed: int = 0):
+        if dim % m:
+            raise ValueError(f"Wymiar {dim} nie dzieli się na PQ_M={m} podprzestrzeni")
+        super().__init__(dim)
+        self.m = m
+        self.dsub = dim // m
+        self._rng = np.random.default_rng(seed)
+        self.codebooks = None  # [m, 256, dsub]
+        self._offsets = np.arange(m) * PQ_CENTROIDS
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    def _split(self, matrix):
+        return matrix.reshape(-1, self.m, self.dsub)
+
+    def train(self, matrix, iterations: int = 10, sample: int = PQ_CENTROIDS * 64):
+        matrix = normalize(matrix).reshape(-1, self.dim)
+        n = matrix.shape[0]
+        if n < PQ_CENTROIDS:
+            raise ValueError(f"PQ wymaga co najmniej {PQ_CENTROIDS} wektorów do treningu (jest {n})")
+        if n > sample:
+            matrix = matrix[self._rng.choice(n, sample, replace=False)]
+        parts = self._split(matrix)
+        codebooks = np.empty((self.m, PQ_CENTROIDS, self.dsub), dtype=np.float32)
+        for j in range(self.m):
+            x = np.ascontiguousarray(parts[:, j])
+            centroids = x[self._rng.choice(x.shape[0], PQ_CENTROIDS, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = self._nearest(x, centroids)
+                counts = np.bincount(assignment, minlength=PQ_CENTROIDS)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, x)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+                # Pusty środek - losujemy nowy punkt
+                empty = np.flatnonzero(~filled)
+                if len(empty):
+                    centroids[empty] = x[self._rng.integers(x.shape[0], size=len(empty))]
+            codebooks[j] = centroids
+        self.codebooks = codebooks
+
+    @staticmethod
+    def _nearest(x, centroids):
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, stały składnik ||x||^2 pomijamy
+        return np.argmin((centroids * centroids).sum(axis=1) - 2.0 * (x @ centroids.T), axis=1)
+
+    def empty(self, n):
+        return np.zeros((n, self.m), dtype=np.uint8)
+
+    def encode(self, matrix):
+        if not self.trained:
+            raise RuntimeError("Słowniki PQ nie są wytrenowane")
+        parts = self._split(normalize(matrix).reshape(-1, self.dim))
+        codes = self.empty(parts.shape[0])
+        for j in range(self.m):
+            codes[:, j] = self._nearest(parts[:, j], self.codebooks[j])
+        return codes
+
+    def similarities(self, codes, query):
+        # Tablica [m, 256]: iloczyn podwektora zapytania z każdym środkiem
+        table = np.einsum("mkd,md->mk", self.codebooks, self._split(query)[0]).ravel()
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], CHUNK_ROWS):
+            chunk = codes[start:start + CHUNK_ROWS].astype(np.int64) + self._offsets
+            out[start:start + CHUNK_ROWS] = table[chunk].sum(axis=1)
+        return out
+
+
+CODECS = {
+    "float32": Float32Codec,
+    "int8": Int8Codec,
+    "pq": PQCodec,
+}
+
+
+def create_codec(dim: int, quant: str = EMBEDDING_QUANT) -> Codec:
+    if quant not in CODECS:
+        raise ValueError(f"Nieznany typ kwantyzacji EMBEDDING_QUANT: {quant} (dozwolone: {', '.join(CODECS)})")
+    return CODECS[quant](dim)
@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import argparse
+import itertools
+import numpy as np
+import cv2
+
+# Uruchamiane z katalogu app/test - moduły aplikacji są katalog wyżej
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from face_recognition_system import DETECTORS, THRESHOLD, get_embedding, load_models
+
+# --- KONFIGURACJA ---
+# Katalog ze zdjęciami w układzie <osoba>/<zdjęcie>.jpg (np. zdjęcia z kamer bramek)
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+
+
+def load_images(folder):
+    """Lista (osoba, obraz BGR) - obrazy wczytywane raz, wspólne dla wszystkich detektorów."""
+    images = []
+    for person in sorted(os.listdir(folder)):
+        person_dir = os.path.join(folder, person)
+        if not os.path.isdir(person_dir):
+            continue
+        for name in sorted(os.listdir(person_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                img = cv2.imread(os.path.join(person_dir, name))
+                if img is not None:
+                    images.append((person, img))
+    return images
+
+
+def cosine_distance(a, b):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return 1.0 - float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def run_detector(detector, images):
+    """Wektory i czasy (detekcja + ArcFace) dla wszystkich zdjęć."""
+    # Pierwsze wywołanie ładuje model detektora - nie wliczamy go do czasu
+    get_embedding(images[0][1], detector)
+    vectors, latencies = [], []
+    for _, img in images:
+        start = time.perf_counter()
+        vectors.append(get_embedding(img, detector))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return vectors, np.array(latencies)
+
+
+def evaluate(images, vectors, threshold):
+    """TAR (ta sama osoba rozpoznana) i FAR (inna osoba przyjęta) przy progu dystansu."""
+    genuine, impostor = [], []
+    for (i, (p1, _)), (j, (p2, _)) in itertools.combinations(enumerate(images), 2):
+        if vectors[i] is None or vectors[j] is None:
+            # Brak twarzy = odmowa
+            (genuine if p1 == p2 else impostor).append(np.inf)
+            continue
+        (genuine if p1 == p2 else impostor).append(cosine_distance(vectors[i], vectors[j]))
+    tar = np.mean(np.array(genuine) < threshold) if genuine else float("nan")
+    far = np.mean(np.array(impostor) < threshold) if impostor else float("nan")
+    return tar, far
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Porównanie detektorów twarzy: skuteczność i czas weryfikacji")
+    parser.add_argument("katalog", help="Katalog ze zdjęciami <osoba>/<zdjęcie>.jpg")
+    parser.add_argument("--detektory", default=",".join(DETECTORS))
+    parser.add_argument("--prog", type=float, default=THRESHOLD, help="Próg dystansu kosinusowego")
+    args = parser.parse_args()
+
+    images = load_images(args.katalog)
+    people = len({p for p, _ in images})
+    if people < 2:
+        sys.exit("Potrzebne są zdjęcia co najmniej dwóch osób")
+    print(f"--- {len(images)} zdjęć, {people} osób, próg {args.prog} ---")
+    load_models()
+
+    print("\n" + "=" * 80)
+    print(f"{'DETEKTOR':<11} | {'WYKRYTO':>8} | {'TAR':>7} | {'FAR':>7} | {'ŚR. [ms]':>9} | {'P95 [ms]':>9} | {'ZDJ/S':>7}")
+    print("=" * 80)
+
+    for detector in args.detektory.split(","):
+        # Brak opcjonalnej biblioteki detektora (np. mediapipe) widać jako WYKRYTO = 0
+        vectors, latencies = run_detector(detector, images)
+        detected = np.mean([v is not None for v in vectors])
+        tar, far = evaluate(images, vectors, args.prog)
+        print(f"{detector:<11} | {detected:8.3f} | {tar:7.3f} | {far:7.3f} | {latencies.mean():9.1f} | "
+              f"{np.percentile(latencies, 95):9.1f} | {1000 / latencies.mean():7.1f}")
+
+    print("=" * 80)
+    print("TAR - odsetek par tej samej osoby poniżej progu, FAR - odsetek par różnych osób poniżej progu")
+
+
+if __name__ == "__main__":
+    main()
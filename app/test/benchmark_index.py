@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Uruchamiane z katalogu app/test - moduły aplikacji są katalog wyżej
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from face_index import ExactIndex, INDEX_BACKENDS, create_index
+
+# --- KONFIGURACJA ---
+# Syntetyczne "osoby": losowe wektory ArcFace (512), zapytania = wektor osoby + szum
+DIM = 512
+NOISE = 0.6  # Szum ~ dystans kosinusowy 0.25-0.3, czyli typowe zdjęcie z bramki
+
+
+def generate_data(n_people, n_queries, seed=0):
+    rng = np.random.default_rng(seed)
+    people = rng.standard_normal((n_people, DIM)).astype(np.float32)
+    people /= np.linalg.norm(people, axis=1, keepdims=True)
+
+    targets = rng.integers(0, n_people, n_queries)
+    noise = rng.standard_normal((n_queries, DIM)).astype(np.float32)
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    queries = people[targets] + NOISE * noise
+    ids = [f"emp_{i:06d}" for i in range(n_people)]
+    return ids, people, queries
+
+
+def run_backend(index, queries):
+    latencies = []
+    results = []
+    for q in queries:
+        start = time.perf_counter()
+        found = index.search(q, 1)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(found[0][0] if found else None)
+    return results, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Porównanie indeksów wyszukiwania twarzy (recall@1, opóźnienie)")
+    parser.add_argument("--osoby", type=int, default=50000)
+    parser.add_argument("--zapytania", type=int, default=500)
+    parser.add_argument("--backendy", default=",".join(INDEX_BACKENDS))
+    args = parser.parse_args()
+
+    print(f"--- Generowanie danych: {args.osoby} osób, {args.zapytania} zapytań ---")
+    ids, people, queries = generate_data(args.osoby, args.zapytania)
+
+    exact = ExactIndex(DIM)
+    exact.build(ids, people)
+    reference, _ = run_backend(exact, queries)
+
+    print("\n" + "=" * 78)
+    print(f"{'BACKEND':<10} | {'BUDOWA [s]':>10} | {'RECALL@1':>9} | {'ŚR. [ms]':>9} | {'P99 [ms]':>9} | {'QPS':>8}")
+    print("=" * 78)
+
+    for backend in args.backendy.split(","):
+        index = create_index(DIM, backend)
+        if index.name != backend:
+            print(f"{backend:<10} | pominięto (brak biblioteki)")
+            continue
+
+        start = time.perf_counter()
+        index.build(ids, people)
+        build_time = time.perf_counter() - start
+
+        found, latencies = run_backend(index, queries)
+        recall = np.mean([a == b for a, b in zip(found, reference)])
+
+        print(f"{backend:<10} | {build_time:10.2f} | {recall:9.3f} | {latencies.mean():9.3f} | "
+              f"{np.percentile(latencies, 99):9.3f} | {1000 / latencies.mean():8.0f}")
+
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from scipy.spatial.distance import cosine
+
+# Uruchamiane z katalogu app/test - moduły aplikacji są katalog wyżej
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from similarity import CODECS, QUANT_RERANK, cosine_distance, cosine_distances, normalize
+from face_index import ExactIndex
+
+# --- KONFIGURACJA ---
+# Progi jak w face_recognition_system (bez importu - nie ładujemy TensorFlow)
+THRESHOLD = 0.50
+DIM = 512
+# Szum zapytań dobrany tak, by dystanse rozkładały się wokół progu 0.50 (najtrudniejsze decyzje)
+NOISE_LEVELS = (0.5, 1.0, 1.5, 1.7, 1.73, 1.76, 2.0, 2.5)
+# Różnica dystansu, poniżej której rozbieżna decyzja wynika z zaokrągleń float32, a nie z błędu
+TOLERANCE = 1e-5
+
+
+def generate_data(n_people, n_queries, seed=0):
+    rng = np.random.default_rng(seed)
+    # Wzorce nieznormalizowane, w float64 - tak jak średnia z list zwracanych przez DeepFace
+    people = rng.standard_normal((n_people, DIM)) * rng.uniform(0.5, 20, (n_people, 1))
+    targets = rng.integers(0, n_people, n_queries)
+    noise = rng.standard_normal((n_queries, DIM))
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    scale = rng.choice(NOISE_LEVELS, n_queries)[:, None]
+    queries = normalize(people[targets]).astype(np.float64) + scale * noise
+    ids = [f"emp_{i:06d}" for i in range(n_people)]
+    return ids, people, queries, targets
+
+
+def check_one_to_one(people, queries, targets):
+    """Decyzje verify_face: scipy (float64) vs iloczyn skalarny float32."""
+    reference = np.array([cosine(q.tolist(), people[t].tolist()) for q, t in zip(queries, targets)])
+    start = time.perf_counter()
+    kernel = np.array([cosine_distance(q, people[t]) for q, t in zip(queries, targets)])
+    kernel_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    start = time.perf_counter()
+    for q, t in zip(queries, targets):
+        cosine(q.tolist(), people[t].tolist())
+    scipy_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    mismatched = (reference < THRESHOLD) != (kernel < THRESHOLD)
+    borderline = np.abs(reference - THRESHOLD) < TOLERANCE
+    print(f"1:1  | par: {len(queries)}, zgodność: {np.mean(reference < THRESHOLD):.1%}, "
+          f"maks. różnica dystansu: {np.max(np.abs(reference - kernel)):.2e}")
+    print(f"1:1  | scipy: {scipy_ms:.4f} ms, kernel: {kernel_ms:.4f} ms na parę, "
+          f"różne decyzje: {int(mismatched.sum())} (w tym przy progu ±{TOLERANCE}: {int((mismatched & borderline).sum())})")
+    return int((mismatched & ~borderline).sum())
+
+
+def check_one_to_many(ids, people, queries, quant):
+    """
+    Identyfikacja 1:N: najlepszy kandydat i decyzja z indeksu (ze skompresowanym skanem
+    i dokładnym przeliczeniem czołówki, jak search_embedding) vs pełny przegląd scipy.
+    """
+    stored = normalize(people)
+    index = ExactIndex(DIM, quant)
+    start = time.perf_counter()
+    index.build(ids, stored)
+    build_s = time.perf_counter() - start
+
+    reference = cosine_distances(queries, stored)
+    best = np.argmin(reference, axis=1)
+
+    latencies, errors = [], 0
+    for q, b in zip(queries, best):
+        start = time.perf_counter()
+        found = index.search(q, QUANT_RERANK if quant != "float32" else 1)
+        if quant != "float32":
+            rows = [int(person_id[4:]) for person_id, _ in found]
+            dists = cosine_distances(q, stored[rows])
+            found = [(found[int(np.argmin(dists))][0], float(np.min(dists)))]
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        person_id, dist = found[0]
+        exact = cosine(q.tolist(), people[b].tolist())
+        if person_id != ids[b] or ((dist < THRESHOLD) != (exact < THRESHOLD) and abs(exact - THRESHOLD) >= TOLERANCE):
+            errors += 1
+
+    latencies = np.array(latencies)
+    print(f"{quant:<8} | {index.nbytes / 2 ** 20:9.1f} | {build_s:10.2f} | {latencies.mean():9.3f} | "
+          f"{np.percentile(latencies, 99):9.3f} | {errors:>8}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Równoważność decyzji i pamięć: scipy vs kernel float32 / int8 / pq")
+    parser.add_argument("--osoby", type=int, default=20000)
+    parser.add_argument("--zapytania", type=int, default=2000)
+    parser.add_argument("--kwantyzacje", default=",".join(CODECS))
+    args = parser.parse_args()
+
+    print(f"--- Generowanie danych: {args.osoby} osób, {args.zapytania} zapytań ---")
+    ids, people, queries, targets = generate_data(args.osoby, args.zapytania)
+
+    failures = check_one_to_one(people, queries, targets)
+
+    print("\n" + "=" * 72)
+    print(f"{'KWANT.':<8} | {'PAMIĘĆ MB':>9} | {'BUDOWA [s]':>10} | {'ŚR. [ms]':>9} | {'P99 [ms]':>9} | {'BŁĘDY':>8}")
+    print("=" * 72)
+    for quant in args.kwantyzacje.split(","):
+        failures += check_one_to_many(ids, people, queries[:500], quant)
+    print("=" * 72)
+
+    print("✅ Decyzje zgodne ze scipy" if failures == 0 else f"❌ Rozbieżne decyzje: {failures}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
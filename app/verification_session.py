@@ -0,0 +1,98 @@
+import os
+import time
+import uuid
+
+import numpy as np
+
+from face_recognition_system import THRESHOLD, distance_to_probability
+from pass_cache import TTLCache
+from similarity import normalize
+
+# --- KONFIGURACJA ---
+# Budżet sesji: maksymalna liczba klatek i czas od rozpoczęcia (s)
+SESSION_MAX_FRAMES = int(os.getenv("SESSION_MAX_FRAMES", 5))
+SESSION_TIMEOUT_S = float(os.getenv("SESSION_TIMEOUT_S", 10))
+# Wczesna odmowa: po tylu klatkach z twarzą, jeśli połączony dystans jest nie mniejszy niż próg odmowy
+SESSION_REJECT_FRAMES = int(os.getenv("SESSION_REJECT_FRAMES", 3))
+SESSION_REJECT_DISTANCE = float(os.getenv("SESSION_REJECT_DISTANCE", 0.75))
+# Maksymalna liczba otwartych sesji (najstarsze są zamykane odmową)
+SESSION_MAX_ACTIVE = int(os.getenv("SESSION_MAX_ACTIVE", 1000))
+# Co ile sekund zamykać sesje, w których bramka przestała wysyłać klatki
+SESSION_SWEEP_S = 1.0
+
+
+class SesjaWeryfikacji:
+    """
+    Weryfikacja z wielu klatek jednej osoby. Wektory kolejnych klatek (znormalizowane)
+    są uśredniane, a decyzja zapada, gdy połączony dystans do wzorca spadnie poniżej
+    progu (wczesne wyjście), gdy jest wyraźnie za duży albo gdy skończy się budżet klatek/czasu.
+    Pojedyncze mrugnięcie czy zły kąt nie wymusza ponownego skanowania przepustki.
+    """
+
+    def __init__(self, bramka: dict, przepustka: dict, qr_data: str, wzorzec, threshold: float = THRESHOLD):
+        self.id = uuid.uuid4().hex
+        self.bramka = bramka
+        self.przepustka = przepustka
+        self.qr_data = qr_data
+        self.threshold = threshold
+        self.start = time.monotonic()
+        self.klatki = 0
+        self.klatki_z_twarza = 0
+        self.dystans = None
+        self.najlepsze_zdjecie = None  # Klatka najbliższa wzorcowi (zdjęcie dowodowe)
+        self._najlepszy_dystans = np.inf
+        self._suma = None
+        self._wzorzec = None
+        if wzorzec is not None:
+            self._wzorzec = normalize(wzorzec).reshape(-1)
+        self.odpowiedz = None  # Ostateczna odpowiedź (po decyzji sesja tylko ją powtarza)
+
+    @property
+    def zakonczona(self) -> bool:
+        return self.odpowiedz is not None
+
+    @property
+    def procent(self) -> float:
+        return 0.0 if self.dystans is None else distance_to_probability(self.dystans, self.threshold)
+
+    def dodaj(self, wektor, zdjecie: bytes = None):
+        """
+        Dodaje wektor klatki (None = brak twarzy). Zwraca True/False, gdy zapadła decyzja
+        (zgodność / odmowa), albo None, gdy potrzebna jest kolejna klatka.
+        Klatka po czasie sesji nie jest już uwzględniana - odmowa.
+        """
+        if self.po_czasie():
+            return False
+        self.klatki += 1
+        if self._wzorzec is None:
+            return False
+        if wektor is not None:
+            wektor = normalize(wektor).reshape(-1)
+            self._suma = wektor if self._suma is None else self._suma + wektor
+            self.klatki_z_twarza += 1
+            sredni = normalize(self._suma)
+            self.dystans = 1.0 - float(sredni @ self._wzorzec)
+
+            dystans_klatki = 1.0 - float(wektor @ self._wzorzec)
+            if dystans_klatki < self._najlepszy_dystans:
+                self._najlepszy_dystans = dystans_klatki
+                self.najlepsze_zdjecie = zdjecie
+
+            if self.dystans < self.threshold:
+                return True
+            if self.klatki_z_twarza >= SESSION_REJECT_FRAMES and self.dystans >= SESSION_REJECT_DISTANCE:
+                return False
+        elif self.najlepsze_zdjecie is None:
+            self.najlepsze_zdjecie = zdjecie
+
+        if self.klatki >= SESSION_MAX_FRAMES:
+            return False
+        return None
+
+    def po_czasie(self) -> bool:
+        return time.monotonic() - self.start > SESSION_TIMEOUT_S
+
+
+# Otwarte sesje: klucz = id sesji. Porzucone zamyka odmową main.py po SESSION_TIMEOUT_S,
+# rozstrzygnięte zostają jeszcze chwilę, żeby spóźniona klatka dostała tę samą odpowiedź
+sesje = TTLCache(maxsize=SESSION_MAX_ACTIVE, ttl=SESSION_TIMEOUT_S * 2)